@@ -0,0 +1,127 @@
+import hashlib
+import json
+import os
+import re
+import tempfile
+import time
+import numpy as np
+
+# Erkennt die Video-ID in watch-, youtu.be-, shorts-, live- und embed-Links
+YOUTUBE_ID_REGEX = re.compile(
+    r"(?:youtube\.com/(?:watch\?(?:.*&)?v=|shorts/|live/|embed/)|youtu\.be/)([A-Za-z0-9_-]{11})"
+)
+
+# Speicherformat je Cache-Ebene: Rechteck/HSV und Ereignisse als JSON, Messreihen als .npz
+LAYER_FORMATS = {
+    "rectangle": "json",
+    "series": "npz",
+    "events": "json",
+}
+
+
+def extract_video_id(url):
+    """Gibt die YouTube-Video-ID eines Links zurück oder None"""
+    match = YOUTUBE_ID_REGEX.search(url or "")
+    return match.group(1) if match else None
+
+
+def params_hash(params):
+    """Stabiler Hash über die Analyse-Parameter (numpy-Arrays werden als Listen behandelt)"""
+    def convert(value):
+        if isinstance(value, np.ndarray):
+            return value.tolist()
+        if isinstance(value, np.generic):
+            return value.item()
+        raise TypeError(f"Nicht serialisierbarer Parameter: {type(value)}")
+
+    encoded = json.dumps(params, sort_keys=True, default=convert).encode("utf-8")
+    return hashlib.sha1(encoded).hexdigest()[:16]
+
+
+class AnalysisCache:
+    """
+    Persistenter Ergebnis-Cache für Stamina-Analysen, gegliedert nach Video-ID.
+
+    Jede Ebene (erkanntes Rechteck mit HSV-Bereich, Gelbanteil-Messreihe, OOS-Ereignisse)
+    wird unter einem Hash ihrer eigenen Parameter abgelegt. Ändern sich nur die Schwellwerte,
+    bleiben Rechteck und Messreihe weiter nutzbar. Alte Einträge werden nach Alter und
+    Gesamtgröße (am längsten nicht genutzt zuerst) entfernt.
+    """
+    def __init__(self, directory, max_bytes=2 * 1024**3, max_age_seconds=30 * 24 * 3600):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, video_id, layer, params):
+        if layer not in LAYER_FORMATS:
+            raise ValueError(f"Unbekannte Cache-Ebene: {layer}")
+        return os.path.join(self.directory, video_id, f"{layer}-{params_hash(params)}.{LAYER_FORMATS[layer]}")
+
+    def load(self, video_id, layer, params):
+        """Liest einen Eintrag (dict bzw. dict aus Arrays) oder None, wenn er fehlt oder abgelaufen ist"""
+        path = self._path(video_id, layer, params)
+        try:
+            if time.time() - os.path.getmtime(path) > self.max_age_seconds:
+                os.remove(path)
+                return None
+            if LAYER_FORMATS[layer] == "json":
+                with open(path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+            else:
+                with np.load(path) as archive:
+                    data = {name: archive[name] for name in archive.files}
+        except (OSError, ValueError):
+            return None
+        # Zugriff merken, die Größenbegrenzung entfernt die am längsten ungenutzten Einträge
+        os.utime(path)
+        return data
+
+    def store(self, video_id, layer, params, data):
+        """Schreibt einen Eintrag atomar (temporäre Datei, dann os.replace) und räumt danach auf"""
+        path = self._path(video_id, layer, params)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                if LAYER_FORMATS[layer] == "json":
+                    f.write(json.dumps(data).encode("utf-8"))
+                else:
+                    np.savez_compressed(f, **data)
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        self.evict()
+
+    def evict(self):
+        """Entfernt abgelaufene Einträge und danach die ältesten, bis das Größenbudget eingehalten ist"""
+        now = time.time()
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(".tmp"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                if now - stat.st_mtime > self.max_age_seconds:
+                    os.remove(path)
+                else:
+                    entries.append((stat.st_mtime, stat.st_size, path))
+
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_size <= self.max_bytes:
+                break
+            os.remove(path)
+            total_size -= size
+
+        # Leere Video-Ordner aufräumen
+        for name in os.listdir(self.directory):
+            video_dir = os.path.join(self.directory, name)
+            if os.path.isdir(video_dir) and not os.listdir(video_dir):
+                os.rmdir(video_dir)
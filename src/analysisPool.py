@@ -0,0 +1,218 @@
+import asyncio
+import contextlib
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+
+# Worker und Manager entstehen über einen forkserver statt per fork aus dem aufrufenden Prozess. Der Bot hat
+# beim Start des Pools schon Threads (asyncio.to_thread, aiohttp), deren Locks im geforkten Kind für immer
+# belegt bleiben können. Der forkserver ist ein frischer Prozess ohne Threads, der die Analyse-Module einmal
+# vorlädt und die Worker davon abspaltet. Neue Prozesse importieren dabei das Hauptmodul, es muss sich also
+# ohne Nebenwirkungen importieren lassen (siehe main.py).
+START_METHOD = "forkserver"
+PRELOAD_MODULES = ["cv2", "numpy", "videoAnalyzer", "videoAnalyzerOld"]
+
+
+def default_worker_count():
+    """Höchstens n-1 Kerne und maximal 8 Worker, wie bisher in analyze_video"""
+    return max(1, min(multiprocessing.cpu_count() - 1, 8))
+
+
+def _init_worker():
+    """
+    Läuft einmal pro Worker-Prozess. Lädt OpenCV, numpy und den Analyzer vor und führt
+    eine kleine Farbraum-Umwandlung aus, damit der erste Chunk nicht die Import- und
+    Initialisierungszeit bezahlt.
+    """
+    import cv2
+    import numpy as np
+    import videoAnalyzer  # noqa: F401 - process_frame_chunk wird per Referenz gepickelt
+    import videoAnalyzerOld  # noqa: F401 - ebenso analyze_series_chunk
+
+    cv2.cvtColor(np.zeros((8, 8, 3), dtype=np.uint8), cv2.COLOR_BGR2HSV)
+
+
+def _warm_up():
+    """Leerer Auftrag, damit der Executor seine Worker sofort startet"""
+    return os.getpid()
+
+
+def _run_task(fn, task):
+    """Führt einen Auftrag im Worker aus und gibt (pid, Sekunden, Ergebnis) für die Durchsatz-Statistik zurück"""
+    start = time.perf_counter()
+    result = fn(task)
+    return os.getpid(), time.perf_counter() - start, result
+
+
+def _throughput(stats):
+    """Aufträge, Frames, Rechenzeit und Frames pro Sekunde pro Worker-Prozess aus {pid: [Aufträge, Frames, Sekunden]}"""
+    return {
+        pid: {
+            "tasks": tasks,
+            "frames": frames,
+            "seconds": seconds,
+            "fps": frames / seconds if seconds > 0 else 0.0,
+        }
+        for pid, (tasks, frames, seconds) in stats.items()
+    }
+
+
+def _record(stats, pid, frames, seconds):
+    entry = stats.setdefault(pid, [0, 0, 0.0])
+    entry[0] += 1
+    entry[1] += frames
+    entry[2] += seconds
+
+
+class AnalysisJob:
+    """
+    Ein Analyseauftrag im Pool. cancel() bricht alle noch laufenden Chunks des Auftrags ab,
+    über progress_queue melden die Worker ihren Fortschritt an die asyncio-Seite.
+    """
+    def __init__(self, pool, cancel_event, progress_queue):
+        self.pool = pool
+        self.cancel_event = cancel_event
+        self.progress_queue = progress_queue
+        self.futures = []
+        self._stats = {}
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    def submit(self, fn, task):
+        """Reicht einen Chunk ein, das Future liefert (pid, Sekunden, Ergebnis), siehe run"""
+        executor = self.pool._executor
+        try:
+            future = executor.submit(_run_task, fn, task)
+        except BrokenProcessPool:
+            # Ein abgestürzter Worker (z.B. OOM) hat den Executor unbrauchbar gemacht
+            self.pool._restart_executor(executor)
+            future = self.pool._executor.submit(_run_task, fn, task)
+        self.futures.append(future)
+        return future
+
+    async def run(self, fn, task, frames=0, retries=1):
+        """
+        Reicht einen Chunk ein und wartet auf sein Ergebnis. Stirbt dabei ein Worker (BrokenProcessPool),
+        bricht der Executor alle laufenden Chunks ab. Der Chunk wird dann bis zu retries Mal auf einem neu
+        gestarteten Executor wiederholt, danach wird der Fehler weitergereicht. Andere Fehler des Chunks
+        werden sofort weitergereicht. frames fließt in die Durchsatz-Statistik von Auftrag und Pool ein.
+        """
+        for attempt in range(retries + 1):
+            executor = self.pool._executor
+            try:
+                pid, seconds, result = await asyncio.wrap_future(self.submit(fn, task))
+            except BrokenProcessPool:
+                if attempt == retries or self.cancelled:
+                    raise
+                self.pool._restart_executor(executor)
+                continue
+            _record(self._stats, pid, frames, seconds)
+            _record(self.pool._stats, pid, frames, seconds)
+            return result
+
+    def worker_stats(self):
+        """Durchsatz pro Worker-Prozess in diesem Auftrag, wie AnalysisWorkerPool.worker_stats"""
+        return _throughput(self._stats)
+
+    def cancel(self):
+        # Laufende Worker prüfen das Event zwischen zwei Batches, wartende Chunks starten gar nicht erst
+        self.cancel_event.set()
+        for future in self.futures:
+            future.cancel()
+
+
+class AnalysisWorkerPool:
+    """
+    Langlebiger Prozess-Pool für die Stamina-Analyse, der von allen Anfragen geteilt wird.
+    Die Worker bleiben zwischen den Aufträgen warm (OpenCV bereits geladen), die Anzahl
+    gleichzeitiger Aufträge ist über ein Semaphor begrenzt.
+    """
+    def __init__(self, max_workers=None, max_concurrent_jobs=1, preload=True):
+        self.max_workers = max_workers or default_worker_count()
+        self.max_concurrent_jobs = max_concurrent_jobs
+        self.preload = preload
+        self._executor = None
+        self._manager = None
+        self._stats = {}
+        self._context = multiprocessing.get_context(START_METHOD)
+        if START_METHOD == "forkserver" and preload:
+            self._context.set_forkserver_preload(PRELOAD_MODULES)
+        self._semaphore = asyncio.Semaphore(max_concurrent_jobs)
+        self._start_lock = threading.Lock()
+        self._jobs = set()
+
+    @property
+    def running(self):
+        return self._executor is not None
+
+    def start(self, warm=True):
+        """
+        Startet Manager und Executor. Mit warm=True werden alle Worker sofort hochgefahren.
+        Blockiert bis dahin, aus dem Event-Loop daher über asyncio.to_thread(pool.start) aufrufen.
+        """
+        with self._start_lock:
+            if self._executor is not None:
+                return
+            self._manager = self._context.Manager()
+            self._start_executor()
+        if warm:
+            for future in [self._executor.submit(_warm_up) for _ in range(self.max_workers)]:
+                future.result()
+
+    def _start_executor(self):
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=self._context,
+            initializer=_init_worker if self.preload else None,
+        )
+
+    def _restart_executor(self, broken=None):
+        """Ersetzt den Executor. Mit broken nur, wenn ihn kein anderer Chunk schon ersetzt hat."""
+        if broken is not None and self._executor is not broken:
+            return
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        self._start_executor()
+
+    @contextlib.asynccontextmanager
+    async def job(self):
+        """
+        Reserviert einen Auftragsplatz und liefert ein AnalysisJob. Wird der wartende Task
+        abgebrochen oder tritt ein Fehler auf, werden die Chunks des Auftrags abgebrochen.
+        """
+        if self._executor is None:
+            await asyncio.to_thread(self.start, False)
+        async with self._semaphore:
+            job = AnalysisJob(self, self._manager.Event(), self._manager.Queue())
+            self._jobs.add(job)
+            try:
+                yield job
+            except BaseException:
+                job.cancel()
+                raise
+            finally:
+                self._jobs.discard(job)
+
+    def cancel_all(self):
+        for job in list(self._jobs):
+            job.cancel()
+
+    def worker_stats(self):
+        """Durchsatz pro Worker-Prozess über alle Aufträge: Aufträge, Frames, Rechenzeit und Frames pro Sekunde"""
+        return _throughput(self._stats)
+
+    def shutdown(self, wait=True):
+        """Bricht laufende Aufträge ab und beendet Worker und Manager"""
+        self.cancel_all()
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait, cancel_futures=True)
+            self._executor = None
+        if self._manager is not None:
+            self._manager.shutdown()
+            self._manager = None
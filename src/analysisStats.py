@@ -0,0 +1,205 @@
+import contextlib
+import cProfile
+import glob
+import io
+import os
+import pstats
+import threading
+import time
+from collections import Counter
+
+# Phasen pro Frame in der Reihenfolge der Verarbeitung, grobe Abschnitte (training, analysis) kommen dazu
+FRAME_PHASES = ("decode", "skip", "hud", "color", "mask", "morphology", "edges", "contours", "state")
+
+# Histogramm-Grenzen in Mikrosekunden (Zweierpotenzen), der letzte Eimer nimmt alles darüber auf
+HISTOGRAM_BOUNDS_US = tuple(2 ** i for i in range(25))
+
+
+class PhaseStats:
+    """Anzahl, Summe, Minimum, Maximum und ein log2-Histogramm der Dauer einer Phase"""
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+        self.histogram = [0] * (len(HISTOGRAM_BOUNDS_US) + 1)
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        if seconds < self.min:
+            self.min = seconds
+        if seconds > self.max:
+            self.max = seconds
+        # Eimer i zählt Dauern bis 2**i µs
+        self.histogram[min(int(seconds * 1e6).bit_length(), len(HISTOGRAM_BOUNDS_US))] += 1
+
+    def merge(self, other):
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.histogram = [a + b for a, b in zip(self.histogram, other.histogram)]
+
+    def percentile(self, fraction):
+        """Obergrenze des Histogramm-Eimers, in dem das Perzentil liegt (Sekunden)"""
+        if self.count == 0:
+            return 0.0
+        rank = fraction * self.count
+        seen = 0
+        for index, count in enumerate(self.histogram):
+            seen += count
+            if seen >= rank and count:
+                return HISTOGRAM_BOUNDS_US[index] / 1e6 if index < len(HISTOGRAM_BOUNDS_US) else self.max
+        return self.max
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "total_seconds": self.total,
+            "mean_ms": self.total / self.count * 1e3 if self.count else 0.0,
+            "min_ms": self.min * 1e3 if self.count else 0.0,
+            "max_ms": self.max * 1e3,
+            "p50_ms": self.percentile(0.5) * 1e3,
+            "p95_ms": self.percentile(0.95) * 1e3,
+            "histogram_us": {
+                (f"<={HISTOGRAM_BOUNDS_US[i]}" if i < len(HISTOGRAM_BOUNDS_US) else f">{HISTOGRAM_BOUNDS_US[-1]}"): count
+                for i, count in enumerate(self.histogram) if count
+            },
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        stats = cls()
+        stats.count = data["count"]
+        stats.total = data["total_seconds"]
+        stats.min = data["min_ms"] / 1e3 if stats.count else float("inf")
+        stats.max = data["max_ms"] / 1e3
+        for label, count in data["histogram_us"].items():
+            bound = int(label.lstrip("<=>"))
+            index = HISTOGRAM_BOUNDS_US.index(bound) + (1 if label.startswith(">") else 0)
+            stats.histogram[index] = count
+        return stats
+
+
+class AnalysisStats:
+    """
+    Messwerte eines Analyseauftrags: Dauer pro Phase und Frame (Dekodierung, Farbumrechnung, Maske,
+    Kanten/Morphologie, Konturen, Zustandsautomat), Zähler, Statistik pro Block bzw. Chunk und optional
+    ein cProfile-Profil. Die Messung kostet pro Phase zwei perf_counter-Aufrufe. Ein Objekt wird von
+    einem Thread zur Zeit beschrieben, wie die Blöcke im Analyzer, die nacheinander laufen.
+    """
+    def __init__(self, profile=False):
+        self.phases = {}
+        self.counters = Counter()
+        self.blocks = []
+        self.profile = profile
+        self._profiler = cProfile.Profile() if profile else None
+
+    def add(self, phase, seconds):
+        stats = self.phases.get(phase)
+        if stats is None:
+            stats = self.phases[phase] = PhaseStats()
+        stats.add(seconds)
+
+    def count(self, name, amount=1):
+        self.counters[name] += amount
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """Für grobe Abschnitte (Training, Analyse), in Frame-Schleifen direkt add() mit perf_counter nutzen"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def add_block(self, **info):
+        """Eine Zeile der Block- bzw. Chunk-Statistik, z.B. erster Frame, Frames, Sekunden, Worker"""
+        info.setdefault("thread", threading.current_thread().name)
+        self.blocks.append(info)
+
+    @contextlib.contextmanager
+    def profiling(self):
+        """
+        Profiliert den Block im aufrufenden Thread, falls profile gesetzt ist. Mehrere Blöcke (auch aus
+        wechselnden Threads des Executors) landen im selben Profil, solange sie nacheinander laufen.
+        """
+        if self._profiler is None:
+            yield
+            return
+        self._profiler.enable()
+        try:
+            yield
+        finally:
+            self._profiler.disable()
+
+    def merge(self, other):
+        """Übernimmt die Messwerte eines anderen AnalysisStats oder dessen to_dict() (z.B. aus einem Worker)"""
+        if isinstance(other, dict):
+            other = AnalysisStats.from_dict(other)
+        for name, stats in other.phases.items():
+            if name in self.phases:
+                self.phases[name].merge(stats)
+            else:
+                self.phases[name] = stats
+        self.counters.update(other.counters)
+        self.blocks.extend(other.blocks)
+
+    def profile_text(self, limit=40):
+        """Die teuersten Funktionen nach kumulierter Zeit, leer ohne Profil"""
+        if self._profiler is None:
+            return ""
+        stream = io.StringIO()
+        try:
+            pstats.Stats(self._profiler, stream=stream).sort_stats("cumulative").print_stats(limit)
+        except TypeError:
+            return ""  # Profil ohne Einträge
+        return stream.getvalue()
+
+    def dump_profile(self, path):
+        """Speichert das Profil im pstats-Format (z.B. für snakeviz), False ohne Profil"""
+        if self._profiler is None:
+            return False
+        self._profiler.dump_stats(path)
+        return True
+
+    def to_dict(self):
+        return {
+            "phases": {name: stats.to_dict() for name, stats in self.phases.items()},
+            "counters": dict(self.counters),
+            "blocks": list(self.blocks),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        stats = cls()
+        stats.phases = {name: PhaseStats.from_dict(phase) for name, phase in data.get("phases", {}).items()}
+        stats.counters.update(data.get("counters", {}))
+        stats.blocks = list(data.get("blocks", []))
+        return stats
+
+    def summary(self, names=FRAME_PHASES):
+        """Kurzer Text: Gesamtzeit, Anteil und mittlere Dauer der Phasen pro Frame"""
+        total = sum(self.phases[name].total for name in names if name in self.phases) or 1.0
+        lines = []
+        for name in names:
+            stats = self.phases.get(name)
+            if stats is None:
+                continue
+            lines.append(f"{name}: {stats.total:.2f}s ({stats.total / total:.0%}), "
+                         f"Ø {stats.total / stats.count * 1e3:.2f} ms × {stats.count:,}")
+        return "\n".join(lines)
+
+
+def prune_exports(folder, keep, pattern="job-*.json"):
+    """
+    Behält die keep neuesten exportierten Messwerte in folder und löscht ältere samt ihrer
+    Profile (<datei>.*.prof, siehe export_stats der Analyzer). Gibt die Anzahl gelöschter Exporte zurück.
+    """
+    exports = sorted(glob.glob(os.path.join(folder, pattern)), key=os.path.getmtime, reverse=True)
+    for path in exports[keep:]:
+        for file in [path, *glob.glob(glob.escape(path) + ".*.prof")]:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(file)
+    return len(exports[keep:])
@@ -16,12 +16,18 @@ import spreadsheet.payoutlist
 import spreadsheet.stats
 import spreadsheet.urlaub
 from videoAnalyzerOld import VideoAnalyzer
-from collections import deque
 from google import genai
 from logger import log
 import matplotlib
 import textExtract
 import jsonFileManager
+import analysisCache
+import downloadStore
+import staminaScheduler
+import staminaJobStore
+import analysisPool
+import analysisStats
+import rectangleMemory
 from typing import Optional
 import datetime
 from zoneinfo import ZoneInfo  # Erfordert Python 3.9+
@@ -46,8 +52,33 @@ GOOGLE_GEMINI_TOKEN = os.getenv("GOOGLE_GEMINI_TOKEN")
 
 DOWNLOAD_FOLDER = "./downloads/"
 OUTPUT_FOLDER = "./output/"
+ANALYSIS_CACHE_FOLDER = "./analysis_cache/"
+ANALYSIS_STATS_FOLDER = "./analysis_stats/"
 os.makedirs(DOWNLOAD_FOLDER, exist_ok=True)
 os.makedirs(OUTPUT_FOLDER, exist_ok=True)
+os.makedirs(ANALYSIS_STATS_FOLDER, exist_ok=True)
+
+# Ergebnisse von Stamina-Checks, nach Video-ID und Analyse-Parametern
+analysis_cache = analysisCache.AnalysisCache(ANALYSIS_CACHE_FOLDER)
+
+# Heruntergeladene Videos bleiben für erneute Checks liegen, bis das Speicherbudget voll ist
+DOWNLOAD_CACHE_MAX_GB = float(os.getenv("DOWNLOAD_CACHE_MAX_GB", "20"))
+download_store = downloadStore.DownloadStore(DOWNLOAD_FOLDER, max_bytes=int(DOWNLOAD_CACHE_MAX_GB * 1024**3))
+
+# Auflösungsstufen für den Stamina-Check: die kleinste zuerst, die nächste nur, wenn keine Stamina-Anzeige gefunden wird
+DOWNLOAD_HEIGHT_LADDER = [720, 1080]
+
+# Training auf verteilten Stichproben: endet, sobald das Rechteck stabil ist, spätestens nach dem Zeitbudget
+STAMINA_TRAINING_SAMPLES = 600
+STAMINA_TRAINING_BUDGET_SECONDS = 30
+
+# Messwerte jedes Stamina-Checks landen als JSON in ANALYSIS_STATS_FOLDER, mit cProfile nur per STAMINA_PROFILE=1.
+# Aufbewahrt werden die neuesten ANALYSIS_STATS_KEEP Aufträge samt Profilen
+STAMINA_PROFILE = os.getenv("STAMINA_PROFILE", "0") == "1"
+ANALYSIS_STATS_KEEP = int(os.getenv("ANALYSIS_STATS_KEEP", "200"))
+
+# Frames ohne HUD (Karte, Menüs) in der Analyse überspringen, nur per STAMINA_HUD_GATE=1
+STAMINA_HUD_GATE = os.getenv("STAMINA_HUD_GATE", "0") == "1"
 
 intents = discord.Intents.default()
 intents.message_content = True
@@ -58,8 +89,19 @@ tree = app_commands.CommandTree(bot)
 
 spreadsheet_acc = spreadsheet.authenticate.create_gspread_manager()
 
-stamina_lock = asyncio.Lock()
-stamina_queue = deque()
+# Gleichzeitige Stamina-Checks: getrennte Plätze für Downloads und Analysen (Standard nach Kernen/RAM)
+stamina_scheduler = staminaScheduler.StaminaScheduler(
+    download_slots=int(os.getenv("STAMINA_DOWNLOAD_SLOTS", "0")) or None,
+    analysis_slots=int(os.getenv("STAMINA_ANALYSIS_SLOTS", "0")) or None,
+    output_root=OUTPUT_FOLDER,
+)
+
+# Geteilter Prozess-Pool für analyze_video: startet in on_ready und bleibt zwischen den Stamina-Checks warm.
+# Jeder Analyseplatz des Schedulers bekommt einen Auftrag im Pool, die Worker teilen sich alle Aufträge
+analysis_worker_pool = analysisPool.AnalysisWorkerPool(
+    max_workers=int(os.getenv("STAMINA_ANALYSIS_WORKERS", "0")) or None,
+    max_concurrent_jobs=stamina_scheduler.analysis_slots,
+)
 
 def ensure_hidden_attribute(data):
     for channel_id, info in data.items():
@@ -76,6 +118,7 @@ WRITTEN_RAIDHELPERS_FILE = "./written_raidhelpers.json"
 EVENTS_FILE_PATH = "./scheduled_events.json"
 USER_CHANNEL_LINKS_FILE = "./user_channel_links.json"
 STORED_DM_MESSAGES_FILE = "./stored_dm_messages.json"
+RECTANGLE_MEMORY_FILE = "./stamina_rectangles.json"
 
 vod_channel_manager = jsonFileManager.JsonFileManager(VOD_CHANNELS_FILE_PATH, ensure_hidden_attribute)
 settings_manager = jsonFileManager.JsonFileManager(ROLE_NAME_UPDATE_SETTINGS_PATH)
@@ -85,6 +128,7 @@ written_raidhelpers_manager = jsonFileManager.JsonFileManager(WRITTEN_RAIDHELPER
 events_manager = jsonFileManager.JsonFileManager(EVENTS_FILE_PATH)
 user_channel_links_manager = jsonFileManager.JsonFileManager(USER_CHANNEL_LINKS_FILE)
 stored_dm_messages_manager = jsonFileManager.JsonFileManager(STORED_DM_MESSAGES_FILE)
+rectangle_memory = rectangleMemory.RectangleMemory(RECTANGLE_MEMORY_FILE)
 
 # Initialize SQLite database for level system
 DB_PATH = "./level_system.db"
@@ -429,6 +473,13 @@ def init_level_db():
 # Initialize database
 init_level_db()
 
+# Stamina-Checks überleben einen Neustart, Aufträge werden beim Start fortgesetzt
+stamina_job_store = staminaJobStore.StaminaJobStore(DB_PATH)
+# Ein Auftrag, der beim Beenden des Bots so oft lief, wird nicht erneut gestartet
+STAMINA_MAX_ATTEMPTS = 3
+stamina_jobs_resumed = False
+stamina_job_tasks = set()  # Referenzen auf fortgesetzte Aufträge, damit sie nicht eingesammelt werden
+
 # Store active voice users {user_id: {channel_id: start_time}}
 active_voice_users = {}
 # Track user activity in voice channels {user_id: {channel_id: {"start_time": timestamp, "last_spoke": timestamp, "is_muted": bool}}}
@@ -440,20 +491,23 @@ default_pattern = "{name} ({level}) [{icons}]"
 if "global_pattern" not in role_name_update_settings_cache:
     role_name_update_settings_cache["global_pattern"] = default_pattern
 
-async def edit_msg(interaction: discord.Interaction, msg_id: int, embed: discord.Embed):
+async def edit_msg(channel: discord.abc.Messageable, msg_id: int, embed: discord.Embed):
     try:
-        msg = await interaction.channel.fetch_message(msg_id)
+        msg = await channel.fetch_message(msg_id)
         if msg:
             await msg.edit(embed=embed)
     except (discord.NotFound, discord.HTTPException) as e:
         log.error(f"Message wurde wahrscheinlich gelöscht: {str(e)}")
 
-async def download_video(youtube_url, on_patch_network=None):
-    video_path = f"{DOWNLOAD_FOLDER}video.mp4"
+async def download_video(youtube_url, on_patch_network=None, video_path=None, max_height=1080):
+    video_path = video_path or f"{DOWNLOAD_FOLDER}video.mp4"
     ydl_opts = {
         "outtmpl": video_path,
-        'format': 'bestvideo[height<=1080]+bestaudio/best',
-        'merge_output_format': 'mp4',
+        # Nur die Videospur (kein Audio, kein Merge), H.264 bevorzugt, weil es am schnellsten dekodiert
+        'format': (
+            f'bestvideo[height<={max_height}][vcodec^=avc1]/bestvideo[height<={max_height}]'
+            f'/best[height<={max_height}]/best'
+        ),
     }
     max_retries = 10
     attempt = 0
@@ -490,7 +544,7 @@ async def download_video(youtube_url, on_patch_network=None):
                 raise
     return video_path
 
-async def send_images(interaction: discord.Interaction, folder_path: str):
+async def send_images(channel: discord.abc.Messageable, folder_path: str):
     """Sendet alle Bilder aus einem Ordner in 10er-Blöcken als ephemere Nachrichten."""
     # Liste der zu ignorierenden Dateien (Diagnose-Bilder)
     ignore_files = ["oos_histogram.png", "stamina_level.png", "stamina_color.png", "detected_stamina.jpg"]
@@ -498,7 +552,7 @@ async def send_images(interaction: discord.Interaction, folder_path: str):
     files = [f for f in os.listdir(folder_path) if f.endswith(('.png', '.jpg', '.jpeg', '.gif')) and f not in ignore_files]
 
     if not files:
-        await interaction.channel.send("Keine Bilder im Ordner gefunden.")
+        await channel.send("Keine Bilder im Ordner gefunden.")
         return
 
     # In 10er-Gruppen aufteilen
@@ -513,7 +567,7 @@ async def send_images(interaction: discord.Interaction, folder_path: str):
                 file_objects.append(discord.File(file_path, filename=file))
 
         if file_objects:
-            await interaction.channel.send(files=file_objects)
+            await channel.send(files=file_objects)
 
 def format_time(seconds):
     """Wandelt Sekunden in ein MM:SS Format um."""
@@ -523,9 +577,106 @@ def format_time(seconds):
     seconds = int(seconds % 60)
     return f"{minutes:02}:{seconds:02}"
 
+async def find_cached_rectangle(video_analyzer, video_id, cache_params, training_frame_count, user_id=None):
+    """
+    Nutzt das gespeicherte Rechteck des Videos. Sonst wird das zuletzt für diesen Spieler und diese
+    Auflösung gefundene Rechteck auf wenigen Frames geprüft und nur trainiert, wenn es nicht passt
+    (z.B. nach geänderter HUD-Skalierung).
+    """
+    if video_id:
+        cached = await asyncio.to_thread(analysis_cache.load, video_id, "rectangle", cache_params["rectangle"])
+        if cached:
+            log.info(f"Stamina-Rechteck für {video_id} aus dem Cache")
+            return tuple(cached["rectangle"])
+
+    stable_rectangle = None
+    confirmed = False
+    remembered = await rectangle_memory.recall(user_id, video_analyzer) if user_id is not None else None
+    if remembered:
+        confirmed = await video_analyzer.verify_rectangle(
+            remembered["rectangle"], remembered["lower_yellow"], remembered["upper_yellow"]
+        )
+        if confirmed:
+            log.info(f"Gemerktes Stamina-Rechteck von {user_id} bestätigt, Training übersprungen")
+            stable_rectangle = tuple(remembered["rectangle"])
+        else:
+            log.info(f"Gemerktes Stamina-Rechteck von {user_id} passt nicht mehr, trainiere neu")
+
+    if stable_rectangle is None:
+        stable_rectangle = await video_analyzer.find_stable_rectangle(training_frame_count)
+    if stable_rectangle is not None and user_id is not None:
+        await rectangle_memory.remember(user_id, video_analyzer, stable_rectangle, confirmed)
+    if stable_rectangle is not None and video_id:
+        await asyncio.to_thread(analysis_cache.store, video_id, "rectangle", cache_params["rectangle"],
+                                {"rectangle": list(stable_rectangle)})
+    return stable_rectangle
+
+async def analyze_cached(video_analyzer, video_id, cache_params, stable_rectangle, on_progress=None, debug_mode=False):
+    """
+    Führt analyze_video aus oder nutzt den Ergebnis-Cache. Ist nur die Messreihe gespeichert (z.B. ohne
+    Ergebnis nach einem Abbruch), werden die OOS-Momente daraus neu berechnet. Geänderte Schwellwerte
+    gehören zum Schlüssel der Messreihe und lösen eine neue Analyse aus.
+    Im Debug-Modus läuft die Analyse immer, damit die Debug-Bilder entstehen.
+    """
+    series_params = {**cache_params["series"], "rectangle": list(stable_rectangle)}
+    events_params = {**series_params, **cache_params["events"]}
+
+    if video_id and not debug_mode:
+        series = await asyncio.to_thread(analysis_cache.load, video_id, "series", series_params)
+        if series is not None:
+            events = await asyncio.to_thread(analysis_cache.load, video_id, "events", events_params)
+            if events is None:
+                events = {"timestamps": video_analyzer.timestamps_from_series(series["ratios"], series["bar_matches"])}
+                await asyncio.to_thread(analysis_cache.store, video_id, "events", events_params, events)
+            log.info(f"Analyseergebnis für {video_id} aus dem Cache")
+            return events["timestamps"], video_analyzer.series_from_arrays(series)
+
+    timestamps, series = await video_analyzer.analyze_video(stable_rectangle, on_progress)
+    if video_id:
+        await asyncio.to_thread(analysis_cache.store, video_id, "series", series_params,
+                                video_analyzer.series_arrays(series))
+        await asyncio.to_thread(analysis_cache.store, video_id, "events", events_params, {"timestamps": timestamps})
+    return timestamps, series
+
 @tree.command(name="stamina_check", description="Analysiert ein YouTube-Video auf Stamina-Null-Zustände.")
 async def stamina_check(interaction: discord.Interaction, youtube_url: str, debug_mode: bool = False):
+    log.info(f"Neue anfrage von {interaction.user.display_name}, warteschlange ist {stamina_scheduler.queue_length + 1}")
 
+    base_msg = discord.Embed(
+        title="🏁 Stamina Check startet gleich!",
+        description="🔍 Bereite alles vor...\n\n⚙️ **Warteschlange wird organisiert...**\n\n🕐 Bitte habe etwas Geduld!",
+        color=discord.Color.blue()
+    )
+    await interaction.response.send_message(embed=base_msg, ephemeral=True)
+
+    video_key = analysisCache.extract_video_id(youtube_url) or downloadStore.url_key(youtube_url)
+    job_id, created = stamina_job_store.enqueue(
+        interaction.user.id, interaction.channel.id, youtube_url, video_key, debug_mode
+    )
+    if not created:
+        embed = discord.Embed(
+            title="⏳ Schon in der Warteschlange",
+            description="Dieses Video ist für dich bereits in Bearbeitung, du bekommst das Ergebnis in der bestehenden Nachricht.",
+            color=discord.Color.blue()
+        )
+        await interaction.followup.send(embed=embed, ephemeral=True)
+        return
+
+    embed = discord.Embed(
+        title="⏳ Warteschlange",
+        description="Du bist in der Warteschlange.",
+        color=discord.Color.blue()
+    )
+    msg = await interaction.followup.send(embed=embed, wait=True)
+    stamina_job_store.set_message(job_id, msg.id)
+    await run_stamina_job(job_id, interaction.channel, interaction.user, msg.id, youtube_url, debug_mode, embed)
+
+async def run_stamina_job(job_id, channel, user, msg_id, youtube_url, debug_mode, embed):
+    """
+    Führt einen gespeicherten Stamina-Check aus: Warteschlange, Download, Training, Analyse.
+    Wird von /stamina_check und beim Start für unterbrochene Aufträge aufgerufen, der Fortschritt
+    landet in der Nachricht msg_id und der Zustand in stamina_job_store.
+    """
     async def send_image(path, filename, description=None):
         """Sendet ein Bild an den Channel, überprüft die Existenz und fügt Fehlerbehandlung hinzu"""
         try:
@@ -548,124 +699,146 @@ async def stamina_check(interaction: discord.Interaction, youtube_url: str, debu
             # Wenn eine Beschreibung vorhanden ist, sende sie mit dem Bild
             if description:
                 embed = discord.Embed(description=description, color=discord.Color.blue())
-                await interaction.channel.send(file=discord.File(path, filename=filename), embed=embed)
+                await channel.send(file=discord.File(path, filename=filename), embed=embed)
             else:
-                await interaction.channel.send(file=discord.File(path, filename=filename))
+                await channel.send(file=discord.File(path, filename=filename))
             return True
         except Exception as e:
             log.error(f"Fehler beim Senden des Bildes {path}: {str(e)}")
             return False
 
 
-    stamina_queue.append(interaction.id)
-    position = len(stamina_queue)
-
-    log.info(f"Neue anfrage von {interaction.user.display_name}, warteschlange ist {len(stamina_queue)}")
-
-    base_msg = discord.Embed(
-        title="🏁 Stamina Check startet gleich!",
-        description="🔍 Bereite alles vor...\n\n⚙️ **Warteschlange wird organisiert...**\n\n🕐 Bitte habe etwas Geduld!",
-        color=discord.Color.blue()
-    )
-
-    embed = discord.Embed(
-        title="⏳ Warteschlange",
-        description=f"Du bist auf Platz {position} in der Warteschlange.",
-        color=discord.Color.blue()
-    )
-    await interaction.response.send_message(embed=base_msg, ephemeral=True)
-    
-    msg = await interaction.followup.send(embed=embed, wait=True)
-
-    while stamina_queue[0] != interaction.id:
-        await asyncio.sleep(10)
-        new_position = stamina_queue.index(interaction.id) + 1
-        embed.description = f"Du bist jetzt auf Platz {new_position} in der Warteschlange."
-        await edit_msg(interaction, msg.id, embed)
+    async def on_position(position):
+        # Wird vom Scheduler aufgerufen, sobald sich der Platz ändert
+        if job.state != "queued":
+            return
+        embed.description = f"Du bist jetzt auf Platz {position} in der Warteschlange."
+        await edit_msg(channel, msg_id, embed)
 
-    embed.description = "Du bist als nächstes drann."
-    await edit_msg(interaction, msg.id, embed)
+    job = stamina_scheduler.submit(user.id, on_position)
+    try:
+        await job.wait_turn()
+    except asyncio.CancelledError:
+        if not job.cancel_requested:
+            raise  # Bot wird beendet, der Auftrag bleibt gespeichert und läuft beim nächsten Start weiter
+        stamina_job_store.fail(job_id, "Abgebrochen", state="cancelled")
+        embed.title = "🛑 Abgebrochen"
+        embed.description = "Dein Stamina-Check wurde aus der Warteschlange entfernt."
+        embed.color = discord.Color.orange()
+        await edit_msg(channel, msg_id, embed)
+        return
 
-    async with stamina_lock:
-        stamina_queue.popleft()
+    async with job:
+        if not stamina_job_store.start_attempt(job_id):
+            log.info(f"Stamina-Auftrag {job_id} ist bereits abgeschlossen")
+            return
+        video_key = analysisCache.extract_video_id(youtube_url) or downloadStore.url_key(youtube_url)
+        store_key = None
         try:
-            log.info(f"Geht los für {interaction.user.display_name}")
+            log.info(f"Geht los für {user.display_name}")
 
-            shutil.rmtree(DOWNLOAD_FOLDER, ignore_errors=True)
-            shutil.rmtree(OUTPUT_FOLDER, ignore_errors=True)
-            os.makedirs(DOWNLOAD_FOLDER, exist_ok=True)
-            os.makedirs(OUTPUT_FOLDER, exist_ok=True)
-
-            embed.title = "📥 Video-Download"
-            embed.description = "Lade Video herunter..."
-            await edit_msg(interaction, msg.id, embed)
-
-            log.info("Starte Download")
             time_start_download = time.time()
             async def on_patch_network():
                 try:
                     embed.description = "🕵️‍♂️ Psst! Ich schleiche mich gerade an der YouTube Firewall vorbei... *tippt sich an die Nase und setzt Sonnenbrille auf* 😎 (Damit die YouTube Firewall nicht erkennt, dass ich ein Bot bin)"
-                    await edit_msg(interaction, msg.id, embed)
+                    await edit_msg(channel, msg_id, embed)
                 except Exception as e:
                     log.error(f"Fehler beim Senden der Patch-Nachricht: {e}")
-            try:
-                video_path = await download_video(youtube_url, on_patch_network=on_patch_network)
-                time_end_download = time.time()
-            except ValueError as e:
-                if str(e) == "PRIVATE_VIDEO":
-                    embed.title = "❌ Privates Video"
-                    embed.description = "Das von dir bereitgestellte Video ist privat und kann nicht analysiert werden. Bitte stelle sicher, dass das Video öffentlich oder als 'nicht gelistet' markiert ist."
-                    embed.color = discord.Color.red()
-                    await edit_msg(interaction, msg.id, embed)
-                    return
-                else:
-                    raise
 
-            # Video-Informationen anzeigen
-            cap = cv2.VideoCapture(video_path)
-            frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-            frame_width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-            frame_height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-            fps = cap.get(cv2.CAP_PROP_FPS)
-            duration = frame_count / fps if fps > 0 else 0
-            cap.release()
+            async def on_height(max_height):
+                if max_height != DOWNLOAD_HEIGHT_LADDER[0]:
+                    log.warning(f"Keine Stamina-Anzeige in {video_key} gefunden, versuche {max_height}p")
+                # Jede Stufe beginnt wieder mit dem Download, auch nach dem Training der vorigen
+                stamina_job_store.set_state(job_id, "downloading")
+                embed.title = "📥 Video-Download"
+                embed.description = f"Lade Video herunter ({max_height}p)..."
+                await edit_msg(channel, msg_id, embed)
+                log.info(f"Starte Download ({max_height}p)")
+
+            async def download(path, max_height):
+                async with stamina_scheduler.download_slot():
+                    await download_video(youtube_url, on_patch_network=on_patch_network, video_path=path,
+                                         max_height=max_height)
+
+            stable_rectangle = None
+            ladder = download_store.ladder(video_key, DOWNLOAD_HEIGHT_LADDER, download, on_height)
+            while True:
+                try:
+                    max_height, store_key, video_path = await anext(ladder)
+                    time_end_download = time.time()
+                except StopAsyncIteration:
+                    store_key = None
+                    break
+                except ValueError as e:
+                    if str(e) == "PRIVATE_VIDEO":
+                        embed.title = "❌ Privates Video"
+                        embed.description = "Das von dir bereitgestellte Video ist privat und kann nicht analysiert werden. Bitte stelle sicher, dass das Video öffentlich oder als 'nicht gelistet' markiert ist."
+                        embed.color = discord.Color.red()
+                        await edit_msg(channel, msg_id, embed)
+                        stamina_job_store.fail(job_id, "PRIVATE_VIDEO")
+                        return
+                    else:
+                        raise
+
+                # Video-Informationen anzeigen
+                cap = cv2.VideoCapture(video_path)
+                frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+                frame_width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+                frame_height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+                fps = cap.get(cv2.CAP_PROP_FPS)
+                duration = frame_count / fps if fps > 0 else 0
+                cap.release()
             
-            if debug_mode:
-                video_info_embed = discord.Embed(
-                    title="🎬 Video-Informationen",
-                    description=(
-                        f"**Auflösung:** {frame_width}x{frame_height} Pixel\n"
-                        f"**Framerate:** {fps:.2f} FPS\n"
-                        f"**Frames:** {frame_count:,}\n"
-                        f"**Dauer:** {duration/60:.1f} Minuten\n"
-                        f"**Download-Zeit:** {format_time(time_end_download - time_start_download)}"
-                    ),
-                    color=discord.Color.blue()
-                )
-                await interaction.channel.send(embed=video_info_embed)
+                if debug_mode:
+                    video_info_embed = discord.Embed(
+                        title="🎬 Video-Informationen",
+                        description=(
+                            f"**Auflösung:** {frame_width}x{frame_height} Pixel\n"
+                            f"**Framerate:** {fps:.2f} FPS\n"
+                            f"**Frames:** {frame_count:,}\n"
+                            f"**Dauer:** {duration/60:.1f} Minuten\n"
+                            f"**Download-Zeit:** {format_time(time_end_download - time_start_download)}"
+                        ),
+                        color=discord.Color.blue()
+                    )
+                    await channel.send(embed=video_info_embed)
             
-            video_analyzer = VideoAnalyzer(video_path, debug=debug_mode)
-            skip_first_frames = 100
-            skip_first_frames = skip_first_frames if skip_first_frames > video_analyzer.frame_count else 0 
-            training_frame_count = int(video_analyzer.frame_count * 0.8)
-
-            embed.title = "🚀 Training läuft"
-            embed.description = (
-                f"Trainiere Algorithmus mit {training_frame_count:,} von {video_analyzer.frame_count:,} Frames...\n\n"
-                f"Der Bot sucht gerade die Stamina-Anzeige im Video."
-            )
-            await edit_msg(interaction, msg.id, embed)
-
-            log.info("Starte Training")
-            time_start_training = time.time()
-            stable_rectangle = await video_analyzer.find_stable_rectangle(training_frame_count)
-            time_end_training = time.time()
+                video_analyzer = VideoAnalyzer(video_path, output_dir=job.output_dir, debug=debug_mode,
+                                               worker_pool=analysis_worker_pool)
+                video_analyzer.training_samples = STAMINA_TRAINING_SAMPLES
+                video_analyzer.training_time_budget = STAMINA_TRAINING_BUDGET_SECONDS
+                video_analyzer.profile = STAMINA_PROFILE
+                video_analyzer.hud_gate = STAMINA_HUD_GATE
+                skip_first_frames = 100
+                skip_first_frames = skip_first_frames if skip_first_frames > video_analyzer.frame_count else 0 
+                training_frame_count = int(video_analyzer.frame_count * 0.8)
+                video_id = analysisCache.extract_video_id(youtube_url)
+                cache_params = video_analyzer.cache_parameters(training_frame_count)
+
+                stamina_job_store.set_state(job_id, "training")
+                embed.title = "🚀 Training läuft"
+                embed.description = (
+                    f"Trainiere Algorithmus mit bis zu {STAMINA_TRAINING_SAMPLES:,} Stichproben aus "
+                    f"{training_frame_count:,} von {video_analyzer.frame_count:,} Frames...\n\n"
+                    f"Der Bot sucht gerade die Stamina-Anzeige im Video."
+                )
+                await edit_msg(channel, msg_id, embed)
+
+                log.info("Starte Training")
+                time_start_training = time.time()
+                async with stamina_scheduler.analysis_slot():
+                    stable_rectangle = await find_cached_rectangle(video_analyzer, video_id, cache_params, training_frame_count, user.id)
+                time_end_training = time.time()
+                if stable_rectangle is not None:
+                    break
+                store_key = None  # die nächste Stufe der Leiter gibt dieses Video frei
 
             if stable_rectangle is None:
                 embed.title = "❌ Fehler beim Training"
                 embed.description = "Konnte keine stabile Stamina-Anzeige im Video finden. Bitte überprüfe das Video oder versuche es mit einem anderen Video."
                 embed.color = discord.Color.red()
-                await edit_msg(interaction, msg.id, embed)
+                await edit_msg(channel, msg_id, embed)
+                stamina_job_store.fail(job_id, "Keine Stamina-Anzeige gefunden")
                 return
 
             if debug_mode:
@@ -689,7 +862,7 @@ async def stamina_check(interaction: discord.Interaction, youtube_url: str, debu
                                 cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
                     
                     # Speichern und anzeigen
-                    debug_path = os.path.join(OUTPUT_FOLDER, "detected_stamina.jpg")
+                    debug_path = os.path.join(job.output_dir, "detected_stamina.jpg")
                     cv2.imwrite(debug_path, debug_frame)
                 
                 embed.title = "🎯 Stamina-Anzeige gefunden"
@@ -700,7 +873,7 @@ async def stamina_check(interaction: discord.Interaction, youtube_url: str, debu
                     f"**Trainingszeit:** {format_time(time_end_training - time_start_training)}\n"
                     f"Starte jetzt die vollständige Analyse..."
                 )
-                await edit_msg(interaction, msg.id, embed)
+                await edit_msg(channel, msg_id, embed)
                 
                 # Sende Debug-Bild
                 await send_image(debug_path, "detected_stamina.jpg", 
@@ -708,7 +881,7 @@ async def stamina_check(interaction: discord.Interaction, youtube_url: str, debu
             else:
                 embed.title = "🔍 Analyse läuft"
                 embed.description = f"Analysiere {video_analyzer.frame_count:,} Frames..."
-                await edit_msg(interaction, msg.id, embed)
+                await edit_msg(channel, msg_id, embed)
 
             async def send_progress_update(processed: int, total: int):
                 progress_percent = (processed / total) * 100 if total > 0 else 0
@@ -729,12 +902,35 @@ async def stamina_check(interaction: discord.Interaction, youtube_url: str, debu
                 embed.add_field(name="Fortschritt", value=f"`{bar}` {progress_percent:.1f}%", inline=False)
                                 
                 log.info(f"Fortschritt: {processed} von {total} Frames analysiert.")
-                await edit_msg(interaction, msg.id, embed)
+                await edit_msg(channel, msg_id, embed)
 
+            stamina_job_store.set_state(job_id, "analyzing")
             log.info("Starte Analyse")
             time_start_analyze = time.time()
-            timestamps, stamina_data, hue_data = await video_analyzer.analyze_video(stable_rectangle, send_progress_update)
+            async with stamina_scheduler.analysis_slot():
+                timestamps, series = await analyze_cached(
+                    video_analyzer, video_id, cache_params, stable_rectangle, send_progress_update, debug_mode
+                )
             time_end_analyze = time.time()
+            if video_analyzer.worker_stats:
+                log.info(f"Worker-Durchsatz für Auftrag {job_id}: " + ", ".join(
+                    f"{pid}: {worker['frames']} Frames in {worker['seconds']:.1f}s ({worker['fps']:.0f} fps)"
+                    for pid, worker in video_analyzer.worker_stats.items()
+                ))
+            try:
+                await asyncio.to_thread(
+                    video_analyzer.export_stats, os.path.join(ANALYSIS_STATS_FOLDER, f"job-{job_id}.json"),
+                    job_id=job_id, video_id=video_id, frame_count=video_analyzer.frame_count,
+                    oos_events=len(timestamps),
+                    seconds={
+                        "download": time_end_download - time_start_download,
+                        "training": time_end_training - time_start_training,
+                        "analysis": time_end_analyze - time_start_analyze,
+                    },
+                )
+                await asyncio.to_thread(analysisStats.prune_exports, ANALYSIS_STATS_FOLDER, ANALYSIS_STATS_KEEP)
+            except OSError as e:
+                log.warning(f"Analyse-Statistik für Auftrag {job_id} nicht gespeichert: {e}")
 
             message = await get_feedback_message(len(timestamps), duration)
 
@@ -751,6 +947,9 @@ async def stamina_check(interaction: discord.Interaction, youtube_url: str, debu
                     f"- Analyse: {format_time(time_end_analyze - time_start_analyze)} ({((time_end_analyze - time_start_analyze)/total_time)*100:.1f}%)\n\n"
                     f"**Analysegeschwindigkeit:** {video_analyzer.frame_count / (time_end_analyze - time_start_analyze):.1f} Frames/Sekunde\n\n"
                 )
+                analysis_summary = video_analyzer.analysis_stats.summary()
+                if analysis_summary:
+                    t_info += f"**Zeit pro Phase (Analyse):**\n```\n{analysis_summary}\n```\n"
                 
                 # Zusätzliche Parameter-Informationen
                 t_info += (
@@ -781,7 +980,8 @@ async def stamina_check(interaction: discord.Interaction, youtube_url: str, debu
             embed.add_field(name="", value=message)
 
             embed.color = discord.Color.green()
-            await edit_msg(interaction, msg.id, embed)
+            await edit_msg(channel, msg_id, embed)
+            stamina_job_store.finish(job_id, {"timestamps": timestamps, "rectangle": list(stable_rectangle)})
             
             # Erstelle einen Histogramm der OOS-Ereignisse über die Zeit
             seconds = []
@@ -802,7 +1002,7 @@ async def stamina_check(interaction: discord.Interaction, youtube_url: str, debu
                     plt.grid(axis='y', alpha=0.75)
                     
                     # Speichern
-                    histogram_path = os.path.join(OUTPUT_FOLDER, "oos_histogram.png")
+                    histogram_path = os.path.join(job.output_dir, "oos_histogram.png")
                     plt.savefig(histogram_path)
                     plt.close()
                     
@@ -811,19 +1011,13 @@ async def stamina_check(interaction: discord.Interaction, youtube_url: str, debu
                                     "Verteilung der Out-of-Stamina Ereignisse über die Zeit")
             
             # Create and send stamina level graph
-            if stamina_data and debug_mode:
+            if len(series) and debug_mode:
                 plt.figure(figsize=(12, 6))
-                times = [t for t, _ in stamina_data]
-                levels = [level for _, level in stamina_data]
+                # Min/Max je Abschnitt, damit kurze Einbrüche trotz Ausdünnung sichtbar bleiben
+                times, levels = series.decimated(series.ratios, 1000)
                 
                 # Convert times to minutes for better readability
-                times_minutes = [t/60 for t in times]
-                
-                # Reduce data points if there are too many
-                if len(times_minutes) > 1000:
-                    step = len(times_minutes) // 1000
-                    times_minutes = times_minutes[::step]
-                    levels = levels[::step]
+                times_minutes = times / 60
                 
                 plt.plot(times_minutes, levels, 'g-', linewidth=1.5)
                 
@@ -839,12 +1033,12 @@ async def stamina_check(interaction: discord.Interaction, youtube_url: str, debu
                 plt.title('Stamina Level über die Zeit')
                 plt.xlabel('Zeit (Minuten)')
                 plt.ylabel('Stamina Füllstand (Gelb-Anteil)')
-                plt.ylim(0, min(1.0, max(levels) * 1.2))  # Set y-axis limits
+                plt.ylim(0, min(1.0, float(levels.max()) * 1.2 or 1.0))  # Set y-axis limits
                 plt.grid(True, alpha=0.3)
                 plt.legend()
                 
                 # Speichern
-                stamina_graph_path = os.path.join(OUTPUT_FOLDER, "stamina_level.png")
+                stamina_graph_path = os.path.join(job.output_dir, "stamina_level.png")
                 plt.savefig(stamina_graph_path)
                 plt.close()
                 
@@ -853,42 +1047,31 @@ async def stamina_check(interaction: discord.Interaction, youtube_url: str, debu
                                 "Stamina-Füllstand über die Dauer des Videos")
                 
             # Create and send hue graph if data is available
-            if hue_data and len(hue_data) > 10 and debug_mode:
+            if len(series) > 10 and debug_mode:
                 plt.figure(figsize=(12, 6))
                 
-                times = [t for t, _, _, _ in hue_data]
-                hues = [h for _, h, _, _ in hue_data]
-                saturations = [s for _, _, s, _ in hue_data]
-                values = [v for _, _, _, v in hue_data]
-                
-                # Convert times to minutes for better readability
-                times_minutes = [t/60 for t in times]
-                
-                # Reduce data points if there are too many
-                if len(times_minutes) > 1000:
-                    step = len(times_minutes) // 500
-                    times_minutes = times_minutes[::step]
-                    hues = hues[::step]
-                    saturations = saturations[::step]
-                    values = values[::step]
+                # Jede Farbkomponente einzeln per Min/Max ausgedünnt
+                (hue_times, hues), (saturation_times, saturations), (value_times, values) = (
+                    series.decimated(series.hsv[:, channel], 500) for channel in range(3)
+                )
                 
                 # Create subplot for different color components
                 fig, (ax1, ax2, ax3) = plt.subplots(3, 1, figsize=(12, 10), sharex=True)
                 
                 # Plot hue data
-                ax1.plot(times_minutes, hues, 'r-', linewidth=1.5)
+                ax1.plot(hue_times / 60, hues, 'r-', linewidth=1.5)
                 ax1.set_title('Farbton (Hue) der Stamina-Leiste')
                 ax1.set_ylabel('Hue (0-180)')
                 ax1.grid(True, alpha=0.3)
                 
                 # Plot saturation data
-                ax2.plot(times_minutes, saturations, 'g-', linewidth=1.5)
+                ax2.plot(saturation_times / 60, saturations, 'g-', linewidth=1.5)
                 ax2.set_title('Sättigung (Saturation) der Stamina-Leiste')
                 ax2.set_ylabel('Saturation (0-255)')
                 ax2.grid(True, alpha=0.3)
                 
                 # Plot value data
-                ax3.plot(times_minutes, values, 'b-', linewidth=1.5)
+                ax3.plot(value_times / 60, values, 'b-', linewidth=1.5)
                 ax3.set_title('Helligkeit (Value) der Stamina-Leiste')
                 ax3.set_xlabel('Zeit (Minuten)')
                 ax3.set_ylabel('Value (0-255)')
@@ -905,7 +1088,7 @@ async def stamina_check(interaction: discord.Interaction, youtube_url: str, debu
                 plt.tight_layout()
                 
                 # Speichern
-                hue_graph_path = os.path.join(OUTPUT_FOLDER, "stamina_color.png")
+                hue_graph_path = os.path.join(job.output_dir, "stamina_color.png")
                 plt.savefig(hue_graph_path)
                 plt.close()
                 
@@ -916,7 +1099,7 @@ async def stamina_check(interaction: discord.Interaction, youtube_url: str, debu
             # Zusätzliche Debug-Info, wenn Debug-Modus aktiviert
             if debug_mode:
                 # Sende zusätzliche Debug-Bilder
-                await send_images(interaction, OUTPUT_FOLDER)
+                await send_images(channel, job.output_dir)
             
                 # Sende zusammenfassendes Debug-Info-Embed
                 debug_summary = discord.Embed(
@@ -929,28 +1112,98 @@ async def stamina_check(interaction: discord.Interaction, youtube_url: str, debu
                     ),
                     color=discord.Color.gold()
                 )
-                await interaction.channel.send(embed=debug_summary)
+                await channel.send(embed=debug_summary)
+        except asyncio.CancelledError:
+            if not job.cancel_requested:
+                raise  # Bot wird beendet, der Auftrag läuft beim nächsten Start weiter
+            stamina_job_store.fail(job_id, "Abgebrochen", state="cancelled")
+            embed.title = "🛑 Abgebrochen"
+            embed.description = "Dein Stamina-Check wurde abgebrochen."
+            embed.color = discord.Color.orange()
+            await edit_msg(channel, msg_id, embed)
+            log.info(f"Stamina-Check von {user.display_name} abgebrochen")
+            return
         except Exception as e:
             embed.title = "❌ Fehler"
             embed.description = f"Es ist ein Fehler aufgetreten: {str(e)}\n\nBitte versuche es später erneut oder kontaktiere einen Administrator."
             embed.color = discord.Color.red()
-            await edit_msg(interaction, msg.id, embed)
+            await edit_msg(channel, msg_id, embed)
+            stamina_job_store.fail(job_id, e)
             log.error(f"Fehler bei Stamina-Check: {str(e)}")
+        finally:
+            if store_key is not None:
+                download_store.release(store_key)
 
         if debug_mode:
-            await interaction.channel.send("Debug-Modus: Analyse abgeschlossen. Alle Debug-Bilder wurden gesendet.")
+            await channel.send("Debug-Modus: Analyse abgeschlossen. Alle Debug-Bilder wurden gesendet.")
+
+        log.info(f"Anfrage Fertig von {user.display_name}")
 
-        log.info(f"Anfrage Fertig von {interaction.user.display_name}")
+async def resume_stamina_jobs():
+    """Setzt beim Start alle gespeicherten Stamina-Checks fort, die vor dem Neustart nicht fertig wurden"""
+    resumable, given_up = stamina_job_store.recover(STAMINA_MAX_ATTEMPTS)
+    for job in given_up:
+        log.warning(f"Stamina-Auftrag {job['id']} nach {job['attempts']} Versuchen aufgegeben: {job['youtube_url']}")
+        channel = bot.get_channel(int(job["channel_id"]))
+        if channel and job["message_id"]:
+            embed = discord.Embed(
+                title="❌ Fehler",
+                description=f"Die Analyse von {job['youtube_url']} ist mehrfach abgebrochen. Bitte kontaktiere einen Administrator.",
+                color=discord.Color.red()
+            )
+            await edit_msg(channel, int(job["message_id"]), embed)
+
+    for job in resumable:
+        channel = bot.get_channel(int(job["channel_id"]))
+        try:
+            user = bot.get_user(int(job["user_id"])) or await bot.fetch_user(int(job["user_id"]))
+        except discord.HTTPException:
+            user = None
+        if channel is None or user is None:
+            stamina_job_store.fail(job["id"], "Kanal oder Nutzer nicht mehr verfügbar")
+            continue
+
+        embed = discord.Embed(
+            title="⏳ Warteschlange",
+            description="Der Bot wurde neu gestartet, dein Stamina-Check wird fortgesetzt.",
+            color=discord.Color.blue()
+        )
+        if job["message_id"]:
+            msg_id = int(job["message_id"])
+            await edit_msg(channel, msg_id, embed)
+        else:
+            msg_id = (await channel.send(content=user.mention, embed=embed)).id
+            stamina_job_store.set_message(job["id"], msg_id)
+
+        log.info(f"Setze Stamina-Auftrag {job['id']} von {user.display_name} fort")
+        task = asyncio.create_task(
+            run_stamina_job(job["id"], channel, user, msg_id, job["youtube_url"], job["debug"], embed)
+        )
+        stamina_job_tasks.add(task)
+        task.add_done_callback(stamina_job_tasks.discard)
 
 @tree.command(name="get_queue_length", description="Zeit die länge der Warteschlange an.")
 async def get_queue_length(interaction: discord.Interaction):
     embed = discord.Embed(
         title="Warteschlange",
-        description=f"In der Warteschlange sind aktuell {len(stamina_queue)} VOD's.",
+        description=(
+            f"In der Warteschlange sind aktuell {stamina_scheduler.queue_length} VOD's, "
+            f"{stamina_scheduler.running_count} werden gerade bearbeitet."
+        ),
         color=discord.Color.blue()
     )
     await interaction.response.send_message(embed=embed)
 
+@tree.command(name="stamina_cancel", description="Bricht deine wartenden und laufenden Stamina-Checks ab.")
+async def stamina_cancel(interaction: discord.Interaction):
+    cancelled = stamina_scheduler.cancel_user(interaction.user.id)
+    embed = discord.Embed(
+        title="🛑 Stamina-Check abgebrochen" if cancelled else "Keine Stamina-Checks",
+        description=f"{cancelled} Stamina-Check(s) abgebrochen." if cancelled else "Du hast keine wartenden oder laufenden Stamina-Checks.",
+        color=discord.Color.orange() if cancelled else discord.Color.blue()
+    )
+    await interaction.response.send_message(embed=embed, ephemeral=True)
+
 async def get_feedback_message(stamina_events, video_duration_seconds):
     client = genai.Client(api_key=GOOGLE_GEMINI_TOKEN)
     # Convert seconds to minutes for better readability
@@ -995,6 +1248,14 @@ async def on_ready():
     if not process_scheduled_events.is_running():
         process_scheduled_events.start()
 
+    # on_ready läuft bei jedem Reconnect, gespeicherte Stamina-Checks nur einmal fortsetzen
+    global stamina_jobs_resumed
+    if not stamina_jobs_resumed:
+        stamina_jobs_resumed = True
+        # Worker hochfahren, ohne den Event-Loop zu blockieren (Import von OpenCV in jedem Prozess)
+        await asyncio.to_thread(analysis_worker_pool.start)
+        await resume_stamina_jobs()
+
     log.info(f"Bot ist eingeloggt als {bot.user}")
     try:
         synced = await tree.sync()
@@ -1082,20 +1343,18 @@ async def on_message(message: discord.Message):
         attempt = 0
         retries = 60
         while attempt < retries:
+            video_key = None
             try:
-                while stamina_queue[0] != message.id:
-                    await asyncio.sleep(10)
-
-                async with stamina_lock:
-                    attempt += 1
-                    stamina_queue.popleft()
-                    
-                    shutil.rmtree(DOWNLOAD_FOLDER)
-                    os.makedirs(DOWNLOAD_FOLDER, exist_ok=True)
-
+                attempt += 1
+                async with stamina_scheduler.submit(message.author.id) as job:
                     log.info(f"Bearbeite VOD hidden for {message.author.display_name}")
-                    video_path = await download_video(youtube_url)
-                    video_analyzer = VideoAnalyzer(video_path)
+                    store_key = analysisCache.extract_video_id(youtube_url) or downloadStore.url_key(youtube_url)
+                    async with stamina_scheduler.download_slot():
+                        video_path = await download_store.fetch(
+                            store_key, lambda path: download_video(youtube_url, video_path=path)
+                        )
+                    video_key = store_key
+                    video_analyzer = VideoAnalyzer(video_path, output_dir=job.output_dir, worker_pool=analysis_worker_pool)
                     skip_first_frames = 100
                     skip_first_frames = skip_first_frames if skip_first_frames > video_analyzer.frame_count else 0 
                     training_frame_count = int(video_analyzer.frame_count * 0.8)
@@ -1156,14 +1415,15 @@ async def on_message(message: discord.Message):
                     return
             except yt_dlp.utils.DownloadError as e:
                 log.error(f"Download Error: {str(e)}")
+            finally:
+                # Andere Aufträge laufen parallel, das Video darf erst nach der Analyse verdrängt werden
+                if video_key is not None:
+                    download_store.release(video_key)
             
             await asyncio.sleep(120)
             log.info(f"Putting VOD {message.id} from {message.author.display_name} back into queue.")
-            stamina_queue.append(message.id)
 
         log.warning(f"Max Retries reached for VOD from {message.author.display_name}, dropping VOD.")
-        if message.id in stamina_queue:
-            stamina_queue.remove(message.id)
 
         embed = discord.Embed()
         embed.title = f"❌ Dein video ist entweder noch nicht hochgeladen oder noch nicht verarbeitet von youtube! {youtube_url}"
@@ -6477,5 +6737,12 @@ async def guild_autocomplete(interaction: discord.Interaction, current: str):
 
     return choices[:25]
 
-bot.run(DISCORD_TOKEN)
+def main():
+    try:
+        bot.run(DISCORD_TOKEN)
+    finally:
+        analysis_worker_pool.shutdown()
 
+# Direkt gestartet importieren die Worker des Analyse-Pools diese Datei erneut, daher besser über main.py starten
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+import asyncio
+import contextlib
+import hashlib
+import os
+import shutil
+import tempfile
+from collections import Counter
+
+
+def url_key(url):
+    """Schlüssel für Links ohne erkennbare YouTube-Video-ID"""
+    return "url-" + hashlib.sha1(url.encode("utf-8")).hexdigest()[:16]
+
+
+class DownloadStore:
+    """
+    Ablage für heruntergeladene Videos, eine Datei pro Video-ID.
+
+    Downloads landen zuerst in einem temporären Ordner und werden erst nach Erfolg per
+    os.replace an ihren Platz verschoben, halbe Dateien bleiben so nie liegen. Gleichzeitige
+    Anfragen für dasselbe Video warten auf denselben Download. Überschreitet die Ablage ihr
+    Budget, werden die am längsten ungenutzten Videos gelöscht, außer sie sind gerade in Benutzung.
+    """
+    def __init__(self, directory, max_bytes=20 * 1024**3, extension=".mp4"):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.extension = extension
+        self._pending = {}
+        self._in_use = Counter()
+        os.makedirs(self.directory, exist_ok=True)
+        # Reste abgebrochener Downloads vom letzten Lauf entfernen
+        for name in os.listdir(self.directory):
+            if name.startswith(".tmp-"):
+                shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
+
+    def path(self, key):
+        return os.path.join(self.directory, f"{key}{self.extension}")
+
+    async def fetch(self, key, download):
+        """
+        Gibt den Pfad zum Video zurück und markiert es als in Benutzung (release() nicht vergessen).
+        download ist eine async-Funktion, die das Video unter dem übergebenen Pfad speichert.
+        """
+        self._in_use[key] += 1
+        try:
+            path = self.path(key)
+            if os.path.exists(path):
+                os.utime(path)
+                return path
+
+            pending = self._pending.get(key)
+            if pending is None:
+                pending = asyncio.ensure_future(self._download(key, download))
+                self._pending[key] = pending
+                pending.add_done_callback(lambda _: self._pending.pop(key, None))
+            # shield: bricht eine wartende Anfrage ab, läuft der Download für die anderen weiter
+            return await asyncio.shield(pending)
+        except BaseException:
+            self.release(key)
+            raise
+
+    def release(self, key):
+        self._in_use[key] -= 1
+        if self._in_use[key] <= 0:
+            del self._in_use[key]
+
+    @contextlib.asynccontextmanager
+    async def use(self, key, download):
+        path = await self.fetch(key, download)
+        try:
+            yield path
+        finally:
+            self.release(key)
+
+    async def ladder(self, key, heights, download, on_height=None):
+        """
+        Fallback-Leiter über Auflösungen (z.B. [720, 1080]): liefert der Reihe nach (height, store_key, path)
+        des Videos in jeder Höhe. download(path, height) speichert das Video, on_height(height) läuft vor
+        jedem Download. Wer die nächste Stufe anfordert, verwirft die vorige und sie wird freigegeben.
+        Endet die Schleife beim Aufrufer vorher (break oder Fehler), bleibt die aktuelle Stufe in Benutzung
+        (release(store_key) nicht vergessen).
+        """
+        for height in heights:
+            if on_height is not None:
+                await on_height(height)
+            store_key = f"{key}-{height}p"
+            path = await self.fetch(store_key, lambda path, height=height: download(path, height))
+            yield height, store_key, path
+            self.release(store_key)
+
+    async def _download(self, key, download):
+        temp_dir = tempfile.mkdtemp(prefix=f".tmp-{key}-", dir=self.directory)
+        try:
+            temp_path = os.path.join(temp_dir, f"video{self.extension}")
+            await download(temp_path)
+            path = self.path(key)
+            os.replace(temp_path, path)
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+        await asyncio.to_thread(self.evict)
+        return path
+
+    def evict(self):
+        """Löscht die am längsten ungenutzten Videos, bis das Budget eingehalten ist"""
+        in_use = {self.path(key) for key in self._in_use}
+        entries = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.startswith(".tmp-") or not os.path.isfile(path):
+                continue
+            stat = os.stat(path)
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_size <= self.max_bytes:
+                break
+            if path in in_use:
+                continue
+            os.remove(path)
+            total_size -= size
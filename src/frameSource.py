@@ -0,0 +1,396 @@
+import cv2
+import numpy as np
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+
+# Anzahl Farbkanäle je unterstütztem ffmpeg-Pixelformat
+PIXEL_FORMAT_CHANNELS = {
+    "bgr24": 3,
+    "rgb24": 3,
+    "gray": 1,
+}
+
+
+def ffmpeg_available():
+    """Prüft, ob ffmpeg im PATH liegt (im Docker-Image ist es installiert)"""
+    return shutil.which("ffmpeg") is not None
+
+
+def probe_video(video_path):
+    """Liest die Metadaten eines Videos über OpenCV, ohne Frames zu dekodieren"""
+    cap = cv2.VideoCapture(video_path)
+    info = {
+        "frame_count": int(cap.get(cv2.CAP_PROP_FRAME_COUNT)),
+        "width": int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+        "height": int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+        "fps": cap.get(cv2.CAP_PROP_FPS),
+    }
+    cap.release()
+    return info
+
+
+def probe_keyframes(video_path, fps=None, timeout=300):
+    """
+    Liest die Keyframe-Positionen (als Frame-Indizes) über ffprobe aus dem Container,
+    ohne die Frames zu dekodieren. Gibt None zurück, wenn ffprobe fehlt oder fehlschlägt.
+    """
+    ffprobe_path = shutil.which("ffprobe")
+    if ffprobe_path is None:
+        return None
+    fps = fps or probe_video(video_path)["fps"]
+    if not fps or fps <= 0:
+        return None
+    try:
+        result = subprocess.run(
+            [ffprobe_path, "-v", "error", "-select_streams", "v:0",
+             "-show_entries", "packet=pts_time,flags", "-of", "csv=p=0", video_path],
+            capture_output=True, text=True, timeout=timeout,
+        )
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    if result.returncode != 0:
+        return None
+
+    times = []
+    key_times = []
+    for line in result.stdout.splitlines():
+        parts = line.strip().split(",")
+        if len(parts) < 2 or parts[0] in ("", "N/A"):
+            continue
+        try:
+            pts_time = float(parts[0])
+        except ValueError:
+            continue
+        times.append(pts_time)
+        if "K" in parts[1]:
+            key_times.append(pts_time)
+    if not key_times:
+        return None
+
+    # Zeitstempel beginnen nicht immer bei 0 (z.B. Edit-Lists bei YouTube-Downloads)
+    origin = min(times)
+    return sorted({int(round((pts_time - origin) * fps)) for pts_time in key_times})
+
+
+def clip_crop(crop, width, height):
+    """Begrenzt ein (x, y, w, h)-Rechteck auf die Framegröße"""
+    x, y, w, h = crop
+    x0, y0 = max(0, int(x)), max(0, int(y))
+    x1, y1 = min(int(x + w), width), min(int(y + h), height)
+    return x0, y0, max(0, x1 - x0), max(0, y1 - y0)
+
+
+class OpenCVFrameSource:
+    """
+    Frame-Quelle über cv2.VideoCapture. Dekodiert immer volle Frames und schneidet
+    den optionalen Crop-Bereich anschließend als View aus.
+    """
+    def __init__(self, video_path, crop=None, start_frame=0, info=None):
+        self.video_path = video_path
+        self.cap = cv2.VideoCapture(video_path)
+        info = info or {
+            "frame_count": int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT)),
+            "width": int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            "height": int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            "fps": self.cap.get(cv2.CAP_PROP_FPS),
+        }
+        self.frame_count = info["frame_count"]
+        self.width = info["width"]
+        self.height = info["height"]
+        self.fps = info["fps"]
+        self.crop = clip_crop(crop, self.width, self.height) if crop is not None else None
+        self.position = 0
+        if start_frame:
+            self.seek(start_frame)
+
+    @property
+    def frame_shape(self):
+        if self.crop is None:
+            return (self.height, self.width, 3)
+        return (self.crop[3], self.crop[2], 3)
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def seek(self, frame_number):
+        self.cap.set(cv2.CAP_PROP_POS_FRAMES, frame_number)
+        self.position = frame_number
+
+    def grab(self):
+        ret = self.cap.grab()
+        if ret:
+            self.position += 1
+        return ret
+
+    def read(self):
+        ret, frame = self.cap.read()
+        if not ret:
+            return False, None
+        self.position += 1
+        if self.crop is not None:
+            x, y, w, h = self.crop
+            frame = frame[y:y+h, x:x+w]
+        return True, frame
+
+    def read_into(self, out):
+        """Liest den nächsten Frame direkt in ein vorallokiertes Array"""
+        ret, frame = self.read()
+        if not ret:
+            return False
+        out[...] = frame
+        return True
+
+    def release(self):
+        self.cap.release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+
+
+class FFmpegFrameSource:
+    """
+    Frame-Quelle über eine ffmpeg-Pipe. ffmpeg schneidet den Crop-Bereich (und wandelt
+    optional das Pixelformat um), bevor die Rohdaten über stdout übertragen werden.
+    Die Bytes landen per readinto direkt im Ziel-Array, np.frombuffer kopiert nicht.
+    """
+    def __init__(self, video_path, crop=None, start_frame=0, pix_fmt="bgr24", info=None, ffmpeg_path=None):
+        if pix_fmt not in PIXEL_FORMAT_CHANNELS:
+            raise ValueError(f"Nicht unterstütztes Pixelformat: {pix_fmt}")
+        self.video_path = video_path
+        self.pix_fmt = pix_fmt
+        self.channels = PIXEL_FORMAT_CHANNELS[pix_fmt]
+        self.ffmpeg_path = ffmpeg_path or shutil.which("ffmpeg") or "ffmpeg"
+        info = info or probe_video(video_path)
+        self.frame_count = info["frame_count"]
+        self.width = info["width"]
+        self.height = info["height"]
+        self.fps = info["fps"]
+        self.crop = clip_crop(crop, self.width, self.height) if crop is not None else None
+        self.frame_bytes = int(np.prod(self.frame_shape))
+        self.process = None
+        self.position = 0
+        self._opened = True
+        self._start(start_frame)
+
+    @property
+    def frame_shape(self):
+        if self.crop is None:
+            h, w = self.height, self.width
+        else:
+            w, h = self.crop[2], self.crop[3]
+        return (h, w, self.channels) if self.channels > 1 else (h, w)
+
+    def _command(self, start_frame, input_url=None):
+        command = [self.ffmpeg_path, "-v", "error", "-nostdin"]
+        if start_frame > 0 and self.fps > 0:
+            # -ss vor -i: schneller Sprung zum Keyframe, danach wird exakt bis zur Zielzeit dekodiert
+            command += ["-ss", f"{start_frame / self.fps:.6f}"]
+        command += ["-i", input_url or self.video_path, "-map", "0:v:0", "-an", "-sn", "-dn"]
+        if self.crop is not None:
+            x, y, w, h = self.crop
+            command += ["-vf", f"crop={w}:{h}:{x}:{y}:exact=1"]
+        command += ["-fps_mode", "passthrough", "-f", "rawvideo", "-pix_fmt", self.pix_fmt, "pipe:1"]
+        return command
+
+    def _start(self, start_frame):
+        self._stop()
+        self.position = start_frame
+        if self.frame_bytes == 0:
+            self._opened = False
+            return
+        # stderr in eine Datei statt einer Pipe, damit ffmpeg bei vielen Meldungen nicht blockiert
+        self._stderr = tempfile.TemporaryFile()
+        self.process = subprocess.Popen(
+            self._command(start_frame),
+            stdout=subprocess.PIPE,
+            stderr=self._stderr,
+            stdin=subprocess.DEVNULL,
+            bufsize=0,
+        )
+        self._opened = True
+
+    def _stop(self):
+        if self.process is None:
+            return
+        if self.process.stdout:
+            self.process.stdout.close()
+        if self.process.poll() is None:
+            self.process.kill()
+        self.process.wait()
+        self.process = None
+        self._stderr.close()
+
+    def _check_exit(self):
+        """Wartet am Ende der Pipe auf ffmpeg und meldet einen Fehler mit dessen Ausgabe"""
+        returncode = self.process.wait()
+        if returncode != 0:
+            self._stderr.seek(0)
+            message = self._stderr.read().decode(errors="replace").strip()
+            raise RuntimeError(f"ffmpeg beendet mit Code {returncode} bei {self.video_path}: {message}")
+
+    def _read_exact(self, view):
+        """Füllt den Puffer vollständig aus der Pipe, False bei Videoende"""
+        filled = 0
+        while filled < len(view):
+            count = self.process.stdout.readinto(view[filled:])
+            if not count:
+                self._opened = False
+                self._check_exit()
+                return False
+            filled += count
+        self.position += 1
+        return True
+
+    def isOpened(self):
+        return self._opened and self.process is not None
+
+    def seek(self, frame_number):
+        """ffmpeg kann nicht zurückspulen, daher wird der Prozess ab der Zielposition neu gestartet"""
+        self._start(frame_number)
+
+    def read_into(self, out):
+        """Liest den nächsten Frame direkt in ein vorallokiertes, zusammenhängendes uint8-Array"""
+        if not self.isOpened():
+            return False
+        return self._read_exact(memoryview(out.reshape(-1)).cast("B"))
+
+    def read(self):
+        if not self.isOpened():
+            return False, None
+        buffer = bytearray(self.frame_bytes)
+        if not self._read_exact(memoryview(buffer)):
+            return False, None
+        return True, np.frombuffer(buffer, dtype=np.uint8).reshape(self.frame_shape)
+
+    def grab(self):
+        if not self.isOpened():
+            return False
+        if not hasattr(self, "_skip_buffer"):
+            self._skip_buffer = bytearray(self.frame_bytes)
+        return self._read_exact(memoryview(self._skip_buffer))
+
+    def release(self):
+        self._stop()
+        self._opened = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+
+
+class GrowingFileFrameSource(FFmpegFrameSource):
+    """
+    Frame-Quelle für eine Datei, die noch geschrieben wird (z.B. die .part-Datei eines yt-dlp-Downloads).
+    Ein Thread reicht die Datei stückweise an ffmpegs stdin weiter und wartet am aktuellen Dateiende
+    auf neue Daten. Der Datenstrom endet erst, wenn is_done() True meldet und die Datei danach bis zum
+    letzten Byte gelesen ist; dann wird stdin geschlossen und ffmpeg liefert die restlichen Frames.
+
+    Der Container muss ohne Zurückspulen lesbar sein (fragmentiertes MP4 wie bei YouTube-DASH, WebM, MPEG-TS),
+    die Metadaten (info) müssen vorher bekannt sein. final_path ist der Name nach dem Umbenennen am Ende
+    des Downloads, falls die Datei beim Start schon fertig ist. Zurückspulen ist nicht möglich.
+    """
+    def __init__(self, path, is_done, info, crop=None, pix_fmt="bgr24", final_path=None,
+                 poll_interval=0.1, chunk_size=1 << 20, ffmpeg_path=None):
+        self.is_done = is_done
+        self.final_path = final_path
+        self.poll_interval = poll_interval
+        self.chunk_size = chunk_size
+        self.feeder = None
+        self._cancelled = threading.Event()
+        super().__init__(path, crop=crop, pix_fmt=pix_fmt, info=info, ffmpeg_path=ffmpeg_path)
+
+    def _start(self, start_frame):
+        if start_frame:
+            raise ValueError("Eine wachsende Datei kann nur von vorne gelesen werden")
+        self._stop()
+        self.position = 0
+        self._stderr = tempfile.TemporaryFile()
+        self.process = subprocess.Popen(
+            self._command(0, input_url="pipe:0"),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=self._stderr,
+            bufsize=0,
+        )
+        self._cancelled.clear()
+        self.feeder = threading.Thread(target=self._feed, args=(self.process.stdin,), daemon=True)
+        self.feeder.start()
+        self._opened = True
+
+    def _open_input(self):
+        """Wartet, bis der Download die Datei angelegt hat, None bei Abbruch"""
+        while not self._cancelled.is_set():
+            for path in (self.video_path, self.final_path):
+                if path and os.path.exists(path):
+                    try:
+                        return open(path, "rb")
+                    except FileNotFoundError:
+                        continue  # zwischen exists und open umbenannt
+            if self.is_done() and not (self.final_path and os.path.exists(self.final_path)):
+                return None
+            self._cancelled.wait(self.poll_interval)
+        return None
+
+    def _feed(self, stdin):
+        try:
+            file = self._open_input()
+            if file is None:
+                return
+            with file:
+                done = False
+                while not self._cancelled.is_set():
+                    chunk = file.read(self.chunk_size)
+                    if chunk:
+                        stdin.write(chunk)
+                        continue
+                    if done:
+                        break
+                    # Erst nach dem Ende des Downloads noch einmal bis zum Dateiende lesen, dann ist nichts verloren
+                    done = self.is_done()
+                    if not done:
+                        self._cancelled.wait(self.poll_interval)
+        except (BrokenPipeError, ValueError, OSError):
+            pass  # ffmpeg wurde beendet
+        finally:
+            try:
+                stdin.close()
+            except OSError:
+                pass
+
+    def _stop(self):
+        self._cancelled.set()
+        super()._stop()
+        if self.feeder is not None:
+            self.feeder.join()
+            self.feeder = None
+
+    def seek(self, frame_number):
+        if frame_number != self.position:
+            raise ValueError("Eine wachsende Datei unterstützt keinen Sprung")
+
+
+def open_frame_source(video_path, crop=None, start_frame=0, backend="auto", pix_fmt="bgr24", info=None):
+    """
+    Öffnet eine Frame-Quelle für das Video.
+
+    backend:
+        "opencv" - immer cv2.VideoCapture
+        "ffmpeg" - immer die ffmpeg-Pipe
+        "auto"   - ffmpeg, wenn ein Crop-Bereich gesetzt und ffmpeg installiert ist
+    """
+    use_ffmpeg = backend == "ffmpeg" or (
+        backend == "auto" and crop is not None and pix_fmt == "bgr24" and ffmpeg_available()
+    )
+    if use_ffmpeg:
+        return FFmpegFrameSource(video_path, crop=crop, start_frame=start_frame, pix_fmt=pix_fmt, info=info)
+    if pix_fmt != "bgr24":
+        raise ValueError("Der OpenCV-Backend liefert nur bgr24-Frames")
+    return OpenCVFrameSource(video_path, crop=crop, start_frame=start_frame, info=info)
@@ -0,0 +1,11 @@
+"""
+Startpunkt des Bots: python src/main.py
+
+Die Worker des Analyse-Pools (analysisPool, forkserver) importieren beim Start das Hauptmodul des
+Bot-Prozesses. Wäre das bot.py, liefe in jedem Worker der ganze Modulcode des Bots (Discord-Client,
+Datenbanken, Aufräumen des Download-Ordners). Dieses Hauptmodul importiert bot erst im Bot-Prozess selbst.
+"""
+
+if __name__ == "__main__":
+    import bot
+    bot.main()
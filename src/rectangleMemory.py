@@ -0,0 +1,37 @@
+import datetime
+import numpy as np
+import jsonFileManager
+
+
+def resolution_key(video_analyzer):
+    return f"{video_analyzer.frame_width}x{video_analyzer.frame_height}"
+
+
+class RectangleMemory:
+    """
+    Merkt sich pro Spieler (Discord-ID) und Auflösung das zuletzt gefundene Stamina-Rechteck samt
+    HSV-Bereich. Die meisten Spieler nehmen ihre VODs immer mit derselben Auflösung und HUD-Skalierung
+    auf, das gemerkte Rechteck wird dann nur noch geprüft (VideoAnalyzer.verify_rectangle) statt neu trainiert.
+    """
+    def __init__(self, file_path):
+        self.manager = jsonFileManager.JsonFileManager(file_path)
+
+    async def recall(self, user_id, video_analyzer):
+        """Liefert das zuletzt gefundene Rechteck des Spielers bei gleicher Auflösung oder None"""
+        memory = await self.manager.load()
+        return memory.get(str(user_id), {}).get(resolution_key(video_analyzer))
+
+    async def remember(self, user_id, video_analyzer, rectangle, confirmed):
+        """Speichert Rechteck und HSV-Bereich pro Spieler und Auflösung für das nächste VOD"""
+        memory = await self.manager.load()
+        entries = memory.setdefault(str(user_id), {})
+        previous = entries.get(resolution_key(video_analyzer), {})
+        entries[resolution_key(video_analyzer)] = {
+            "rectangle": list(rectangle),
+            "lower_yellow": np.asarray(video_analyzer.lower_yellow).tolist(),
+            "upper_yellow": np.asarray(video_analyzer.upper_yellow).tolist(),
+            # Wie oft das gemerkte Rechteck ein neues Training erspart hat
+            "hits": previous.get("hits", 0) + 1 if confirmed else 0,
+            "updated_at": datetime.datetime.now().isoformat(),
+        }
+        await self.manager.save(memory)
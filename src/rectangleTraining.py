@@ -0,0 +1,82 @@
+import bisect
+import time
+from collections import deque
+
+
+def sample_positions(start_frame, end_frame, count, keyframes=None):
+    """
+    Verteilt count Stichproben gleichmäßig über [start_frame, end_frame) und sortiert sie grob nach
+    fein (Bit-Umkehr), damit schon die ersten Stichproben das ganze Video abdecken und ein
+    vorzeitiger Abbruch keinen Abschnitt auslässt. Mit keyframes wird jede Position auf den
+    nächsten Keyframe gelegt, ein Sprung dorthin dekodiert dann nur einen einzigen Frame.
+    """
+    span = end_frame - start_frame
+    if span <= 0 or count <= 0:
+        return []
+    count = min(count, span)
+    bits = max(1, (count - 1).bit_length())
+    order = sorted(range(count), key=lambda i: int(format(i, f"0{bits}b")[::-1], 2))
+    positions = [start_frame + int((i + 0.5) * span / count) for i in order]
+
+    if keyframes:
+        inside = [k for k in keyframes if start_frame <= k < end_frame]
+        if inside:
+            snapped = []
+            for position in positions:
+                index = bisect.bisect_left(inside, position)
+                neighbours = inside[max(0, index - 1):index + 1]
+                snapped.append(min(neighbours, key=lambda k: abs(k - position)))
+            positions = snapped
+
+    # Doppelte Positionen (mehrere Stichproben am selben Keyframe) nur einmal lesen
+    return list(dict.fromkeys(positions))
+
+
+class ConvergenceTracker:
+    """
+    Beobachtet das Training und meldet, wann es genug gesehen hat: Der führende Kandidat ist über
+    die letzten window Stichproben gleich geblieben, wurde mindestens min_count-mal gezählt und sein
+    Anteil an allen Zählungen (und optional sein Score) schwankt höchstens um die Toleranz.
+    time_budget begrenzt die Trainingszeit in Sekunden.
+    """
+    def __init__(self, min_samples=40, window=30, min_count=10, share_tolerance=0.05, score_tolerance=0.05,
+                 time_budget=None):
+        self.min_samples = min_samples
+        self.min_count = min_count
+        self.share_tolerance = share_tolerance
+        self.score_tolerance = score_tolerance
+        self.time_budget = time_budget
+        self.history = deque(maxlen=window)
+        self.samples = 0
+        self.start_time = time.perf_counter()
+
+    def update(self, best, share, count, score=None):
+        """best=None heißt: noch kein eindeutiger Spitzenreiter (z.B. Gleichstand)"""
+        self.samples += 1
+        if best is None or count < self.min_count:
+            self.history.clear()
+        else:
+            self.history.append((best, share, score))
+
+    @property
+    def converged(self):
+        if self.samples < self.min_samples or len(self.history) < self.history.maxlen:
+            return False
+        candidates, shares, scores = zip(*self.history)
+        if len(set(candidates)) > 1 or max(shares) - min(shares) > self.share_tolerance:
+            return False
+        if scores[0] is None:
+            return True
+        return max(scores) - min(scores) <= self.score_tolerance * max(abs(s) for s in scores)
+
+    @property
+    def expired(self):
+        return self.time_budget is not None and time.perf_counter() - self.start_time > self.time_budget
+
+    @property
+    def done(self):
+        return self.converged or self.expired
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.start_time
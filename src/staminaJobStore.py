@@ -0,0 +1,166 @@
+import datetime
+import json
+import sqlite3
+
+# queued -> downloading -> training -> analyzing -> done, Abbruch/Fehler jederzeit nach cancelled/failed
+ACTIVE_STATES = ("queued", "downloading", "training", "analyzing")
+RUNNING_STATES = ("downloading", "training", "analyzing")
+FINAL_STATES = ("done", "failed", "cancelled")
+
+
+def _now():
+    return datetime.datetime.now(datetime.timezone.utc).isoformat()
+
+
+class StaminaJobStore:
+    """
+    Persistente Warteschlange der Stamina-Checks in der SQLite-Datenbank des Bots.
+
+    Jeder Auftrag wird mit Zustand, Versuchszähler und Ergebnis gespeichert, damit ein Neustart
+    keine wartenden oder laufenden Checks verliert. Pro Nutzer und Video gibt es höchstens einen
+    aktiven Auftrag, Zustandswechsel auf abgeschlossene Aufträge werden ignoriert.
+    """
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.init_db()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def init_db(self):
+        conn = self._connect()
+        cursor = conn.cursor()
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS stamina_jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id TEXT,
+            channel_id TEXT,
+            message_id TEXT,
+            youtube_url TEXT,
+            video_key TEXT,
+            debug INTEGER DEFAULT 0,
+            state TEXT DEFAULT 'queued',
+            attempts INTEGER DEFAULT 0,
+            result TEXT,
+            error TEXT,
+            created_at TEXT,
+            updated_at TEXT
+        )
+        ''')
+        # Doppelte Anfragen (z.B. erneutes Absenden nach einem Neustart) landen beim bestehenden Auftrag
+        cursor.execute(f'''
+        CREATE UNIQUE INDEX IF NOT EXISTS stamina_jobs_active
+        ON stamina_jobs (user_id, video_key, debug)
+        WHERE state IN ({", ".join(f"'{state}'" for state in ACTIVE_STATES)})
+        ''')
+        conn.commit()
+        conn.close()
+
+    def enqueue(self, user_id, channel_id, youtube_url, video_key, debug=False):
+        """Legt einen Auftrag an. Gibt (job_id, created) zurück, created=False bei einem schon aktiven Auftrag."""
+        conn = self._connect()
+        try:
+            with conn:
+                cursor = conn.execute(
+                    "INSERT OR IGNORE INTO stamina_jobs "
+                    "(user_id, channel_id, youtube_url, video_key, debug, state, created_at, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, 'queued', ?, ?)",
+                    (str(user_id), str(channel_id), youtube_url, video_key, int(bool(debug)), _now(), _now())
+                )
+                if cursor.rowcount:
+                    return cursor.lastrowid, True
+                row = conn.execute(
+                    f"SELECT id FROM stamina_jobs WHERE user_id = ? AND video_key = ? AND debug = ? "
+                    f"AND state IN ({', '.join('?' * len(ACTIVE_STATES))})",
+                    (str(user_id), video_key, int(bool(debug)), *ACTIVE_STATES)
+                ).fetchone()
+                return row["id"], False
+        finally:
+            conn.close()
+
+    def get(self, job_id):
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT * FROM stamina_jobs WHERE id = ?", (job_id,)).fetchone()
+        finally:
+            conn.close()
+        return self._to_dict(row) if row else None
+
+    def set_message(self, job_id, message_id):
+        self._update(job_id, ACTIVE_STATES, message_id=str(message_id))
+
+    def set_state(self, job_id, state):
+        """Wechselt den Zustand eines aktiven Auftrags, False wenn er schon abgeschlossen war"""
+        return self._update(job_id, ACTIVE_STATES, state=state)
+
+    def start_attempt(self, job_id):
+        """Markiert den Beginn eines (weiteren) Versuchs und zählt ihn mit"""
+        conn = self._connect()
+        try:
+            with conn:
+                cursor = conn.execute(
+                    "UPDATE stamina_jobs SET state = 'downloading', attempts = attempts + 1, updated_at = ? "
+                    "WHERE id = ? AND state = 'queued'",
+                    (_now(), job_id)
+                )
+            return cursor.rowcount > 0
+        finally:
+            conn.close()
+
+    def finish(self, job_id, result):
+        return self._update(job_id, ACTIVE_STATES, state="done", result=json.dumps(result), error=None)
+
+    def fail(self, job_id, error, state="failed"):
+        return self._update(job_id, ACTIVE_STATES, state=state, error=str(error))
+
+    def recover(self, max_attempts=3):
+        """
+        Beim Start aufrufen: Aufträge, die beim letzten Beenden liefen, kommen zurück in die
+        Warteschlange, außer sie haben max_attempts schon erreicht (z.B. ein Video, das den Bot abstürzen lässt).
+        Gibt (fortzusetzende Aufträge, aufgegebene Aufträge) zurück.
+        """
+        conn = self._connect()
+        try:
+            placeholders = ", ".join("?" * len(RUNNING_STATES))
+            with conn:
+                given_up = conn.execute(
+                    f"SELECT * FROM stamina_jobs WHERE state IN ({placeholders}) AND attempts >= ? ORDER BY id",
+                    (*RUNNING_STATES, max_attempts)
+                ).fetchall()
+                conn.execute(
+                    f"UPDATE stamina_jobs SET state = 'failed', error = ?, updated_at = ? "
+                    f"WHERE state IN ({placeholders}) AND attempts >= ?",
+                    (f"Nach {max_attempts} Versuchen abgebrochen", _now(), *RUNNING_STATES, max_attempts)
+                )
+                conn.execute(
+                    f"UPDATE stamina_jobs SET state = 'queued', updated_at = ? WHERE state IN ({placeholders})",
+                    (_now(), *RUNNING_STATES)
+                )
+                resumable = conn.execute("SELECT * FROM stamina_jobs WHERE state = 'queued' ORDER BY id").fetchall()
+        finally:
+            conn.close()
+        return [self._to_dict(row) for row in resumable], [self._to_dict(row) for row in given_up]
+
+    def _update(self, job_id, allowed_states, **fields):
+        fields["updated_at"] = _now()
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        conn = self._connect()
+        try:
+            with conn:
+                cursor = conn.execute(
+                    f"UPDATE stamina_jobs SET {assignments} "
+                    f"WHERE id = ? AND state IN ({', '.join('?' * len(allowed_states))})",
+                    (*fields.values(), job_id, *allowed_states)
+                )
+            return cursor.rowcount > 0
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _to_dict(row):
+        job = dict(row)
+        job["debug"] = bool(job["debug"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
@@ -0,0 +1,206 @@
+import asyncio
+import itertools
+import logging
+import os
+import shutil
+from collections import Counter
+
+# Derselbe Logger wie logger.log, ohne beim Import eine Logdatei anzulegen
+log = logging.getLogger("bot")
+
+# Grobe Obergrenzen pro laufender Analyse (ein Prozess mit Dekoder und Puffern)
+ANALYSIS_CORES_PER_SLOT = 2
+ANALYSIS_BYTES_PER_SLOT = 2 * 1024**3
+
+
+# Ohne MemAvailable zählt nur dieser Anteil des gesamten Speichers, der Rest gehört System und Page Cache
+FALLBACK_MEMORY_FRACTION = 0.5
+
+
+def _available_memory(meminfo_path="/proc/meminfo"):
+    """
+    Verfügbarer Arbeitsspeicher in Bytes oder None, wenn das System ihn nicht verrät. MemAvailable
+    zählt freigebbaren Page Cache mit, SC_AVPHYS_PAGES nicht und wäre auf Servern viel zu klein.
+    """
+    try:
+        with open(meminfo_path) as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024  # Angabe in kB
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        return int(os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") * FALLBACK_MEMORY_FRACTION)
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def default_slot_counts():
+    """
+    Gibt (download_slots, analysis_slots) zurück. Analyseplätze richten sich nach Kernen und
+    freiem Arbeitsspeicher, Downloads sind netzwerkgebunden und bekommen zwei feste Plätze.
+    """
+    analysis_slots = max(1, (os.cpu_count() or 1) // ANALYSIS_CORES_PER_SLOT)
+    memory = _available_memory()
+    if memory is not None:
+        analysis_slots = min(analysis_slots, max(1, memory // ANALYSIS_BYTES_PER_SLOT))
+    return 2, analysis_slots
+
+
+class StaminaJob:
+    """
+    Ein Stamina-Check in der Warteschlange. "async with job:" wartet, bis der Auftrag an der Reihe
+    ist, legt seinen eigenen Ausgabeordner an und gibt Platz und Ordner beim Verlassen wieder frei.
+    """
+    def __init__(self, scheduler, job_id, user_id, on_position=None):
+        self.scheduler = scheduler
+        self.id = job_id
+        self.user_id = user_id
+        self.on_position = on_position
+        self.output_dir = os.path.join(scheduler.output_root, f"job-{job_id}")
+        self.state = "queued"  # queued, running, done, cancelled
+        self.position = None
+        self._started = asyncio.get_running_loop().create_future()
+        self._task = None
+        self._cancel_requested = False
+
+    async def wait_turn(self):
+        """Wartet auf einen freien Platz. Ein abgebrochener Auftrag wirft asyncio.CancelledError."""
+        try:
+            await self._started
+        except asyncio.CancelledError:
+            # Entweder über cancel() aus der Warteschlange genommen oder der wartende Task wurde abgebrochen
+            self.scheduler._finish(self, "cancelled")
+            raise
+
+    @property
+    def cancel_requested(self):
+        """True nach cancel(), unterscheidet einen Abbruch durch den Nutzer vom Herunterfahren des Bots"""
+        return self._cancel_requested
+
+    def cancel(self):
+        return self.scheduler.cancel(self)
+
+    async def __aenter__(self):
+        await self.wait_turn()
+        self._task = asyncio.current_task()
+        os.makedirs(self.output_dir, exist_ok=True)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self._task = None
+        shutil.rmtree(self.output_dir, ignore_errors=True)
+        cancelled = self._cancel_requested or exc_type is asyncio.CancelledError
+        self.scheduler._finish(self, "cancelled" if cancelled else "done")
+        return False
+
+
+class StaminaScheduler:
+    """
+    Warteschlange für Stamina-Checks mit mehreren gleichzeitigen Aufträgen.
+
+    Downloads und Analysen haben getrennte Plätze (download_slot / analysis_slot), damit ein
+    Auftrag herunterladen kann, während ein anderer rechnet. Die Reihenfolge ist fair pro Nutzer:
+    wer schon einen Auftrag laufen oder weiter vorne hat, wird hinter die anderen Nutzer einsortiert.
+    Positionsänderungen werden über on_position(position) gemeldet, sobald sie sich ändern.
+    """
+    def __init__(self, download_slots=None, analysis_slots=None, max_jobs=None, output_root="./output/"):
+        default_download, default_analysis = default_slot_counts()
+        self.download_slots = download_slots or default_download
+        self.analysis_slots = analysis_slots or default_analysis
+        self.max_jobs = max_jobs or self.download_slots + self.analysis_slots
+        self.output_root = output_root
+        self._download = asyncio.Semaphore(self.download_slots)
+        self._analysis = asyncio.Semaphore(self.analysis_slots)
+        self._queue = []
+        self._running = []
+        self._ids = itertools.count(1)
+        self._notifications = set()
+
+    @property
+    def queue_length(self):
+        return len(self._queue)
+
+    @property
+    def running_count(self):
+        return len(self._running)
+
+    def download_slot(self):
+        return self._download
+
+    def analysis_slot(self):
+        return self._analysis
+
+    def submit(self, user_id, on_position=None):
+        """Reiht einen Auftrag ein, ausgeführt wird er mit "async with job:" """
+        job = StaminaJob(self, next(self._ids), user_id, on_position)
+        self._queue.append(job)
+        self._dispatch()
+        return job
+
+    def jobs(self, user_id=None):
+        """Wartende (in fairer Reihenfolge) und laufende Aufträge, optional nur eines Nutzers"""
+        return [job for job in self._fair_order() + self._running if user_id is None or job.user_id == user_id]
+
+    def cancel(self, job):
+        """Bricht einen wartenden oder laufenden Auftrag ab. Gibt False zurück, wenn er schon fertig war."""
+        if job.state == "queued":
+            job._cancel_requested = True
+            job._started.cancel()
+            self._finish(job, "cancelled")
+            return True
+        if job.state == "running" and job._task is not None:
+            job._cancel_requested = True
+            job._task.cancel()
+            return True
+        return False
+
+    def cancel_user(self, user_id):
+        return sum(self.cancel(job) for job in self.jobs(user_id))
+
+    def _fair_order(self):
+        # Runde eines Auftrags = Anzahl der Aufträge desselben Nutzers, die schon laufen oder vor ihm warten
+        rounds = Counter(job.user_id for job in self._running)
+        keyed = []
+        for arrival, job in enumerate(self._queue):
+            keyed.append((rounds[job.user_id], arrival, job))
+            rounds[job.user_id] += 1
+        return [job for _, _, job in sorted(keyed, key=lambda entry: entry[:2])]
+
+    def _dispatch(self):
+        order = self._fair_order()
+        while order and len(self._running) < self.max_jobs:
+            job = order[0]
+            self._queue.remove(job)
+            self._running.append(job)
+            job.state = "running"
+            job.position = 0
+            job._started.set_result(None)
+            order = self._fair_order()
+
+        for position, job in enumerate(order, start=1):
+            if job.position != position:
+                job.position = position
+                if job.on_position is not None:
+                    self._notify(job.on_position(position))
+
+    def _notify(self, coroutine):
+        task = asyncio.ensure_future(coroutine)
+        self._notifications.add(task)
+        task.add_done_callback(self._notification_done)
+
+    def _notification_done(self, task):
+        self._notifications.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            log.error(f"Fehler beim Aktualisieren der Warteschlangenposition: {task.exception()}")
+
+    def _finish(self, job, state):
+        if job in self._queue:
+            self._queue.remove(job)
+        elif job in self._running:
+            self._running.remove(job)
+        else:
+            return
+        job.state = state
+        job.position = None
+        self._dispatch()
@@ -0,0 +1,89 @@
+import asyncio
+import math
+import threading
+from frameSource import GrowingFileFrameSource
+from videoAnalyzer import VideoAnalyzer
+
+# Gleiche Formatwahl wie bot.download_video: nur Videospur, H.264 bevorzugt
+STREAM_FORMAT = "bestvideo[height<={h}][vcodec^=avc1]/bestvideo[height<={h}]/best[height<={h}]/best"
+
+
+def stream_format(max_height=1080):
+    return STREAM_FORMAT.format(h=max_height)
+
+
+def resolve_stream(youtube_url, max_height=1080, ydl_opts=None):
+    """
+    Liest die Metadaten des gewählten Formats, ohne etwas herunterzuladen.
+    Gibt (format_id, info) zurück, info hat die Felder von frameSource.probe_video.
+    Die Frame-Anzahl ist aus Dauer und fps geschätzt und dient nur der Fortschrittsanzeige.
+    """
+    import yt_dlp
+
+    options = {"format": stream_format(max_height), "quiet": True, "no_warnings": True}
+    options.update(ydl_opts or {})
+    with yt_dlp.YoutubeDL(options) as ydl:
+        result = ydl.extract_info(youtube_url, download=False)
+
+    # Bei kombinierten Formaten steht die Videospur in requested_formats
+    selected = next(
+        (f for f in result.get("requested_formats") or [] if f.get("vcodec") not in (None, "none")),
+        result,
+    )
+    fps = selected.get("fps") or result.get("fps") or 30
+    duration = result.get("duration") or 0
+    info = {
+        "frame_count": int(math.ceil(duration * fps)),
+        "width": int(selected["width"]),
+        "height": int(selected["height"]),
+        "fps": fps,
+    }
+    return selected.get("format_id") or result.get("format_id"), info
+
+
+async def analyze_download(video_path, is_done, video_info, training_frame_count, output_dir="./output/",
+                           progress_callback=None, debug=False):
+    """
+    Analysiert ein Video, während es noch nach video_path heruntergeladen wird.
+
+    Gelesen wird die wachsende Datei video_path + ".part" (bzw. video_path, falls der Download schon
+    fertig und umbenannt ist). is_done meldet das Ende des Downloads, erst danach endet der Datenstrom.
+    Training und Rechteckerkennung laufen auf den ersten training_frame_count Frames, danach folgt die
+    Analyse dem Download ohne Unterbrechung (VideoAnalyzer.analyze_single_pass).
+    Gibt (analyzer, stable_rectangle, timestamps) zurück.
+    """
+    analyzer = VideoAnalyzer(video_path, output_dir=output_dir, debug=debug, video_info=video_info)
+    x1, y1, x2, y2 = analyzer._roi_box()
+    source = GrowingFileFrameSource(video_path + ".part", is_done, video_info,
+                                    crop=(x1, y1, x2 - x1, y2 - y1), final_path=video_path)
+    stable_rectangle, timestamps = await analyzer.analyze_single_pass(
+        training_frame_count, progress_callback=progress_callback, source=source
+    )
+    return analyzer, stable_rectangle, timestamps
+
+
+async def analyze_youtube_download(youtube_url, video_path, training_frame_count, max_height=1080, **kwargs):
+    """
+    Lädt das Video wie bot.download_video nach video_path herunter und analysiert es dabei (analyze_download).
+    Schlägt der Download fehl, wird dessen Fehler ausgelöst, auch wenn die Analyse der bis dahin
+    geladenen Frames schon fertig ist. Gibt (analyzer, stable_rectangle, timestamps) zurück.
+    """
+    import yt_dlp
+
+    format_id, video_info = await asyncio.to_thread(resolve_stream, youtube_url, max_height)
+    done = threading.Event()
+
+    def download():
+        try:
+            yt_dlp.YoutubeDL({"outtmpl": video_path, "format": format_id}).download([youtube_url])
+        finally:
+            done.set()
+
+    download_task = asyncio.create_task(asyncio.to_thread(download))
+    try:
+        result = await analyze_download(video_path, done.is_set, video_info, training_frame_count, **kwargs)
+    finally:
+        # Auch bei einem Fehler der Analyse auf den Download warten, damit keine halbe Datei weitergeschrieben wird
+        await asyncio.wait([download_task])
+    download_task.result()
+    return result
@@ -1,13 +1,20 @@
 import cv2
 import numpy as np
-from collections import Counter
+from collections import Counter, deque
 import os
 import asyncio
+import json
 import random
 import time
-import multiprocessing
-from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures import ThreadPoolExecutor
 import math
+import bisect
+import tempfile
+from typing import NamedTuple
+from frameSource import open_frame_source, probe_video, probe_keyframes, clip_crop, OpenCVFrameSource
+from analysisPool import AnalysisWorkerPool, default_worker_count
+from analysisStats import AnalysisStats
+from rectangleTraining import ConvergenceTracker, sample_positions
 
 def generate_distinct_colors(n):
     if n == 0:
@@ -22,189 +29,598 @@ def generate_distinct_colors(n):
         colors.append((int(color[0]), int(color[1]), int(color[2])))  # In Tupel konvertieren
     return colors
 
+class ChunkTask(NamedTuple):
+    """Arbeitspaket für einen Worker-Prozess in analyze_video"""
+    video_path: str
+    start_frame: int
+    end_frame: int
+    rectangle_coords: tuple
+    lower_yellow: np.ndarray
+    upper_yellow: np.ndarray
+    secondary_lower_yellow: np.ndarray
+    secondary_upper_yellow: np.ndarray
+    debug: bool = False
+    debug_interval: int = 300
+    output_dir_debug: str = "./debug/"
+    output_dir: str = "./output/"
+    batch_size: int = 256  # Frames pro Batch, 1 entspricht der Einzelframe-Verarbeitung
+    frame_source: str = "auto"  # "auto", "ffmpeg" oder "opencv", siehe frameSource.open_frame_source
+    decode_start: int = -1  # Beginn der Aufwärmphase vor start_frame (-1 = ohne Aufwärmphase)
+    cancel_event: object = None  # Event des Auftrags im AnalysisWorkerPool, gesetzt = abbrechen
+    progress_queue: object = None  # Queue für Fortschrittsmeldungen (start_frame, Frames, Ereignisse) pro Batch
+    collect_stats: bool = False  # True: process_frame_chunk liefert ChunkResult mit Messwerten (AnalysisStats.to_dict)
+    mask_cleanup: str = "morphology"  # siehe MASK_CLEANUP_MODES
+    fill_estimator: str = "pixels"  # siehe FILL_ESTIMATORS
+    calibration_frames: int = -1  # Kalibrierung über die ersten Frames des ganzen Videos (-1 = pro Chunk)
+    calibration: tuple = None  # StaminaStateMachine.calibration der durchgehenden Analyse für Chunks ab decode_start > 0
+
+class ChunkResult(NamedTuple):
+    """Ergebnis eines Chunks mit collect_stats: Ereignisse wie ohne Statistik und die Messwerte des Workers"""
+    events: list
+    stats: dict
+
+class AnalysisProgress(NamedTuple):
+    """Fortschritt von analyze_video, wird bei jeder Meldung der Worker aktualisiert"""
+    processed: int
+    total: int
+    fps: float
+    events: int
+
+class ChunkPlan(NamedTuple):
+    """Frame-Bereich eines Chunks: dekodiert ab decode_start, meldet Ereignisse in [start_frame, end_frame)"""
+    decode_start: int
+    start_frame: int
+    end_frame: int
+
+def plan_chunks(frame_count, num_chunks, keyframes=None, warmup_frames=0, calibration_frames=0):
+    """
+    Teilt [0, frame_count) in bis zu num_chunks zusammenhängende Bereiche auf.
+    
+    Mit Keyframe-Liste beginnen die Chunks und ihre Aufwärmphasen auf Keyframes, so dass der
+    Seek im Worker nicht erst vom vorherigen Keyframe aus dekodieren muss. Jeder Chunk außer dem
+    ersten dekodiert mindestens warmup_frames Frames vor seinem Start, damit die Zustandspuffer an
+    der Chunk-Grenze denselben Stand haben wie bei durchgehender Analyse. Die Schwellwerte kommen
+    nicht aus der Aufwärmphase, sondern aus der Kalibrierung über die ersten calibration_frames
+    Frames des Videos (siehe calibrate_series). Reicht die Aufwärmphase in diesen Bereich, dekodiert
+    der Chunk ab Frame 0 und kalibriert sich selbst wie die durchgehende Analyse.
+    """
+    if frame_count <= 0:
+        return []
+    num_chunks = max(1, min(num_chunks, frame_count))
+    keyframes = sorted(k for k in (keyframes or []) if 0 <= k < frame_count)
+    
+    boundaries = [0]
+    for i in range(1, num_chunks):
+        target = i * frame_count // num_chunks
+        if keyframes:
+            # Nächstgelegenen Keyframe wählen (bei Gleichstand den früheren)
+            index = bisect.bisect_left(keyframes, target)
+            nearby = keyframes[max(0, index - 1):index + 1]
+            target = min(nearby, key=lambda k: (abs(k - target), k))
+        if target > boundaries[-1]:
+            boundaries.append(target)
+    boundaries.append(frame_count)
+    
+    plans = []
+    for start_frame, end_frame in zip(boundaries, boundaries[1:]):
+        decode_start = max(0, start_frame - warmup_frames)
+        if keyframes and decode_start > 0:
+            index = bisect.bisect_right(keyframes, decode_start) - 1
+            decode_start = keyframes[index] if index >= 0 else 0
+        if decode_start <= calibration_frames:
+            decode_start = 0
+        plans.append(ChunkPlan(decode_start, start_frame, end_frame))
+    return plans
+
+def merge_chunk_events(chunk_events):
+    """
+    Führt die Ereignisse aller Chunks zusammen. Sortiert nach Frame und verwirft doppelte
+    Ereignisse sowie Zustandswechsel, die den vorherigen Zustand nur wiederholen (z.B. zweimal
+    "leer" an einer Chunk-Grenze). Das Ergebnis hängt nicht von der Reihenfolge der Chunks ab.
+    """
+    merged = []
+    stamina_empty = False
+    for frame_number, is_empty in sorted({event for events in chunk_events for event in events}):
+        if is_empty == stamina_empty:
+            continue
+        stamina_empty = is_empty
+        merged.append((frame_number, is_empty))
+    return merged
+
+# Strukturelemente der Maskenbereinigung, einmal angelegt statt pro Frame bzw. Batch
+MORPH_KERNEL = np.ones((3, 3), np.uint8)
+ROW_KERNEL = np.ones((1, 3), np.uint8)
+
+# Bereinigung der Gelbmaske in analyze_video: "morphology" (Öffnen/Schließen 3x3) oder "rows" (nur zeilenweise 1x3)
+MASK_CLEANUP_MODES = ("morphology", "rows")
+
+# Füllstand der Leiste pro Frame: "pixels" (Anteil gelber Pixel) oder "columns" (Füllkante aus der Spaltenprojektion).
+# Die Kante rauscht deutlich weniger, daher kommt der Zustandsautomat mit kürzeren Glättungsfenstern
+# (gleitender Mittelwert, Mehrheitsentscheid) aus: (window, buffer_size) pro Schätzer
+FILL_ESTIMATORS = {"pixels": (10, 5), "columns": (4, 3)}
+
+def _open_close_stack(masks):
+    """
+    MORPH_OPEN followed by MORPH_CLOSE (3x3) for every mask of a (N, h, w) stack in four
+    OpenCV calls. A separator row below each mask is set to the neutral value of the
+    current operation, so nothing bleeds from one frame into the next.
+    """
+    n, h, w = masks.shape
+    buffer = np.empty((n, h + 1, w), dtype=np.uint8)
+    buffer[:, :h] = masks
+    flat = buffer.reshape(n * (h + 1), w)
+    for operation, neutral in ((cv2.erode, 255), (cv2.dilate, 0), (cv2.dilate, 0), (cv2.erode, 255)):
+        buffer[:, h] = neutral
+        operation(flat, MORPH_KERNEL, dst=flat)
+    return buffer[:, :h]
+
+def _open_close_rows(masks):
+    """
+    Zeilenweise Lauflängenfilter für einen (N, h, w)-Stapel: Öffnen und Schließen mit einem 1x3-Kern
+    entfernt gelbe Läufe unter 3 Pixeln und schließt Lücken bis 2 Pixel innerhalb jeder Zeile.
+    Die Leiste ist ein flacher horizontaler Streifen, die vertikale Hälfte der 3x3-Operationen
+    ändert dort kaum etwas. Zeilen sind unabhängig, daher braucht der Stapel keine Trennzeilen.
+    """
+    n, h, w = masks.shape
+    flat = np.ascontiguousarray(masks).reshape(n * h, w)
+    for operation in (cv2.erode, cv2.dilate, cv2.dilate, cv2.erode):
+        operation(flat, ROW_KERNEL, dst=flat)
+    return flat.reshape(n, h, w)
+
+def compute_yellow_masks(batch, lower_yellow, upper_yellow, secondary_lower_yellow, secondary_upper_yellow, stats=None,
+                         cleanup="morphology"):
+    """
+    Creates the cleaned stamina masks for a whole (N, h, w, 3) BGR batch at once.
+    Equivalent to cvtColor + 2x inRange + MORPH_OPEN + MORPH_CLOSE (3x3) per frame,
+    with cleanup="rows" the 1x3 row filter of _open_close_rows replaces the 3x3 operations.
+    With stats (AnalysisStats) the phases color, mask and morphology are timed once per batch.
+    """
+    n, h, w = batch.shape[:3]
+    start = time.perf_counter()
+    # The batch is stacked vertically so that color conversion and masking run in a single call
+    stacked = batch.reshape(n * h, w, 3)
+    hsv = cv2.cvtColor(stacked, cv2.COLOR_BGR2HSV)
+    converted = time.perf_counter()
+    primary_mask = cv2.inRange(hsv, lower_yellow, upper_yellow)
+    secondary_mask = cv2.inRange(hsv, secondary_lower_yellow, secondary_upper_yellow)
+    masks = cv2.bitwise_or(primary_mask, secondary_mask).reshape(n, h, w)
+    masked = time.perf_counter()
+
+    cleaned = _open_close_rows(masks) if cleanup == "rows" else _open_close_stack(masks)
+    if stats is not None:
+        stats.add("color", converted - start)
+        stats.add("mask", masked - converted)
+        stats.add("morphology", time.perf_counter() - masked)
+    return cleaned
+
+def compute_yellow_ratios(batch, lower_yellow, upper_yellow, secondary_lower_yellow, secondary_upper_yellow, total_pixels=None,
+                          stats=None, cleanup="morphology", estimator="pixels"):
+    """
+    Returns the yellow pixel counts and the yellow ratio time series for a (N, h, w, 3) batch.
+    With estimator="columns" the ratio is the fill level of compute_fill_levels and the pixel
+    count the matching share of total_pixels, so the state machine consumes both alike.
+    """
+    masks = compute_yellow_masks(batch, lower_yellow, upper_yellow, secondary_lower_yellow, secondary_upper_yellow, stats,
+                                 cleanup)
+    if total_pixels is None:
+        total_pixels = masks.shape[1] * masks.shape[2]
+    if estimator == "columns":
+        ratios = compute_fill_levels(masks)
+        return np.rint(ratios * total_pixels).astype(np.int64), ratios, masks
+    yellow_pixels = np.count_nonzero(masks.reshape(masks.shape[0], -1), axis=1)
+    ratios = yellow_pixels / total_pixels if total_pixels > 0 else np.zeros(len(yellow_pixels))
+    return yellow_pixels, ratios, masks
+
+def compute_fill_levels(masks, min_column_share=0.4, min_density=0.8):
+    """
+    Füllstand (0..1) pro Frame aus einem (N, h, w)-Maskenstapel über die Spaltenprojektion.
+    Eine Spalte gilt als gelb, wenn mindestens min_column_share ihrer Zeilen gelb sind (die sich
+    auffüllende Leiste ist nicht über die volle Höhe gefärbt, daher weniger als die Hälfte). Die Füllkante
+    ist die rechteste gelbe Spalte, links von der mindestens min_density aller Spalten gelb sind
+    (ein dunkler Rahmen am linken Rand oder einzelne Lücken stören so nicht, gelbe Flecken rechts der
+    Kante schon gar nicht). Die teilweise gefüllte Spalte rechts der Kante zählt anteilig.
+    """
+    n, h, w = masks.shape
+    if n == 0 or h == 0 or w == 0:
+        return np.zeros(n)
+    coverage = np.count_nonzero(masks, axis=1) / h
+    columns = coverage >= min_column_share
+    density = np.cumsum(columns, axis=1) / np.arange(1, w + 1)
+    valid = columns & (density >= min_density)
+    found = valid.any(axis=1)
+    edge = w - 1 - np.argmax(valid[:, ::-1], axis=1)
+    partial = np.where(edge + 1 < w, coverage[np.arange(n), np.minimum(edge + 1, w - 1)], 0.0)
+    return np.where(found, (edge + 1 + partial) / w, 0.0)
+
+class StaminaStateMachine:
+    """
+    Out-of-stamina state machine (calibration, pattern_history, empty_buffer) that runs
+    over a yellow pixel time series one frame at a time. window is the length of the rolling
+    average and pattern history, buffer_size the majority vote (see FILL_ESTIMATORS).
+    
+    The thresholds are calibrated on the first calibration_frames frames (by default a quarter of
+    the range, at most 300). A chunk that starts later takes the values of the continuous run via
+    calibration (see the calibration property) instead of calibrating on its own frames.
+    """
+    def __init__(self, start_frame, end_frame, total_pixels, window=10, buffer_size=5,
+                 calibration_frames=None, calibration=None):
+        self.start_frame = start_frame
+        self.total_pixels = total_pixels
+        self.stamina_empty = False
+        self.yellow_ratios = deque(maxlen=window)
+        # sudden_drop vergleicht mit dem Wert vier Frames zuvor
+        self.pattern_length = max(4, window)
+        self.yellow_pixels_history = deque(maxlen=self.pattern_length)
+        self.buffer_size = buffer_size
+        self.empty_buffer = deque([False] * self.buffer_size, maxlen=self.buffer_size)
+        self.pattern_history = deque(maxlen=self.buffer_size)
+        self.rising_pattern = deque([False] * 3, maxlen=3)
+        self.falling_pattern = deque([False] * 3, maxlen=3)
+
+        # Calibration variables
+        self.max_observed_ratio = 0
+        self.min_observed_ratio = 1.0
+        self.max_observed_pixels = 0
+        if calibration_frames is None:
+            calibration_frames = min(300, (end_frame - start_frame) // 4)
+        self.calibration_frames = calibration_frames
+        self.high_threshold = 0.35
+        self.low_threshold = 0.08
+        self.avg_ratio = 0
+        if calibration is not None:
+            self.high_threshold, self.low_threshold, self.max_observed_ratio, self.max_observed_pixels = calibration
+            self.calibration_frames = -1
+
+    @property
+    def calibration(self):
+        """Thresholds and maxima after calibration, can be passed to another state machine"""
+        return self.high_threshold, self.low_threshold, self.max_observed_ratio, self.max_observed_pixels
+
+    @classmethod
+    def for_chunk(cls, decode_start, end_frame, total_pixels, estimator="pixels", calibration_frames=-1,
+                  calibration=None):
+        """
+        State machine of a chunk that decodes from decode_start. From frame 0 it calibrates itself like
+        the continuous run (calibration_frames from the whole video), later chunks take calibration.
+        calibration_frames < 0 keeps the old per-chunk calibration.
+        """
+        window, buffer_size = FILL_ESTIMATORS[estimator]
+        if decode_start > 0 and calibration is not None:
+            return cls(decode_start, end_frame, total_pixels, window, buffer_size, calibration=calibration)
+        return cls(decode_start, end_frame, total_pixels, window, buffer_size,
+                   calibration_frames if calibration_frames >= 0 else None)
+
+    def update(self, current_frame, yellow_pixels, current_ratio=None):
+        """
+        Feeds one frame into the state machine.
+        Returns True when stamina became empty, False when it recovered, otherwise None.
+        """
+        if current_ratio is None:
+            current_ratio = yellow_pixels / self.total_pixels if self.total_pixels > 0 else 0
+
+        # Store pixel history
+        self.yellow_pixels_history.append(yellow_pixels)
+
+        # Calibration during initial frames
+        if current_frame - self.start_frame <= self.calibration_frames:
+            self.max_observed_ratio = max(self.max_observed_ratio, current_ratio)
+            self.min_observed_ratio = min(self.min_observed_ratio, current_ratio)
+            self.max_observed_pixels = max(self.max_observed_pixels, yellow_pixels)
+
+            # Adjust thresholds after calibration
+            if current_frame - self.start_frame == self.calibration_frames and self.max_observed_ratio > 0.05:
+                self.high_threshold = max(0.15, min(0.5, self.max_observed_ratio * 0.6))
+                self.low_threshold = max(0.05, min(0.15, self.max_observed_ratio * 0.12))
+
+        # Update buffers
+        yellow_ratios = self.yellow_ratios
+        yellow_ratios.append(current_ratio)
+        self.avg_ratio = avg_ratio = sum(yellow_ratios) / len(yellow_ratios)
+
+        # Detect trends
+        if len(yellow_ratios) >= 3:
+            self.rising_pattern.append(yellow_ratios[-1] > yellow_ratios[-2] > yellow_ratios[-3])
+            self.falling_pattern.append(yellow_ratios[-1] < yellow_ratios[-2] < yellow_ratios[-3])
+
+        # Pattern detection
+        history = self.yellow_pixels_history
+        if len(history) >= self.pattern_length:
+            max_observed_pixels = self.max_observed_pixels
+            consistently_low = all(p < max_observed_pixels * 0.15 for p in (history[-1], history[-2], history[-3]))
+            sudden_drop = (history[-1] < max_observed_pixels * 0.2 and
+                           history[-4] > max_observed_pixels * 0.5)
+            self.pattern_history.append(consistently_low or sudden_drop)
+
+        # Multi-criteria stamina detection
+        ratio_empty = avg_ratio < self.low_threshold
+        pattern_empty = self.is_pattern_empty()
+        trend_empty = all(self.falling_pattern) and avg_ratio < self.high_threshold * 0.4
+
+        is_empty = ratio_empty or (pattern_empty and avg_ratio < self.high_threshold * 0.3) or trend_empty
+
+        self.empty_buffer.append(is_empty)
+        buffer_empty = sum(self.empty_buffer) > len(self.empty_buffer) // 2
+
+        # Detect state changes
+        if buffer_empty and not self.stamina_empty:
+            self.stamina_empty = True
+            return True
+        if not buffer_empty and self.stamina_empty:
+            self.stamina_empty = False
+            return False
+        return None
+
+    def is_pattern_empty(self):
+        return len(self.pattern_history) > 0 and sum(self.pattern_history) > len(self.pattern_history) // 2
+
+def detect_stamina_events(yellow_pixels, start_frame, end_frame, total_pixels, state=None, estimator="pixels"):
+    """
+    Runs the state machine over a yellow pixel time series starting at start_frame.
+    Returns the list of (frame_number, is_empty) events.
+    """
+    if state is None:
+        state = StaminaStateMachine(start_frame, end_frame, total_pixels, *FILL_ESTIMATORS[estimator])
+    stamina_events = []
+    for offset, pixels in enumerate(np.asarray(yellow_pixels).tolist()):
+        event = state.update(start_frame + offset, pixels)
+        if event is not None:
+            stamina_events.append((start_frame + offset, event))
+    return stamina_events
+
+def calibrate_series(yellow_pixels, calibration_frames, total_pixels, estimator="pixels"):
+    """
+    Calibration of a continuous run over the yellow pixel series of the first calibration_frames + 1
+    frames of the video. Returns StaminaStateMachine.calibration for the later chunks.
+    """
+    state = StaminaStateMachine(0, 0, total_pixels, *FILL_ESTIMATORS[estimator], calibration_frames=calibration_frames)
+    detect_stamina_events(np.asarray(yellow_pixels)[:calibration_frames + 1], 0, 0, total_pixels, state)
+    return state.calibration
+
+def calibrate_state_machine(task, calibration_frames):
+    """
+    Decodes the first calibration_frames + 1 frames of the stamina rectangle in the calling process
+    and calibrates on them like a continuous run (see calibrate_series and ChunkTask.calibration).
+    """
+    x, y, w, h = task.rectangle_coords
+    info = probe_video(task.video_path)
+    crop = clip_crop(task.rectangle_coords, info["width"] or x + w, info["height"] or y + h)
+    frames = np.empty((calibration_frames + 1, crop[3], crop[2], 3), dtype=np.uint8)
+    with open_frame_source(task.video_path, crop=crop, backend=task.frame_source, info=info) as source:
+        filled = 0
+        while filled < len(frames) and source.read_into(frames[filled]):
+            filled += 1
+    yellow_pixels, _, _ = compute_yellow_ratios(
+        frames[:filled], task.lower_yellow, task.upper_yellow,
+        task.secondary_lower_yellow, task.secondary_upper_yellow, w * h, cleanup=task.mask_cleanup,
+        estimator=task.fill_estimator
+    )
+    return calibrate_series(yellow_pixels, calibration_frames, w * h, task.fill_estimator)
+
+def _save_chunk_debug_frame(frame, stamina_region, combined_mask, current_frame, yellow_pixels, state, rectangle_coords, output_dir_debug):
+    x, y, w, h = rectangle_coords
+    avg_ratio = state.avg_ratio
+    debug_output = frame.copy()
+    rect_color = (0, 0, 255) if avg_ratio < state.low_threshold else (0, 255, 0)
+    cv2.rectangle(debug_output, (x, y), (x + w, y + h), rect_color, 2)
+
+    info_text = f"Frame {current_frame}: Gelb-Ratio = {avg_ratio:.3f}, Pixel = {yellow_pixels}"
+    threshold_text = f"Schwellen: H={state.high_threshold:.2f}, L={state.low_threshold:.2f}, Max={state.max_observed_ratio:.2f}"
+    pattern_text = f"Pattern: {'Leer' if state.is_pattern_empty() else 'Gefüllt'}"
+
+    cv2.putText(debug_output, info_text, (x, y - 50), 
+              cv2.FONT_HERSHEY_SIMPLEX, 0.7, rect_color, 2)
+    cv2.putText(debug_output, threshold_text, (x, y - 30), 
+              cv2.FONT_HERSHEY_SIMPLEX, 0.7, rect_color, 2)
+    cv2.putText(debug_output, pattern_text, (x, y - 10), 
+              cv2.FONT_HERSHEY_SIMPLEX, 0.7, rect_color, 2)
+
+    mask_overlay = np.zeros_like(stamina_region)
+    mask_overlay[combined_mask > 0] = [0, 255, 255]
+    debug_region = cv2.addWeighted(stamina_region, 0.7, mask_overlay, 0.3, 0)
+    rh, rw = debug_region.shape[:2]
+    debug_output[y:y+rh, x:x+rw] = debug_region
+
+    # Save debug image
+    cv2.imwrite(f"{output_dir_debug}/frame_{current_frame}.jpg", debug_output)
+
+# Batch size of process_frame_chunk in debug mode, where every decoded full frame is kept for its batch
+DEBUG_BATCH_SIZE = 8
+
 # Define a worker function that will run in a separate process
 def process_frame_chunk(chunk_data):
-    video_path, start_frame, end_frame, rectangle_coords, lower_yellow, upper_yellow, secondary_lower_yellow, secondary_upper_yellow, debug, debug_interval, output_dir_debug, output_dir = chunk_data
+    """
+    Decodes the frames of one chunk, crops the stamina rectangle into a preallocated
+    (N, h, w, 3) batch buffer, masks the whole batch at once and then runs the
+    state machine over the resulting yellow pixel series.
+    With collect_stats the events come back as ChunkResult together with the worker's timings
+    (decode and state per frame, color/mask/morphology per batch).
+    """
+    task = ChunkTask(*chunk_data)
+    chunk_start = time.perf_counter()
+    stats = AnalysisStats() if task.collect_stats else None
+    start_frame, end_frame = task.start_frame, task.end_frame
+    # Frames before start_frame only warm up calibration and buffers, their events belong to the previous chunk
+    decode_start = task.decode_start if 0 <= task.decode_start <= start_frame else start_frame
+    debug = task.debug
     
-    x, y, w, h = rectangle_coords
-    cap = cv2.VideoCapture(video_path)
-    cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
-    fps = cap.get(cv2.CAP_PROP_FPS)
+    x, y, w, h = task.rectangle_coords
+    info = probe_video(task.video_path)
+    
+    # Clip the crop to the frame, the ratio still refers to the full rectangle
+    crop = clip_crop(task.rectangle_coords, info["width"] or x + w, info["height"] or y + h)
+    x0, y0, crop_w, crop_h = crop
+    total_pixels = w * h
+    
+    if debug:
+        # Debug images need the full frame
+        source = OpenCVFrameSource(task.video_path, start_frame=decode_start, info=info)
+    else:
+        # Only the stamina rectangle is decoded into the batch buffer
+        source = open_frame_source(task.video_path, crop=crop, start_frame=decode_start,
+                                   backend=task.frame_source, info=info)
+    
+    batch_size = max(1, task.batch_size)
+    if debug:
+        # The full frames of a batch are kept until the state machine has run over it
+        # (about 6 MB per 1080p frame), so debug runs use small batches
+        batch_size = min(batch_size, DEBUG_BATCH_SIZE)
+    batch = np.empty((batch_size, crop_h, crop_w, 3), dtype=np.uint8)
+    debug_frames = []
     
     # Status tracking variables
     stamina_events = []
-    current_frame = start_frame
-    stamina_empty = False
-    yellow_ratios = []
-    yellow_pixels_history = []
-    buffer_size = 5
-    empty_buffer = [False] * buffer_size
-    pattern_history = []
-    pattern_length = 10
-    rising_pattern = [False] * 3
-    falling_pattern = [False] * 3
+    current_frame = decode_start
+    state = _chunk_state_machine(task, decode_start, total_pixels)
     
-    # Calibration variables
-    max_observed_ratio = 0
-    min_observed_ratio = 1.0
-    max_observed_pixels = 0
-    calibration_frames = min(300, (end_frame - start_frame) // 4)  # Adjust calibration for chunk size
-    high_threshold = 0.35
-    low_threshold = 0.08
-    
-    # Process frames in this chunk
-    while current_frame < end_frame and cap.isOpened():
-        ret, frame = cap.read()
-        if not ret:
+    # Process frames in this chunk batch by batch
+    while current_frame < end_frame and source.isOpened():
+        if task.cancel_event is not None and task.cancel_event.is_set():
+            break
+        
+        wanted = min(batch_size, end_frame - current_frame)
+        filled = 0
+        decode_start_time = time.perf_counter()
+        while filled < wanted:
+            if debug:
+                ret, frame = source.read()
+                if not ret:
+                    break
+                batch[filled] = frame[y0:y0+crop_h, x0:x0+crop_w]
+                debug_frames.append(frame)
+            elif not source.read_into(batch[filled]):
+                break
+            filled += 1
+        
+        if stats is not None and filled:
+            # Pro Frame der Mittelwert des Batches, damit das Histogramm mit den anderen Phasen vergleichbar bleibt
+            decode_seconds = (time.perf_counter() - decode_start_time) / filled
+            for _ in range(filled):
+                stats.add("decode", decode_seconds)
+        if filled == 0:
             break
             
         try:
-            # Extract stamina region
-            stamina_region = frame[y:y+h, x:x+w]
-            
-            # Convert to HSV and create masks
-            hsv = cv2.cvtColor(stamina_region, cv2.COLOR_BGR2HSV)
-            primary_mask = cv2.inRange(hsv, lower_yellow, upper_yellow)
-            secondary_mask = cv2.inRange(hsv, secondary_lower_yellow, secondary_upper_yellow)
-            combined_mask = cv2.bitwise_or(primary_mask, secondary_mask)
-            
-            # Enhanced preprocessing
-            kernel = np.ones((3, 3), np.uint8)
-            combined_mask = cv2.morphologyEx(combined_mask, cv2.MORPH_OPEN, kernel)
-            combined_mask = cv2.morphologyEx(combined_mask, cv2.MORPH_CLOSE, kernel)
-            
-            # Calculate yellow pixel ratio
-            yellow_pixels = np.count_nonzero(combined_mask)
-            total_pixels = w * h
-            current_ratio = yellow_pixels / total_pixels if total_pixels > 0 else 0
-            
-            # Store pixel history
-            yellow_pixels_history.append(yellow_pixels)
-            if len(yellow_pixels_history) > pattern_length:
-                yellow_pixels_history.pop(0)
-            
-            # Calibration during initial frames
-            if current_frame - start_frame <= calibration_frames:
-                max_observed_ratio = max(max_observed_ratio, current_ratio)
-                min_observed_ratio = min(min_observed_ratio, current_ratio)
-                max_observed_pixels = max(max_observed_pixels, yellow_pixels)
-                
-                # Adjust thresholds after calibration
-                if current_frame - start_frame == calibration_frames and max_observed_ratio > 0.05:
-                    high_threshold = max(0.15, min(0.5, max_observed_ratio * 0.6))
-                    low_threshold = max(0.05, min(0.15, max_observed_ratio * 0.12))
-            
-            # Update buffers
-            yellow_ratios.append(current_ratio)
-            if len(yellow_ratios) > 10:
-                yellow_ratios.pop(0)
-            
-            avg_ratio = sum(yellow_ratios) / len(yellow_ratios)
-            
-            # Detect trends
-            if len(yellow_ratios) >= 3:
-                rising_pattern.append(yellow_ratios[-1] > yellow_ratios[-2] > yellow_ratios[-3])
-                falling_pattern.append(yellow_ratios[-1] < yellow_ratios[-2] < yellow_ratios[-3])
-                rising_pattern.pop(0)
-                falling_pattern.pop(0)
-            
-            # Pattern detection
-            if len(yellow_pixels_history) >= pattern_length:
-                consistently_low = all(p < max_observed_pixels * 0.15 for p in yellow_pixels_history[-3:])
-                sudden_drop = (yellow_pixels_history[-1] < max_observed_pixels * 0.2 and
-                              yellow_pixels_history[-4] > max_observed_pixels * 0.5)
-                
-                pattern_empty = consistently_low or sudden_drop
-                pattern_history.append(pattern_empty)
-                if len(pattern_history) > buffer_size:
-                    pattern_history.pop(0)
+            yellow_pixels, _, masks = compute_yellow_ratios(
+                batch[:filled], task.lower_yellow, task.upper_yellow,
+                task.secondary_lower_yellow, task.secondary_upper_yellow, total_pixels, stats, task.mask_cleanup,
+                task.fill_estimator
+            )
+        except Exception as e:
+            print(f"Error processing frames {current_frame}-{current_frame + filled - 1}: {str(e)}")
+            current_frame += filled
+            debug_frames.clear()
+            continue
+        
+        for i, pixels in enumerate(yellow_pixels.tolist()):
+            state_start = time.perf_counter()
+            event = state.update(current_frame, pixels)
+            if stats is not None:
+                stats.add("state", time.perf_counter() - state_start)
+            if current_frame < start_frame:
+                current_frame += 1
+                continue
             
             # Debug output
-            if debug and current_frame % debug_interval == 0:
-                debug_output = frame.copy()
-                rect_color = (0, 0, 255) if avg_ratio < low_threshold else (0, 255, 0)
-                cv2.rectangle(debug_output, (x, y), (x + w, y + h), rect_color, 2)
-                
-                info_text = f"Frame {current_frame}: Gelb-Ratio = {avg_ratio:.3f}, Pixel = {yellow_pixels}"
-                threshold_text = f"Schwellen: H={high_threshold:.2f}, L={low_threshold:.2f}, Max={max_observed_ratio:.2f}"
-                pattern_text = f"Pattern: {'Leer' if sum(pattern_history) > len(pattern_history)//2 else 'Gefüllt'}"
-                
-                cv2.putText(debug_output, info_text, (x, y - 50), 
-                          cv2.FONT_HERSHEY_SIMPLEX, 0.7, rect_color, 2)
-                cv2.putText(debug_output, threshold_text, (x, y - 30), 
-                          cv2.FONT_HERSHEY_SIMPLEX, 0.7, rect_color, 2)
-                cv2.putText(debug_output, pattern_text, (x, y - 10), 
-                          cv2.FONT_HERSHEY_SIMPLEX, 0.7, rect_color, 2)
-                
-                mask_overlay = np.zeros_like(stamina_region)
-                mask_overlay[combined_mask > 0] = [0, 255, 255]
-                debug_region = cv2.addWeighted(stamina_region, 0.7, mask_overlay, 0.3, 0)
-                debug_output[y:y+h, x:x+w] = debug_region
-                
-                # Save debug image
-                cv2.imwrite(f"{output_dir_debug}/frame_{current_frame}.jpg", debug_output)
-            
-            # Multi-criteria stamina detection
-            ratio_empty = avg_ratio < low_threshold
-            pattern_empty = len(pattern_history) > 0 and sum(pattern_history) > len(pattern_history)//2
-            trend_empty = all(falling_pattern) and avg_ratio < high_threshold * 0.4
+            if debug and current_frame % task.debug_interval == 0:
+                _save_chunk_debug_frame(debug_frames[i], batch[i], masks[i], current_frame, pixels,
+                                        state, task.rectangle_coords, task.output_dir_debug)
             
-            is_empty = ratio_empty or (pattern_empty and avg_ratio < high_threshold * 0.3) or trend_empty
-            
-            empty_buffer.append(is_empty)
-            empty_buffer.pop(0)
-            buffer_empty = sum(empty_buffer) > len(empty_buffer) // 2
-            
-            # Detect state changes
-            if buffer_empty and not stamina_empty:
-                stamina_empty = True
+            if event is True:
                 # Save frame number and empty state instead of formatted time
                 stamina_events.append((current_frame, True))
                 
                 # Save the image of the moment when stamina becomes empty
                 if debug:
-                    stamina_lost_frame = frame.copy()
+                    stamina_lost_frame = debug_frames[i].copy()
                     cv2.rectangle(stamina_lost_frame, (x, y), (x + w, y + h), (0, 0, 255), 2)  # Red = empty
-                    cv2.putText(stamina_lost_frame, f"Out of Stamina @ Frame {current_frame} (Ratio: {avg_ratio:.2f})", 
+                    cv2.putText(stamina_lost_frame, f"Out of Stamina @ Frame {current_frame} (Ratio: {state.avg_ratio:.2f})", 
                               (x, y - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
-                    cv2.imwrite(f"{output_dir}/stamina_lost_{current_frame}.jpg", stamina_lost_frame)
+                    cv2.imwrite(f"{task.output_dir}/stamina_lost_{current_frame}.jpg", stamina_lost_frame)
                 
-            elif not buffer_empty and stamina_empty:
-                stamina_empty = False
+            elif event is False:
                 # Save frame number and recovery state
                 stamina_events.append((current_frame, False))
-                
-                # Save the image of the moment when stamina recovers
-                if debug:
-                    recovery_frame = frame.copy()
-                    cv2.rectangle(recovery_frame, (x, y), (x + w, y + h), (0, 255, 0), 2)  # Green = filled
-                    cv2.putText(recovery_frame, f"Stamina Recovery @ Frame {current_frame} (Ratio: {avg_ratio:.2f})", 
-                              (x, y - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-                    # cv2.imwrite(f"{output_dir}/stamina_recovery_{current_frame}.jpg", recovery_frame)
             
             current_frame += 1
-            
-        except Exception as e:
-            print(f"Error processing frame {current_frame}: {str(e)}")
-            current_frame += 1
+        
+        debug_frames.clear()
+        if task.progress_queue is not None:
+            task.progress_queue.put((start_frame, max(0, current_frame - start_frame), len(stamina_events)))
+        if filled < wanted:
+            break
     
-    cap.release()
-    return stamina_events
+    source.release()
+    return _chunk_result(task, stats, stamina_events, current_frame - decode_start, chunk_start)
+
+def _chunk_state_machine(task, decode_start, total_pixels):
+    return StaminaStateMachine.for_chunk(decode_start, task.end_frame, total_pixels, task.fill_estimator,
+                                         task.calibration_frames, task.calibration)
+
+def _chunk_result(task, stats, stamina_events, frames, chunk_start):
+    """Ereignisliste ohne collect_stats, sonst ChunkResult mit einer Block-Zeile für diesen Chunk"""
+    if stats is None:
+        return stamina_events
+    stats.add_block(start_frame=task.start_frame, end_frame=task.end_frame, decode_start=task.decode_start,
+                    frames=frames, events=len(stamina_events), seconds=time.perf_counter() - chunk_start,
+                    pid=os.getpid())
+    return ChunkResult(stamina_events, stats.to_dict())
+
+class ROIFrameCache:
+    """
+    Kompakter Frame-Cache für den ROI im Single-Pass-Modus. Die Frames liegen in einer
+    np.memmap-Datei auf der Festplatte, damit Farbkalibrierung, Rechteckerkennung und
+    Analyse dieselben, nur einmal dekodierten Frames nutzen können.
+    """
+    def __init__(self, capacity, frame_shape, directory=None):
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        fd, self.path = tempfile.mkstemp(suffix=".roi", dir=directory)
+        os.close(fd)
+        self.frames = np.memmap(self.path, dtype=np.uint8, mode="w+", shape=(max(1, capacity),) + tuple(frame_shape))
+        self.capacity = max(1, capacity)
+        self.count = 0
+
+    def fill(self, source, max_frames):
+        """Liest bis zu max_frames Frames aus der Quelle in den Cache, gibt die Anzahl zurück"""
+        read = 0
+        while read < max_frames and self.count < self.capacity:
+            if not source.read_into(self.frames[self.count]):
+                break
+            self.count += 1
+            read += 1
+        return read
+
+    def __len__(self):
+        return self.count
+
+    def close(self):
+        self.frames = None
+        if os.path.exists(self.path):
+            os.remove(self.path)
 
 class VideoAnalyzer:
-    def __init__(self, video_path, output_dir="./output/", debug=False):
+    def __init__(self, video_path, output_dir="./output/", debug=False, worker_pool=None, video_info=None):
         self.video_path = video_path
+        # Geteilter AnalysisWorkerPool, ohne Pool startet analyze_video einen eigenen für den Aufruf
+        self.worker_pool = worker_pool
         self.output_dir = output_dir
         self.output_dir_debug = "./debug/"
         self.debug = debug
         os.makedirs(self.output_dir, exist_ok=True)
         os.makedirs(self.output_dir_debug, exist_ok=True)
         
-        self.cap = cv2.VideoCapture(self.video_path)
-        self.frame_count = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        self.frame_width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-        self.frame_height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-        self.fps = int(self.cap.get(cv2.CAP_PROP_FPS))
+        # video_info (wie frameSource.probe_video) ersetzt das Auslesen der Datei, z.B. während eines Downloads
+        self.cap = cv2.VideoCapture(self.video_path) if video_info is None else cv2.VideoCapture()
+        video_info = video_info or {
+            "frame_count": self.cap.get(cv2.CAP_PROP_FRAME_COUNT),
+            "width": self.cap.get(cv2.CAP_PROP_FRAME_WIDTH),
+            "height": self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT),
+            "fps": self.cap.get(cv2.CAP_PROP_FPS),
+        }
+        self.frame_count = int(video_info["frame_count"])
+        self.frame_width = int(video_info["width"])
+        self.frame_height = int(video_info["height"])
+        self.fps = int(video_info["fps"])
         self.duration = self.frame_count / self.fps if self.fps > 0 else 0  # Video duration in seconds
         
         # New World spezifische ROI für die Stamina-Leiste
@@ -240,50 +656,143 @@ class VideoAnalyzer:
         self.color_samples = []
         self.stamina_positions = []
         
-    async def _process_frame_for_samples(self, frame, x1, y1, x2, y2):
-        """Verarbeitet einen Frame für die Farbprobensammlung - asynchron"""
-        # Diese rechenintensive Funktion in einen separaten Thread auslagern
-        def process_frame():
-            roi = frame[y1:y2, x1:x2]
-            hsv_roi = cv2.cvtColor(roi, cv2.COLOR_BGR2HSV)
-            mask = cv2.inRange(hsv_roi, self.lower_yellow, self.upper_yellow)
-            yellow_pixels = []
-            
-            if np.count_nonzero(mask) > 50:  # Wenn genügend gelbe Pixel vorhanden sind
-                # Extrahiere die gelben Pixel
-                yellow_pixels = hsv_roi[mask > 0].tolist()
-            
-            return yellow_pixels
+        # Höchstzahl der gelben Pixel für die HSV-Kalibrierung, größere Mengen werden gleichmäßig ausgedünnt (0 = alle)
+        self.color_sample_budget = 200_000
+        
+        # Anzahl der Frames, die in analyze_video gemeinsam als Batch maskiert werden (1 = Einzelframes)
+        self.frame_batch_size = 256
+        
+        # Frames pro Thread-Aufruf beim Training: Dekodierung und Kandidatensuche laufen blockweise außerhalb
+        # des Event-Loops (im Debug-Modus liegen dabei volle Frames im Speicher)
+        self.thread_batch_size = 16
+        
+        # Dekodier-Backend: "auto" nutzt ffmpeg zum Zuschneiden auf ROI/Rechteck, falls installiert
+        self.frame_source = "auto"
+        
+        # Single-Pass-Modus: maximale Größe des ROI-Caches (memmap auf der Festplatte) für das Trainingsfenster.
+        # Passt das Trainingsfenster nicht hinein, bricht analyze_single_pass ab statt das Training zu kürzen
+        self.single_pass_cache_bytes = 4 * 1024 * 1024 * 1024
+        self.single_pass_cache_dir = None  # None = System-Tempverzeichnis
+        
+        # Überlappung der Chunks in analyze_video: Die Zustandspuffer (gleitender Mittelwert, Muster, Mehrheitsentscheid)
+        # reichen höchstens 15 Frames zurück, die Schwellwerte kommen aus der gemeinsamen Kalibrierung
+        self.chunk_warmup_frames = 30
+        
+        # Bereinigung der Gelbmaske in analyze_video (MASK_CLEANUP_MODES): "rows" filtert nur zeilenweise (1x3)
+        # und ist günstiger, "morphology" ist das bisherige Öffnen/Schließen mit 3x3
+        self.mask_cleanup = "morphology"
+        
+        # Füllstand-Schätzer (FILL_ESTIMATORS): "columns" liest die Füllkante aus der Spaltenprojektion der Maske,
+        # rauscht weniger und erlaubt kürzere Glättungsfenster im Zustandsautomaten
+        self.fill_estimator = "pixels"
         
-        # Führe rechenintensive Operationen in einem Thread aus
-        return await asyncio.to_thread(process_frame)
+        # Konvergenz-Training in find_stable_rectangle: > 0 wertet so viele verteilte Frames aus und bricht ab,
+        # sobald das beste Rechteck stabil ist (0 = die ersten training_frame_count Frames der Reihe nach)
+        self.training_samples = 0
+        self.training_time_budget = None  # Sekunden
         
+        # Letzter Fortschritt von analyze_video (AnalysisProgress mit fps und bisher gefundenen Ereignissen)
+        self.progress = None
+        
+        # Messwerte der Worker aus dem letzten analyze_video, eine Block-Zeile pro Chunk (siehe analysisStats),
+        # und Durchsatz pro Worker-Prozess in diesem Auftrag (AnalysisJob.worker_stats)
+        self.analysis_stats = AnalysisStats()
+        self.worker_stats = {}
+        
+    def _yellow_sample_pixels(self, roi):
+        """Gelbe Pixel eines ROI als (N, 3) uint8-HSV-Array für die Farbkalibrierung"""
+        hsv_roi = cv2.cvtColor(roi, cv2.COLOR_BGR2HSV)
+        mask = cv2.inRange(hsv_roi, self.lower_yellow, self.upper_yellow)
+        
+        if np.count_nonzero(mask) > 50:  # Wenn genügend gelbe Pixel vorhanden sind
+            return hsv_roi[mask > 0]
+        return np.empty((0, 3), dtype=np.uint8)
+        
+    async def verify_rectangle(self, rectangle, lower_yellow=None, upper_yellow=None, sample_count=24,
+                               min_matches=4, min_match_ratio=0.6):
+        """
+        Prüft ein bekanntes Rechteck samt HSV-Bereich (z.B. aus einem früheren VOD desselben Spielers)
+        auf wenigen verteilten Frames, statt komplett neu zu trainieren. Bestätigt ist es, wenn ein
+        Kandidat mindestens min_matches-mal an dieser Stelle lag, und zwar in mindestens min_match_ratio
+        der Frames mit gültigen Kandidaten. Bei Erfolg wird der HSV-Bereich übernommen.
+        """
+        x, y, w, h = rectangle
+        if w <= 0 or h <= 0 or x + w > self.frame_width or y + h > self.frame_height:
+            return False
+        previous_range = self.lower_yellow, self.upper_yellow
+        if lower_yellow is not None and upper_yellow is not None:
+            self.lower_yellow, self.upper_yellow = np.array(lower_yellow), np.array(upper_yellow)
+        
+        keyframes = await asyncio.to_thread(probe_keyframes, self.video_path, self.fps)
+        positions = sample_positions(0, self.frame_count, sample_count, keyframes)
+        x1, y1, x2, y2 = self._roi_box()
+        # Gleiche Toleranz wie die Abweichung der erkannten Leiste im alten Analyzer (60 px bei 1080p)
+        max_deviation = self.frame_height * 60 / 1080
+        
+        roi_area = (x2 - x1) * (y2 - y1)
+        source = self._open_roi_source()
+        
+        def check_sample(position):
+            """(gültige Kandidaten vorhanden, Kandidat am Rechteck) für eine Stichprobe, in einem Thread"""
+            source.seek(position)
+            ret, roi = source.read()
+            if not ret:
+                return False, False
+            candidates = [c for c in self._detect_stamina_candidates(roi, x1, y1)
+                          if self._score_candidate(c, roi_area) is not None]
+            return bool(candidates), any(abs(cx - x) + abs(cy - y) + abs(cw - w) + abs(ch - h) <= max_deviation
+                                         for cx, cy, cw, ch, *_ in candidates)
+        
+        seen = matched = 0
+        try:
+            for position in positions:
+                visible, at_rectangle = await asyncio.to_thread(check_sample, position)
+                seen += visible
+                matched += at_rectangle
+                # Früh aufhören, sobald genug übereinstimmende Frames gesehen wurden
+                if matched >= 2 * min_matches and matched >= min_match_ratio * seen:
+                    break
+        finally:
+            source.release()
+        
+        verified = matched >= min_matches and matched >= min_match_ratio * seen
+        if not verified:
+            self.lower_yellow, self.upper_yellow = previous_range
+        return verified
+
     async def _collect_color_samples(self, frame_count, skip_frames=0):
         """Sammelt Farbproben aus dem Video, um die HSV-Bereiche anzupassen"""
-        cap = cv2.VideoCapture(self.video_path)
+        # Es wird nur der ROI dekodiert bzw. übertragen
+        source = self._open_roi_source()
         samples = []
         frames_to_sample = 20  # Anzahl der Frames für Proben
         
         # Berechne Schrittweite, um Proben über das gesamte Video zu verteilen
         step = max(1, (frame_count - skip_frames) // frames_to_sample)
         
-        for i in range(skip_frames + 1, frame_count, step):
-            cap.set(cv2.CAP_PROP_POS_FRAMES, i)
-            ret, frame = cap.read()
-            if not ret:
-                break
-                
-            # ROI extrahieren
-            x1, y1, x2, y2 = self._calculate_roi(frame)
-            
-            # Verarbeite Frame asynchron
-            yellow_pixels = await self._process_frame_for_samples(frame, x1, y1, x2, y2)
-            samples.extend(yellow_pixels)
-            
-            # Erlaube dem Event Loop andere Tasks zu verarbeiten
-            await asyncio.sleep(0)
+        def collect():
+            # Sprünge, Dekodierung und Auswertung der Probenframes zusammen in einem Thread
+            for i in range(skip_frames + 1, frame_count, step):
+                source.seek(i)
+                ret, roi = source.read()
+                if not ret:
+                    break
+                samples.append(self._yellow_sample_pixels(roi))
         
-        cap.release()
+        try:
+            await asyncio.to_thread(collect)
+        finally:
+            source.release()
+        return self._merge_color_samples(samples)
+    
+    def _merge_color_samples(self, samples):
+        """
+        Fügt die Farbproben der einzelnen Frames zu einem (N, 3) uint8-Array zusammen und dünnt es
+        gleichmäßig auf höchstens color_sample_budget Proben aus (helle VODs liefern sonst Millionen Pixel).
+        """
+        samples = np.concatenate(samples) if samples else np.empty((0, 3), dtype=np.uint8)
+        if self.color_sample_budget and len(samples) > self.color_sample_budget:
+            samples = samples[::-(-len(samples) // self.color_sample_budget)]
         return samples
         
     def _calculate_hsv_range(self, samples):
@@ -291,12 +800,11 @@ class VideoAnalyzer:
         Berechnet optimalen HSV-Bereich aus Farbproben mit spezieller Anpassung für
         die gelbe Stamina-Leiste in New World unter verschiedenen Beleuchtungsbedingungen.
         """
-        if not samples or len(samples) < 50:
+        samples = np.asarray(samples, dtype=np.uint8).reshape(-1, 3)
+        if len(samples) < 50:
             # Fallback auf vorkonfigurierte Werte für New World Stamina-Gelb
             # Breiterer Bereich, der verschiedene Beleuchtungsbedingungen abdeckt
             return np.array([20, 70, 80]), np.array([60, 255, 255])
-            
-        samples = np.array(samples)
         
         # Berechne Mittelwerte und Standardabweichungen
         mean = np.mean(samples, axis=0)
@@ -308,20 +816,15 @@ class VideoAnalyzer:
             print(f"HSV Standardabweichung: {std}")
         
         # Identifiziere und entferne Ausreißer für stabilere Ergebnisse
-        filtered_samples = []
-        for sample in samples:
-            h, s, v = sample
-            # Ausreißerfilter: Entferne Samples, die mehr als 2 Std.-Abw. vom Mittelwert entfernt sind
-            if (abs(h - mean[0]) < 2.5 * std[0] and 
-                abs(s - mean[1]) < 2.5 * std[1] and 
-                abs(v - mean[2]) < 2.5 * std[2]):
-                filtered_samples.append(sample)
+        # Ausreißerfilter: Entferne Samples, die in einem Kanal mehr als 2.5 Std.-Abw. vom Mittelwert entfernt sind
+        inliers = np.all(np.abs(samples - mean) < 2.5 * std, axis=1)
+        filtered_samples = samples[inliers]
         
         # Wenn zu viele Ausreißer entfernt wurden, verwende die Originalproben
         if len(filtered_samples) < len(samples) * 0.6:
             filtered_samples = samples
         else:
-            samples = np.array(filtered_samples)
+            samples = filtered_samples
             # Berechne neue Mittelwerte und Standardabweichungen nach der Filterung
             mean = np.mean(samples, axis=0)
             std = np.std(samples, axis=0)
@@ -331,9 +834,9 @@ class VideoAnalyzer:
                 print(f"Gefilterte HSV Mittelwerte: {mean}")
         
         # Berechne die Anzahl der einzigartigen Farbwerte in jeder Dimension
-        unique_h = len(np.unique(samples[:, 0]))
-        unique_s = len(np.unique(samples[:, 1]))
-        unique_v = len(np.unique(samples[:, 2]))
+        unique_h, unique_s, unique_v = (
+            np.count_nonzero(np.bincount(samples[:, channel], minlength=256)) for channel in range(3)
+        )
         
         if self.debug:
             print(f"Einzigartige Werte - H: {unique_h}, S: {unique_s}, V: {unique_v}")
@@ -409,64 +912,6 @@ class VideoAnalyzer:
             
         return lower_yellow.astype(np.uint8), upper_yellow.astype(np.uint8)
 
-    async def _process_frame(self, frame, x1, y1, x2, y2):
-        """Verarbeitet einen Frame für die Stamina-Erkennung - asynchron"""
-        # Diese rechenintensive Funktion in einen separaten Thread auslagern
-        def process():
-            roi = frame[y1:y2, x1:x2]
-            
-            # In verschiedene Farbräume konvertieren für robustere Erkennung
-            hsv_roi = cv2.cvtColor(roi, cv2.COLOR_BGR2HSV)
-            
-            # Primäre Maske mit unseren HSV-Grenzen
-            yellow_mask = cv2.inRange(hsv_roi, self.lower_yellow, self.upper_yellow)
-            
-            # Verbesserte Vorverarbeitung
-            kernel = np.ones((3,3), np.uint8)
-            yellow_mask = cv2.morphologyEx(yellow_mask, cv2.MORPH_OPEN, kernel)
-            yellow_mask = cv2.morphologyEx(yellow_mask, cv2.MORPH_CLOSE, kernel)
-            
-            # Rauschunterdrückung
-            yellow_mask = cv2.medianBlur(yellow_mask, 5)
-            
-            # Kontur-basierte Erkennung
-            contours, _ = cv2.findContours(yellow_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-            
-            stamina_candidates = []
-            
-            for contour in contours:
-                area = cv2.contourArea(contour)
-                if area < 50:  # Ignoriere zu kleine Konturen
-                    continue
-                    
-                # Bounding box der Kontur
-                x, y, w, h = cv2.boundingRect(contour)
-                
-                # Anpassung der Koordinaten zum Originalbild
-                x_global, y_global = x + x1, y + y1
-                
-                # Prüfe Rechteckform (sollte längliches Rechteck sein)
-                aspect_ratio = w / h if h > 0 else 0
-                
-                # Erweitere die Kriterien für mögliche Stamina-Leisten
-                if (w >= self.min_rect_width and 
-                    h >= self.min_rect_height and 
-                    h <= self.max_rect_height and
-                    aspect_ratio > 4):  # Etwas flexibler mit dem Seitenverhältnis
-                    
-                    # Prüfe horizontale Position (sollte ungefähr mittig sein)
-                    center_x = x_global + w/2
-                    center_y = y_global + h/2
-                    
-                    # Erweitere den akzeptierten Bereich
-                    if 0.3 * self.frame_width <= center_x <= 0.7 * self.frame_width:
-                        stamina_candidates.append((x_global, y_global, w, h, area, aspect_ratio))
-            
-            return stamina_candidates
-        
-        # Führe rechenintensive Operationen in einem Thread aus
-        return await asyncio.to_thread(process)
-
     async def find_stable_rectangle(self, training_frame_count: int, skip_first_frames_count: int):
         """
         Findet die stabile Position der Stamina-Leiste durch Analyse mehrerer Frames.
@@ -474,22 +919,22 @@ class VideoAnalyzer:
         """
         # Dynamische Farbanpassung durch Sammeln von Farbproben
         samples = await self._collect_color_samples(training_frame_count, skip_first_frames_count)
-        if samples:
+        if len(samples):
             # Optimiere den HSV-Farbbereich basierend auf den gesammelten Farbproben
             self.lower_yellow, self.upper_yellow = self._calculate_hsv_range(samples)
             
         # Beginne die Suche nach dem stabilen Rechteck
-        self.cap.set(cv2.CAP_PROP_POS_FRAMES, skip_first_frames_count)
+        # Im Debug-Modus werden volle Frames für die Debug-Bilder benötigt, sonst reicht der ROI
+        if self.debug:
+            source = OpenCVFrameSource(self.video_path, start_frame=skip_first_frames_count)
+        else:
+            source = self._open_roi_source(skip_first_frames_count)
+        x1, y1, x2, y2 = self._roi_box()
         frame_number = skip_first_frames_count
         
         # Fallback-Rechteck für New World Stamina-Leiste - positioniert im typischen UI-Bereich
         # Dies wird verwendet, wenn keine guten Erkennungsergebnisse vorliegen
-        stamina_region_y = int(self.target_y_position)
-        stamina_region_height = 8  # Typische Höhe der New World Stamina-Leiste
-        stamina_region_width = int(self.frame_width * 0.25)  # Typische Breite (25% der Bildschirm-Breite)
-        stamina_region_x = int(self.frame_width * 0.5 - stamina_region_width / 2)  # Zentriert
-        
-        fallback_rect = (stamina_region_x, stamina_region_y, stamina_region_width, stamina_region_height)
+        fallback_rect = self._fallback_rectangle()
         
         if self.debug:
             print(f"Fallback-Rechteck bei: {fallback_rect}")
@@ -516,16 +961,17 @@ class VideoAnalyzer:
         # Wichtig: Wir wollen eine stabile Stamina-Leiste innerhalb des ROI finden, 
         # nicht den ROI selbst verwenden
         
-        while self.cap.isOpened() and frame_number < (training_frame_count + skip_first_frames_count):
-            ret, frame = self.cap.read()
-            if not ret:
-                break
-
-            frame_number += 1
-            
-            # ROI auf den unteren mittleren Bereich des Bildschirms beschränken
-            x1, y1, x2, y2 = self._calculate_roi(frame)
-            
+        # Konvergenz-Training: verteilte Stichproben statt aufeinanderfolgender Frames
+        positions = tracker = None
+        if self.training_samples > 0:
+            keyframes = await asyncio.to_thread(probe_keyframes, self.video_path, self.fps)
+            end_frame = min(self.frame_count, skip_first_frames_count + training_frame_count)
+            positions = iter(sample_positions(skip_first_frames_count, end_frame, self.training_samples, keyframes))
+            tracker = ConvergenceTracker(time_budget=self.training_time_budget)
+        
+        # Dekodierung und Kandidatensuche laufen blockweise in einem Thread
+        async for frame_number, frame, candidates in self._detect_in_blocks(
+                source, (x1, y1, x2, y2), frame_number, training_frame_count + skip_first_frames_count, positions):
             # Debug-Ausgabe der ROI für jeden 200. Frame
             if self.debug and frame_number % 200 == 0:
                 debug_frame = frame.copy()
@@ -534,9 +980,6 @@ class VideoAnalyzer:
                           cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 255), 2)
                 cv2.imwrite(f"{self.output_dir_debug}/roi_frame_{frame_number}.jpg", debug_frame)
             
-            # Asynchrone Frame-Verarbeitung
-            candidates = await self._process_stamina_frame_for_detection(frame, x1, y1, x2, y2)
-            
             # WICHTIGER FIX: Bewerte nur die inneren Rechtecke, nicht den kompletten ROI
             # Multi-Methoden-Scoring für robustere Erkennung
             if not candidates and frame_number % 300 == 0 and self.debug:
@@ -547,97 +990,14 @@ class VideoAnalyzer:
                           cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 0, 0), 2)
                 cv2.imwrite(f"{self.output_dir_debug}/no_candidates_{frame_number}.jpg", debug_frame)
                 
+            roi_area = (x2 - x1) * (y2 - y1)
             for rect_info in candidates:
-                x_global, y_global, w, h, area, aspect_ratio, yellow_ratio = rect_info
-                
-                # Die Stamina-Leiste muss INNERHALB des ROI sein und KLEINER als der ROI
-                # Prüfen, ob das Rechteck viel kleiner als der ROI ist
-                roi_area = (x2 - x1) * (y2 - y1)
-                rect_area = w * h
-                
-                # Wenn das Rechteck zu groß ist (mehr als 50% des ROI), ignoriere es
-                if rect_area > roi_area * 0.5:
+                scored = self._score_candidate(rect_info, roi_area)
+                if scored is None:
                     continue
-                
-                # 1. POSITION - Bewertet die Übereinstimmung mit der erwarteten vertikalen Position
-                # New World Stamina-Leiste befindet sich typischerweise bei ca. 85-90% der Bildhöhe
-                vertical_position_score = 1.0 - (abs(y_global + h/2 - self.target_y_position) / self.frame_height)
-                vertical_position_score = max(0, min(1, vertical_position_score * 2))  # Steile Bewertungskurve
-                
-                # 2. HORIZONTAL - Bewertet die horizontale Zentrierung
-                # Stamina-Leiste ist typischerweise horizontal zentriert
-                horizontal_center_score = 1.0 - (abs(x_global + w/2 - self.frame_width/2) / (self.frame_width/2))
-                horizontal_center_score = max(0, min(1, horizontal_center_score * 1.5))  # Erhöhte Gewichtung
-                
-                # 3. FORM - Bewertet das Seitenverhältnis
-                # Stamina-Leiste ist typischerweise 8-15x breiter als hoch
-                aspect_ratio_score = 0
-                if aspect_ratio >= 5 and aspect_ratio <= 30:  # Gültiger Bereich
-                    if aspect_ratio <= 20:
-                        aspect_ratio_score = aspect_ratio / 15  # Linear ansteigend bis 15:1
-                    else:
-                        aspect_ratio_score = 1.0 - (aspect_ratio - 15) / 15  # Linear abfallend über 15:1
-                
-                # 4. DIMENSIONEN - Bewertet die Größe
-                # Typische Dimensionen der Stamina-Leiste
-                width_score = 0
-                height_score = 0
-                
-                # Höhe: Typischerweise 5-12 Pixel - STRIKTER FÜR KORREKTE ERKENNUNG
-                if 5 <= h <= 10:
-                    height_score = 1.0  # Perfekte Höhe
-                elif 3 <= h < 5 or 10 < h <= 12:
-                    height_score = 0.7  # Akzeptable Höhe
-                else:
-                    height_score = 0.3 * max(0, 1 - (abs(h - 7.5) / 7.5))  # Abnehmende Bewertung
-                
-                # Breite: Typischerweise 15-25% der Bildschirmbreite
-                width_ratio = w / self.frame_width
-                if 0.15 <= width_ratio <= 0.25:
-                    width_score = 1.0  # Perfekte Breite
-                elif 0.1 <= width_ratio < 0.15 or 0.25 < width_ratio <= 0.35:
-                    width_score = 0.7  # Akzeptable Breite
-                else:
-                    width_score = 0.3 * max(0, 1 - (abs(width_ratio - 0.2) / 0.2))  # Abnehmende Bewertung
-                
-                size_score = (height_score + width_score) / 2
-                
-                # 5. FARBE - Bewertet den Gelbanteil - KRITISCH FÜR KORREKTE ERKENNUNG
-                # Stamina-Leiste sollte einen hohen Anteil an gelben Pixeln haben
-                color_score = min(1.0, yellow_ratio * 2)  # Linear bis 50%, dann bei 1.0 gedeckelt
-                
-                # Bonus für sehr hohen Gelbanteil (typisch für die eigentliche Stamina-Leiste)
-                if yellow_ratio > 0.6:
-                    color_score += 0.5
-                
-                # 6. KONSISTENZ - Bewertet die temporale Stabilität
-                # Dieser Teil wird durch die Counter-Mechanik implementiert
-                
-                # Gewichteter Gesamt-Score für diesen Kandidaten
-                # VERSTÄRKTE GEWICHTUNG FÜR GRÖSSEN- UND FARBKRITERIEN
-                total_score = (
-                    vertical_position_score * 2.0 +    # Position ist wichtig
-                    horizontal_center_score * 2.0 +    # Zentrierung ist wichtig
-                    aspect_ratio_score * 2.0 +         # Form ist wichtig
-                    size_score * 3.0 +                 # Dimensionen sind SEHR wichtig (erhöht)
-                    color_score * 3.0                  # Farbe ist SEHR wichtig (erhöht)
-                )
-                
-                # ZUSÄTZLICHE STRAFE FÜR ZU GROSSE RECHTECKE
-                if h > 12 or width_ratio > 0.3:
-                    total_score *= 0.5  # Stark reduzierter Score für zu große Rechtecke
-                
-                # Speichere den Score
-                rect_key = (x_global, y_global, w, h)
-                rectangle_scores[rect_key] = total_score
-                
-                # Höher bewertete Kandidaten werden mehrfach gezählt
-                count_weight = max(1, int(total_score))
-                for _ in range(count_weight):
-                    self.rectangle_counter[rect_key] += 1
-                
-                # Für die Höhenerkennung
-                position_weighted_counter[y_global] += count_weight
+                rect_key, total_score, score_parts = scored
+                x_global, y_global, w, h = rect_key
+                self._count_candidate(rect_key, total_score, rectangle_scores, position_weighted_counter)
                 
                 # Debug-Ausgabe für Kandidaten mit hohen Scores
                 if self.debug and total_score > 5.0 and frame_number % 100 == 0:
@@ -654,10 +1014,10 @@ class VideoAnalyzer:
                     # Füge detaillierte Score-Informationen hinzu
                     score_info = [
                         f"Total Score: {total_score:.1f}",
-                        f"Position V/H: {vertical_position_score:.2f}/{horizontal_center_score:.2f}",
-                        f"Form: {aspect_ratio_score:.2f} (Ratio {aspect_ratio:.1f})",
-                        f"Größe: {size_score:.2f} ({w}x{h} Pixel)",
-                        f"Farbe: {color_score:.2f} (Gelb: {yellow_ratio:.2f})"
+                        f"Position V/H: {score_parts['vertical_position']:.2f}/{score_parts['horizontal_center']:.2f}",
+                        f"Form: {score_parts['aspect_ratio']:.2f} (Ratio {rect_info[5]:.1f})",
+                        f"Größe: {score_parts['size']:.2f} ({w}x{h} Pixel)",
+                        f"Farbe: {score_parts['color']:.2f} (Gelb: {rect_info[6]:.2f})"
                     ]
                     
                     for i, text in enumerate(score_info):
@@ -667,38 +1027,30 @@ class VideoAnalyzer:
                     
                     cv2.imwrite(f"{self.output_dir_debug}/candidate_{frame_number}_{total_score:.1f}.jpg", debug_frame)
             
+            if tracker is not None:
+                best_rectangle, _ = self._select_best_rectangle(rectangle_scores)
+                count = self.rectangle_counter[best_rectangle] if best_rectangle else 0
+                total_count = sum(self.rectangle_counter.values())
+                # Der gewichtete Gesamtscore wächst mit der Häufigkeit, stabil ist nur der Einzelscore
+                tracker.update(best_rectangle, count / total_count if total_count else 0.0, count,
+                               rectangle_scores.get(best_rectangle))
+                if tracker.done:
+                    print(f"Training nach {tracker.samples} Stichproben in {tracker.elapsed:.1f}s beendet "
+                          f"({'konvergiert' if tracker.converged else 'Zeitbudget'})")
+                    break
+            
             # Fortschrittsanzeige
             current_time = time.time()
             if current_time - last_progress_time > progress_interval:
                 progress_pct = (frame_number - skip_first_frames_count) / training_frame_count * 100
                 print(f"Training: {frame_number - skip_first_frames_count}/{training_frame_count} Frames ({progress_pct:.1f}%)")
                 last_progress_time = current_time
-                
-            # Erlaube dem Event Loop andere Tasks zu verarbeiten
-            if frame_number % 10 == 0:
-                await asyncio.sleep(0)
 
+        source.release()
         self.cap.release()
         
         # Kombiniere die Bewertungen für eine präzisere Erkennung
-        best_rectangle = None
-        best_score = -1
-        
-        # Identifiziere das Rechteck mit dem höchsten Gesamtscore
-        for rect, count in self.rectangle_counter.most_common(20):  # Betrachte die Top 20 Kandidaten
-            if rect in rectangle_scores:
-                # Gewichtet Score mit Häufigkeit
-                final_score = rectangle_scores[rect] * (count ** 0.5)  # Quadratwurzel der Häufigkeit als Faktor
-                
-                # WICHTIGER FILTER: Ignoriere zu große Rechtecke (nicht die gesamte ROI nehmen)
-                x, y, w, h = rect
-                if h > 15 or w > self.frame_width * 0.35:
-                    # Reduziere den Score drastisch für zu große Rechtecke
-                    final_score *= 0.1
-                
-                if final_score > best_score:
-                    best_score = final_score
-                    best_rectangle = rect
+        best_rectangle, best_score = self._select_best_rectangle(rectangle_scores)
         
         # Fallback-Strategie, wenn kein guter Kandidat gefunden wurde
         if not best_rectangle:
@@ -715,57 +1067,223 @@ class VideoAnalyzer:
             
         return best_rectangle
 
-    async def _process_stamina_frame_for_detection(self, frame, x1, y1, x2, y2):
-        """Verarbeitet einen Frame speziell für die Erkennung der Stamina-Leiste - asynchron"""
-        def process():
-            roi = frame[y1:y2, x1:x2]
-            
-            # In verschiedene Farbräume konvertieren für robustere Erkennung
-            hsv_roi = cv2.cvtColor(roi, cv2.COLOR_BGR2HSV)
-            
-            # Primäre Maske mit unseren HSV-Grenzen
-            yellow_mask = cv2.inRange(hsv_roi, self.lower_yellow, self.upper_yellow)
-            
-            # Verbesserte Vorverarbeitung
-            kernel = np.ones((3,3), np.uint8)
-            yellow_mask = cv2.morphologyEx(yellow_mask, cv2.MORPH_OPEN, kernel)
-            yellow_mask = cv2.morphologyEx(yellow_mask, cv2.MORPH_CLOSE, kernel)
+    async def _detect_in_blocks(self, source, roi_box, frame_number, end_frame, positions=None):
+        """
+        Liest Frames ab frame_number bis end_frame und sucht darin Kandidaten, blockweise (thread_batch_size
+        Frames) in einem Thread, damit weder Dekodierung noch OpenCV den Event-Loop blockieren. Liefert pro Frame
+        (frame_number, frame, candidates). Mit positions (Iterator) werden nur diese Frames angesprungen, und zwar
+        einzeln, damit ein vorzeitiger Abbruch keine teuren Sprünge im Voraus verschwendet.
+        """
+        x1, y1, x2, y2 = roi_box
+        block_size = 1 if positions is not None else max(1, self.thread_batch_size)
+        
+        def read_block():
+            nonlocal frame_number
+            block = []
+            while len(block) < block_size and frame_number < end_frame and source.isOpened():
+                if positions is not None:
+                    position = next(positions, None)
+                    if position is None:
+                        return block, True
+                    source.seek(position)
+                    frame_number = position
+                ret, frame = source.read()
+                if not ret:
+                    if positions is not None:
+                        continue
+                    return block, True
+                frame_number += 1
+                # ROI auf den unteren mittleren Bereich des Bildschirms beschränken
+                roi = frame if source.crop is not None else frame[y1:y2, x1:x2]
+                block.append((frame_number, frame, self._detect_stamina_candidates(roi, x1, y1)))
+            return block, len(block) < block_size
+        
+        finished = False
+        while not finished:
+            block, finished = await asyncio.to_thread(read_block)
+            for item in block:
+                yield item
+
+    def _detect_stamina_candidates(self, roi, x1, y1):
+        """Kandidaten (x, y, w, h, area, aspect_ratio, yellow_ratio) der Stamina-Leiste im ROI (Offset x1, y1)"""
+        # In verschiedene Farbräume konvertieren für robustere Erkennung
+        hsv_roi = cv2.cvtColor(roi, cv2.COLOR_BGR2HSV)
+        
+        # Primäre Maske mit unseren HSV-Grenzen
+        yellow_mask = cv2.inRange(hsv_roi, self.lower_yellow, self.upper_yellow)
+        
+        # Verbesserte Vorverarbeitung
+        yellow_mask = cv2.morphologyEx(yellow_mask, cv2.MORPH_OPEN, MORPH_KERNEL)
+        yellow_mask = cv2.morphologyEx(yellow_mask, cv2.MORPH_CLOSE, MORPH_KERNEL)
+        
+        # Rauschunterdrückung
+        yellow_mask = cv2.medianBlur(yellow_mask, 5)
+        
+        # Kontur-basierte Erkennung
+        contours, _ = cv2.findContours(yellow_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        
+        stamina_candidates = []
+        
+        for contour in contours:
+            area = cv2.contourArea(contour)
+            if area < 50:  # Ignoriere zu kleine Konturen
+                continue
+                
+            # Bounding box der Kontur
+            x, y, w, h = cv2.boundingRect(contour)
             
-            # Rauschunterdrückung
-            yellow_mask = cv2.medianBlur(yellow_mask, 5)
+            # Anpassung der Koordinaten zum Originalbild
+            x_global, y_global = x + x1, y + y1
             
-            # Kontur-basierte Erkennung
-            contours, _ = cv2.findContours(yellow_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+            # Prüfe Rechteckform (sollte längliches Rechteck sein)
+            aspect_ratio = w / h if h > 0 else 0
             
-            stamina_candidates = []
+            # Berechne den gelben Anteil im erkannten Rechteck
+            rect_mask = yellow_mask[y:y+h, x:x+w]
+            yellow_pixels = np.count_nonzero(rect_mask)
+            yellow_ratio = yellow_pixels / (w * h) if w * h > 0 else 0
             
-            for contour in contours:
-                area = cv2.contourArea(contour)
-                if area < 50:  # Ignoriere zu kleine Konturen
-                    continue
-                    
-                # Bounding box der Kontur
-                x, y, w, h = cv2.boundingRect(contour)
-                
-                # Anpassung der Koordinaten zum Originalbild
-                x_global, y_global = x + x1, y + y1
-                
-                # Prüfe Rechteckform (sollte längliches Rechteck sein)
-                aspect_ratio = w / h if h > 0 else 0
+            # Füge alle potenziellen Kandidaten hinzu, auch wenn sie nicht perfekt sind
+            # Die Filterung erfolgt später anhand kombinierter Kriterien
+            stamina_candidates.append((x_global, y_global, w, h, area, aspect_ratio, yellow_ratio))
+        
+        return stamina_candidates
+
+    def _fallback_rectangle(self):
+        """Typische Position der New World Stamina-Leiste, falls nichts erkannt wird"""
+        stamina_region_y = int(self.target_y_position)
+        stamina_region_height = 8  # Typische Höhe der New World Stamina-Leiste
+        stamina_region_width = int(self.frame_width * 0.25)  # Typische Breite (25% der Bildschirm-Breite)
+        stamina_region_x = int(self.frame_width * 0.5 - stamina_region_width / 2)  # Zentriert
+        return (stamina_region_x, stamina_region_y, stamina_region_width, stamina_region_height)
+
+    def _score_candidate(self, rect_info, roi_area):
+        """
+        Bewertet einen Rechteck-Kandidaten aus _detect_stamina_candidates.
+        Gibt (rect_key, total_score, score_parts) zurück oder None, wenn der Kandidat verworfen wird.
+        """
+        x_global, y_global, w, h, area, aspect_ratio, yellow_ratio = rect_info
+        
+        # Die Stamina-Leiste muss INNERHALB des ROI sein und KLEINER als der ROI
+        # Prüfen, ob das Rechteck viel kleiner als der ROI ist
+        rect_area = w * h
+        
+        # Wenn das Rechteck zu groß ist (mehr als 50% des ROI), ignoriere es
+        if rect_area > roi_area * 0.5:
+            return None
+        
+        # 1. POSITION - Bewertet die Übereinstimmung mit der erwarteten vertikalen Position
+        # New World Stamina-Leiste befindet sich typischerweise bei ca. 85-90% der Bildhöhe
+        vertical_position_score = 1.0 - (abs(y_global + h/2 - self.target_y_position) / self.frame_height)
+        vertical_position_score = max(0, min(1, vertical_position_score * 2))  # Steile Bewertungskurve
+
+        # 2. HORIZONTAL - Bewertet die horizontale Zentrierung
+        # Stamina-Leiste ist typischerweise horizontal zentriert
+        horizontal_center_score = 1.0 - (abs(x_global + w/2 - self.frame_width/2) / (self.frame_width/2))
+        horizontal_center_score = max(0, min(1, horizontal_center_score * 1.5))  # Erhöhte Gewichtung
+
+        # 3. FORM - Bewertet das Seitenverhältnis
+        # Stamina-Leiste ist typischerweise 8-15x breiter als hoch
+        aspect_ratio_score = 0
+        if aspect_ratio >= 5 and aspect_ratio <= 30:  # Gültiger Bereich
+            if aspect_ratio <= 20:
+                aspect_ratio_score = aspect_ratio / 15  # Linear ansteigend bis 15:1
+            else:
+                aspect_ratio_score = 1.0 - (aspect_ratio - 15) / 15  # Linear abfallend über 15:1
+
+        # 4. DIMENSIONEN - Bewertet die Größe
+        # Typische Dimensionen der Stamina-Leiste
+        width_score = 0
+        height_score = 0
+
+        # Höhe: Typischerweise 5-12 Pixel - STRIKTER FÜR KORREKTE ERKENNUNG
+        if 5 <= h <= 10:
+            height_score = 1.0  # Perfekte Höhe
+        elif 3 <= h < 5 or 10 < h <= 12:
+            height_score = 0.7  # Akzeptable Höhe
+        else:
+            height_score = 0.3 * max(0, 1 - (abs(h - 7.5) / 7.5))  # Abnehmende Bewertung
+
+        # Breite: Typischerweise 15-25% der Bildschirmbreite
+        width_ratio = w / self.frame_width
+        if 0.15 <= width_ratio <= 0.25:
+            width_score = 1.0  # Perfekte Breite
+        elif 0.1 <= width_ratio < 0.15 or 0.25 < width_ratio <= 0.35:
+            width_score = 0.7  # Akzeptable Breite
+        else:
+            width_score = 0.3 * max(0, 1 - (abs(width_ratio - 0.2) / 0.2))  # Abnehmende Bewertung
+
+        size_score = (height_score + width_score) / 2
+
+        # 5. FARBE - Bewertet den Gelbanteil - KRITISCH FÜR KORREKTE ERKENNUNG
+        # Stamina-Leiste sollte einen hohen Anteil an gelben Pixeln haben
+        color_score = min(1.0, yellow_ratio * 2)  # Linear bis 50%, dann bei 1.0 gedeckelt
+
+        # Bonus für sehr hohen Gelbanteil (typisch für die eigentliche Stamina-Leiste)
+        if yellow_ratio > 0.6:
+            color_score += 0.5
+
+        # 6. KONSISTENZ - Bewertet die temporale Stabilität
+        # Dieser Teil wird durch die Counter-Mechanik implementiert
+
+        # Gewichteter Gesamt-Score für diesen Kandidaten
+        # VERSTÄRKTE GEWICHTUNG FÜR GRÖSSEN- UND FARBKRITERIEN
+        total_score = (
+            vertical_position_score * 2.0 +    # Position ist wichtig
+            horizontal_center_score * 2.0 +    # Zentrierung ist wichtig
+            aspect_ratio_score * 2.0 +         # Form ist wichtig
+            size_score * 3.0 +                 # Dimensionen sind SEHR wichtig (erhöht)
+            color_score * 3.0                  # Farbe ist SEHR wichtig (erhöht)
+        )
+
+        # ZUSÄTZLICHE STRAFE FÜR ZU GROSSE RECHTECKE
+        if h > 12 or width_ratio > 0.3:
+            total_score *= 0.5  # Stark reduzierter Score für zu große Rechtecke
+        
+        rect_key = (x_global, y_global, w, h)
+        score_parts = {
+            "vertical_position": vertical_position_score,
+            "horizontal_center": horizontal_center_score,
+            "aspect_ratio": aspect_ratio_score,
+            "size": size_score,
+            "color": color_score,
+        }
+        return rect_key, total_score, score_parts
+
+    def _count_candidate(self, rect_key, total_score, rectangle_scores, position_weighted_counter):
+        """Speichert den Score eines Kandidaten und zählt ihn im rectangle_counter"""
+        # Speichere den Score
+        rectangle_scores[rect_key] = total_score
+        
+        # Höher bewertete Kandidaten werden mehrfach gezählt
+        count_weight = max(1, int(total_score))
+        self.rectangle_counter[rect_key] += count_weight
+        
+        # Für die Höhenerkennung
+        position_weighted_counter[rect_key[1]] += count_weight
+
+    def _select_best_rectangle(self, rectangle_scores):
+        """Wählt das Rechteck mit dem besten, nach Häufigkeit gewichteten Score"""
+        best_rectangle = None
+        best_score = -1
+        
+        # Identifiziere das Rechteck mit dem höchsten Gesamtscore
+        for rect, count in self.rectangle_counter.most_common(20):  # Betrachte die Top 20 Kandidaten
+            if rect in rectangle_scores:
+                # Gewichtet Score mit Häufigkeit
+                final_score = rectangle_scores[rect] * (count ** 0.5)  # Quadratwurzel der Häufigkeit als Faktor
                 
-                # Berechne den gelben Anteil im erkannten Rechteck
-                rect_mask = yellow_mask[y:y+h, x:x+w]
-                yellow_pixels = np.count_nonzero(rect_mask)
-                yellow_ratio = yellow_pixels / (w * h) if w * h > 0 else 0
+                # WICHTIGER FILTER: Ignoriere zu große Rechtecke (nicht die gesamte ROI nehmen)
+                x, y, w, h = rect
+                if h > 15 or w > self.frame_width * 0.35:
+                    # Reduziere den Score drastisch für zu große Rechtecke
+                    final_score *= 0.1
                 
-                # Füge alle potenziellen Kandidaten hinzu, auch wenn sie nicht perfekt sind
-                # Die Filterung erfolgt später anhand kombinierter Kriterien
-                stamina_candidates.append((x_global, y_global, w, h, area, aspect_ratio, yellow_ratio))
-            
-            return stamina_candidates
-        
-        # Führe rechenintensive Operationen in einem Thread aus
-        return await asyncio.to_thread(process)
+                if final_score > best_score:
+                    best_score = final_score
+                    best_rectangle = rect
+
+        return best_rectangle, best_score
 
     async def _save_best_rectangle_visualization(self, skip_first_frames_count, training_frame_count, rectangle, fallback_rect=None):
         """Visualisiert das gefundene beste Rechteck sowie das Fallback-Rechteck - asynchron"""
@@ -840,6 +1358,18 @@ class VideoAnalyzer:
         x2, y2 = int(self.roi_x2_percent * w), int(self.roi_y2_percent * h)
         return x1, y1, x2, y2
 
+    def _roi_box(self):
+        """ROI (x1, y1, x2, y2) aus den Videometadaten, ohne einen Frame zu lesen"""
+        x1, y1 = int(self.roi_x1_percent * self.frame_width), int(self.roi_y1_percent * self.frame_height)
+        x2, y2 = int(self.roi_x2_percent * self.frame_width), int(self.roi_y2_percent * self.frame_height)
+        return x1, y1, x2, y2
+
+    def _open_roi_source(self, start_frame=0):
+        """Öffnet eine Frame-Quelle, die nur den ROI liefert (ffmpeg-Crop, falls verfügbar)"""
+        x1, y1, x2, y2 = self._roi_box()
+        return open_frame_source(self.video_path, crop=(x1, y1, x2 - x1, y2 - y1),
+                                 start_frame=start_frame, backend=self.frame_source)
+
     def _calculate_yellow_ratio(self, detected_rect, w, h):
         hsv = cv2.cvtColor(detected_rect, cv2.COLOR_BGR2HSV)
         mask = cv2.inRange(hsv, self.lower_yellow, self.upper_yellow)
@@ -927,108 +1457,71 @@ class VideoAnalyzer:
             return []
         
         # Secondary color mask variables
-        secondary_lower_yellow = np.array([max(10, self.lower_yellow[0] - 10), 
-                                          max(30, self.lower_yellow[1] - 40), 
-                                          max(40, self.lower_yellow[2] - 40)])
-        
-        secondary_upper_yellow = np.array([min(40, self.upper_yellow[0] + 10), 
-                                          min(255, self.upper_yellow[1] + 40), 
-                                          min(255, self.upper_yellow[2] + 40)])
+        secondary_lower_yellow, secondary_upper_yellow = self._secondary_yellow_range()
         
-        # Define the number of processes based on CPU cores
-        num_processes = max(1, min(multiprocessing.cpu_count() - 1, 8))  # Use at most n-1 cores, max 8
+        # Define the number of processes based on the worker pool
+        pool = self.worker_pool or AnalysisWorkerPool(default_worker_count())
+        num_processes = pool.max_workers
         
         if self.debug:
             print(f"Using {num_processes} processes for parallel processing")
         
-        # Calculate chunk size for each process
+        # Calculate the number of chunks
         # Ensure we have at least 1 chunk per process, and at least 100 frames per chunk when possible
         if frame_count <= num_processes:
-            chunk_size = 1  # If fewer frames than processes, each process gets 1 frame
-            num_chunks = frame_count
+            num_chunks = frame_count  # If fewer frames than processes, each process gets 1 frame
         else:
             # Try to have at least 100 frames per chunk
             ideal_chunk_size = max(100, frame_count // num_processes)
             # But make sure we don't have too few chunks (should have at least one per process)
-            num_chunks = min(num_processes, frame_count // ideal_chunk_size)
-            if num_chunks < 1:
-                num_chunks = 1
-            chunk_size = frame_count // num_chunks
+            num_chunks = max(1, min(num_processes, frame_count // ideal_chunk_size))
+        
+        # Chunk starts are aligned to keyframes (probed once) and overlap by a warm-up window
+        keyframes = await asyncio.to_thread(probe_keyframes, self.video_path, fps) if num_chunks > 1 else None
+        # The thresholds are calibrated once on the start of the video, like a continuous run
+        calibration_frames = min(300, frame_count // 4)
+        plans = plan_chunks(frame_count, num_chunks, keyframes, self.chunk_warmup_frames, calibration_frames)
+        
+        if self.debug:
+            print(f"Chunk-Plan ({'Keyframes' if keyframes else 'gleichmäßig'}): {plans}")
         
         # Prepare data chunks for parallel processing
         chunks = []
-        for i in range(num_chunks):
-            start_frame = i * chunk_size
-            end_frame = min(start_frame + chunk_size, frame_count)
-            
+        for plan in plans:
             # Create chunk data
-            chunk_data = (
-                self.video_path, start_frame, end_frame, rectangle_coords,
+            chunk_data = ChunkTask(
+                self.video_path, plan.start_frame, plan.end_frame, rectangle_coords,
                 self.lower_yellow, self.upper_yellow,
                 secondary_lower_yellow, secondary_upper_yellow,
-                self.debug, 300, self.output_dir_debug, self.output_dir
+                self.debug, 300, self.output_dir_debug, self.output_dir,
+                self.frame_batch_size, self.frame_source, plan.decode_start,
+                collect_stats=True, mask_cleanup=self.mask_cleanup,
+                fill_estimator=self.fill_estimator, calibration_frames=calibration_frames
             )
             chunks.append(chunk_data)
         
-        # Create a progress tracker
-        progress_tracker = [0] * len(chunks)
-        last_progress_time = time.time()
-        progress_interval = 1  # seconds between progress updates
-        
-        # Process chunks in parallel but ensure everything remains async
-        all_events = []
+        if any(plan.decode_start > 0 for plan in plans):
+            calibration = await asyncio.to_thread(calibrate_state_machine, chunks[0], calibration_frames)
+            chunks = [chunk._replace(calibration=calibration) for chunk in chunks]
+            if self.debug:
+                print(f"Kalibrierung über {calibration_frames + 1} Frames: {calibration}")
         
-        # Create the process pool executor
-        loop = asyncio.get_running_loop()
-        with ProcessPoolExecutor(max_workers=num_processes) as executor:
-            # Submit all tasks and store futures
-            futures = [executor.submit(process_frame_chunk, chunk) for chunk in chunks]
-            
-            # Track which futures are still pending
-            pending_futures = {i: future for i, future in enumerate(futures)}
-            
-            # Asynchronously wait for futures to complete
-            while pending_futures:
-                # Use asyncio.sleep to yield control back to the event loop frequently
-                await asyncio.sleep(0.1)
-                
-                # Check for completed futures
-                completed_indices = []
-                for idx, future in list(pending_futures.items()):
-                    if future.done():
-                        # Process this completed future
-                        try:
-                            chunk_events = future.result()
-                            all_events.extend(chunk_events)
-                            
-                            # Update progress
-                            start_frame = chunks[idx][1]
-                            end_frame = chunks[idx][2]
-                            completed_frames = end_frame - start_frame
-                            
-                            # Call progress callback if provided and if it's time for an update
-                            current_time = time.time()
-                            if progress_callback and (current_time - last_progress_time >= progress_interval):
-                                total_completed = sum([chunks[i][2] - chunks[i][1] for i in completed_indices])
-                                await progress_callback(total_completed, frame_count)
-                                last_progress_time = current_time
-                        
-                        except Exception as e:
-                            print(f"Error processing chunk {idx}: {str(e)}")
-                        
-                        # Mark this future as completed
-                        completed_indices.append(idx)
-                
-                # Remove completed futures from pending
-                for idx in completed_indices:
-                    del pending_futures[idx]
+        # Run the chunks as one job of the (shared) worker pool
+        self.analysis_stats = AnalysisStats()
+        self.worker_stats = {}
+        try:
+            with self.analysis_stats.phase("analysis"):
+                chunk_results = await self._run_chunks(pool, chunks, frame_count, progress_callback)
+        finally:
+            if pool is not self.worker_pool:
+                pool.shutdown()
         
         # Final progress update
         if progress_callback:
             await progress_callback(frame_count, frame_count)
         
-        # Sort events by timestamp (they might be out of order due to parallel processing)
-        all_events.sort(key=lambda x: x[0])
+        # Merge and deduplicate the chunk events (they might be out of order due to parallel processing)
+        all_events = merge_chunk_events(chunk_results)
         
         # Convert event times to formatted strings
         formatted_events = []
@@ -1038,6 +1531,234 @@ class VideoAnalyzer:
         
         return formatted_events
 
+    def export_stats(self, path, **extra):
+        """Schreibt die Messwerte des letzten analyze_video (pro Phase, pro Chunk und pro Worker) als JSON nach path"""
+        data = {**extra, "analysis": self.analysis_stats.to_dict(), "workers": self.worker_stats}
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+        return data
+
+    async def _run_chunks(self, pool, chunks, frame_count, progress_callback=None):
+        """
+        Runs the chunk tasks as one job of the worker pool and returns the events of each chunk.
+        Completion is awaited through asyncio futures while the workers push their progress per batch.
+        """
+        async with pool.job() as job:
+            # Submit all tasks, the futures resolve on the event loop without polling.
+            # A chunk lost to a crashed worker is retried once on a restarted executor, any other
+            # failure fails the whole job (the remaining chunks are cancelled by pool.job)
+            runs = [
+                job.run(
+                    process_frame_chunk,
+                    chunk._replace(cancel_event=job.cancel_event, progress_queue=job.progress_queue),
+                    frames=chunk.end_frame - max(0, chunk.decode_start)
+                )
+                for chunk in chunks
+            ]
+            progress_task = asyncio.create_task(
+                self._forward_progress(job.progress_queue, frame_count, progress_callback)
+            )
+            try:
+                results = await asyncio.gather(*runs)
+            finally:
+                # Stops the progress forwarding once all chunks are done
+                job.progress_queue.put(None)
+                await progress_task
+            
+            if job.cancelled:
+                raise asyncio.CancelledError()
+            self.worker_stats = job.worker_stats()
+        
+        chunk_results = []
+        for result in results:
+            if isinstance(result, ChunkResult):
+                self.analysis_stats.merge(result.stats)
+                chunk_results.append(result.events)
+            else:
+                chunk_results.append(result)
+        return chunk_results
+
+    async def _forward_progress(self, progress_queue, frame_count, progress_callback=None, progress_interval=1):
+        """
+        Reads the progress messages of the workers and updates self.progress.
+        The callback is called at most every progress_interval seconds.
+        """
+        loop = asyncio.get_running_loop()
+        chunk_progress = {}
+        start_time = time.time()
+        last_progress_time = 0
+        
+        while True:
+            # Blocking get in a thread, the event loop only wakes up for real messages
+            item = await loop.run_in_executor(None, progress_queue.get)
+            if item is None:
+                break
+            
+            chunk_start, processed, events = item
+            chunk_progress[chunk_start] = (processed, events)
+            total_processed = sum(processed for processed, _ in chunk_progress.values())
+            total_events = sum(events for _, events in chunk_progress.values())
+            elapsed = time.time() - start_time
+            self.progress = AnalysisProgress(
+                total_processed, frame_count, total_processed / elapsed if elapsed > 0 else 0.0, total_events
+            )
+            
+            current_time = time.time()
+            if progress_callback and current_time - last_progress_time >= progress_interval:
+                try:
+                    await progress_callback(total_processed, frame_count)
+                except Exception as e:
+                    print(f"Error in progress callback: {str(e)}")
+                last_progress_time = current_time
+
+    async def analyze_single_pass(self, training_frame_count, skip_first_frames_count=0, progress_callback=None,
+                                  source=None):
+        """
+        Single-Pass-Modus: Trainiert und analysiert mit nur einer Dekodierung des Videos.
+        
+        Die ROI-Frames des Trainingsfensters werden in einem ROIFrameCache abgelegt. Farbkalibrierung
+        und Rechteckerkennung laufen auf diesem Cache, danach läuft die Stamina-Analyse erst über die
+        gecachten Frames und dann direkt über den restlichen Datenstrom derselben Quelle weiter.
+        Der Cache fasst das ganze Trainingsfenster; ist er dafür zu klein (single_pass_cache_bytes),
+        wird ein ValueError ausgelöst.
+        
+        source: optionale, bereits geöffnete Quelle für die ROI-Frames, z.B. ein frameSource.GrowingFileFrameSource
+        auf einem laufenden Download. Sie wird nur von vorne gelesen und am Ende freigegeben.
+        Gibt (stable_rectangle, timestamps) zurück.
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+        os.makedirs(self.output_dir_debug, exist_ok=True)
+        
+        x1, y1, x2, y2 = self._roi_box()
+        total_frames = max(0, self.frame_count - skip_first_frames_count)
+        cache_frames = max(1, min(training_frame_count, total_frames) if total_frames else training_frame_count)
+        frame_bytes = (x2 - x1) * (y2 - y1) * 3
+        if cache_frames * frame_bytes > self.single_pass_cache_bytes:
+            message = (f"Single-Pass: {cache_frames} Trainingsframes brauchen "
+                       f"{cache_frames * frame_bytes / 2**20:.0f} MiB ROI-Cache, erlaubt sind "
+                       f"{self.single_pass_cache_bytes / 2**20:.0f} MiB (single_pass_cache_bytes)")
+            print(message)
+            if source is not None:
+                source.release()
+            raise ValueError(message)
+        if source is None:
+            source = self._open_roi_source(skip_first_frames_count)
+        fps = source.fps
+        cache = ROIFrameCache(cache_frames, source.frame_shape, self.single_pass_cache_dir)
+        batch_size = max(1, self.frame_batch_size)
+        
+        try:
+            # 1. Trainingsfenster einmal dekodieren und cachen
+            while len(cache) < cache.capacity:
+                read = await asyncio.to_thread(cache.fill, source, batch_size)
+                if progress_callback:
+                    await progress_callback(len(cache), total_frames)
+                if read < batch_size:
+                    break
+            
+            if len(cache) == 0:
+                print("No frames to process!")
+                return None, []
+            
+            if self.debug:
+                print(f"Single-Pass: {len(cache)} ROI-Frames im Cache ({cache.path})")
+            
+            # 2. Farbkalibrierung auf gleichmäßig verteilten Frames aus dem Cache
+            samples = self._merge_color_samples(await asyncio.to_thread(lambda: [
+                self._yellow_sample_pixels(np.asarray(cache.frames[i]))
+                for i in np.linspace(0, len(cache) - 1, num=min(20, len(cache)), dtype=int)
+            ]))
+            if len(samples):
+                self.lower_yellow, self.upper_yellow = self._calculate_hsv_range(samples)
+            
+            # 3. Rechteckerkennung auf den gecachten Frames
+            position_weighted_counter = Counter()
+            rectangle_scores = {}
+            roi_area = (x2 - x1) * (y2 - y1)
+            
+            def detect_block(start):
+                return [self._detect_stamina_candidates(np.asarray(frame), x1, y1)
+                        for frame in cache.frames[start:min(len(cache), start + self.thread_batch_size)]]
+            
+            for start in range(0, len(cache), self.thread_batch_size):
+                for candidates in await asyncio.to_thread(detect_block, start):
+                    for rect_info in candidates:
+                        scored = self._score_candidate(rect_info, roi_area)
+                        if scored is not None:
+                            rect_key, total_score, _ = scored
+                            self._count_candidate(rect_key, total_score, rectangle_scores, position_weighted_counter)
+            
+            stable_rectangle, best_score = self._select_best_rectangle(rectangle_scores)
+            if not stable_rectangle:
+                if self.debug:
+                    print("Kein stabiles Rechteck gefunden. Verwende Fallback-Rechteck.")
+                stable_rectangle = self._fallback_rectangle()
+            elif self.debug:
+                print(f"Bestes Rechteck: {stable_rectangle} mit Gesamtscore {best_score:.2f}")
+            
+            # 4. Stamina-Analyse: zuerst über den Cache, danach über den restlichen Datenstrom
+            x, y, w, h = stable_rectangle
+            total_pixels = w * h
+            secondary_lower_yellow, secondary_upper_yellow = self._secondary_yellow_range()
+            state = StaminaStateMachine(skip_first_frames_count, self.frame_count, total_pixels,
+                                        *FILL_ESTIMATORS[self.fill_estimator])
+            all_events = []
+            
+            def analyze_batch(batch, start_frame):
+                yellow_pixels, _, _ = compute_yellow_ratios(
+                    np.ascontiguousarray(batch), self.lower_yellow, self.upper_yellow,
+                    secondary_lower_yellow, secondary_upper_yellow, total_pixels, cleanup=self.mask_cleanup,
+                    estimator=self.fill_estimator
+                )
+                return detect_stamina_events(yellow_pixels, start_frame, self.frame_count, total_pixels, state)
+            
+            rx, ry, rw, rh = clip_crop((x - x1, y - y1, w, h), x2 - x1, y2 - y1)
+            current_frame = skip_first_frames_count
+            for start in range(0, len(cache), batch_size):
+                batch = cache.frames[start:start + batch_size, ry:ry+rh, rx:rx+rw]
+                all_events.extend(await asyncio.to_thread(analyze_batch, batch, current_frame))
+                current_frame += len(batch)
+            
+            # Danach liest dieselbe Quelle ohne erneutes Öffnen oder Spulen weiter, das Rechteck wird im ROI ausgeschnitten
+            batch = np.empty((batch_size,) + tuple(source.frame_shape), dtype=np.uint8)
+            
+            def read_batch():
+                filled = 0
+                while filled < batch_size and source.read_into(batch[filled]):
+                    filled += 1
+                return filled
+            
+            while True:
+                filled = await asyncio.to_thread(read_batch)
+                if filled == 0:
+                    break
+                all_events.extend(await asyncio.to_thread(analyze_batch, batch[:filled, ry:ry+rh, rx:rx+rw],
+                                                          current_frame))
+                current_frame += filled
+                if progress_callback:
+                    await progress_callback(current_frame - skip_first_frames_count, total_frames)
+                if filled < batch_size:
+                    break
+        finally:
+            source.release()
+            cache.close()
+        
+        if progress_callback:
+            await progress_callback(total_frames, total_frames)
+        
+        return stable_rectangle, [self._frame_to_timestamp(frame_number, fps) for frame_number, _ in all_events]
+
+    def _secondary_yellow_range(self):
+        """Erweiterter HSV-Bereich für die zweite Maske (blassere/dunklere Leiste)"""
+        secondary_lower_yellow = np.array([max(10, self.lower_yellow[0] - 10), 
+                                          max(30, self.lower_yellow[1] - 40), 
+                                          max(40, self.lower_yellow[2] - 40)])
+        
+        secondary_upper_yellow = np.array([min(40, self.upper_yellow[0] + 10), 
+                                          min(255, self.upper_yellow[1] + 40), 
+                                          min(255, self.upper_yellow[2] + 40)])
+        return secondary_lower_yellow, secondary_upper_yellow
+
     def _frame_to_timestamp(self, frame_number, fps):
         """Convert frame number to a timestamp string in MM:SS format"""
         seconds = frame_number / fps
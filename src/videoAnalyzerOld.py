@@ -3,10 +3,423 @@ import numpy as np
 from collections import Counter
 import os
 import asyncio
+import json
+import time
+from typing import Any, NamedTuple, Optional
+from analysisStats import AnalysisStats
+from frameSource import probe_keyframes
+from rectangleTraining import ConvergenceTracker, sample_positions
+from videoAnalyzer import plan_chunks
+
+def format_timestamp(frame_number, fps):
+    timestamp = frame_number / fps
+    minutes = int(timestamp // 60)
+    seconds = int(timestamp % 60)
+    return f"{minutes:02}:{seconds:02}"
+
+class OOSDetector:
+    """
+    OOS-Erkennung aus analyze_video: Ein OOS-Moment wird gezählt, wenn der Gelbanteil nach
+    einem Wert über high_threshold unter low_threshold fällt, während die Leiste erkannt wird.
+    """
+    def __init__(self, high_threshold, low_threshold):
+        self.high_threshold = high_threshold
+        self.low_threshold = low_threshold
+        self.high_yellow_found = False
+
+    def needs_bar(self, yellow_ratio):
+        """
+        Ob die Leisten-Erkennung in diesem Frame das Ergebnis beeinflusst. Nur beim Scharfschalten
+        (Gelbanteil hoch) und beim Auslösen (Gelbanteil niedrig nach hoch) wird bar_matched gelesen.
+        """
+        if yellow_ratio > self.high_threshold and not self.high_yellow_found:
+            return True
+        return yellow_ratio < self.low_threshold and self.high_yellow_found
+
+    def update(self, yellow_ratio, bar_matched):
+        """Gibt True zurück, wenn in diesem Frame ein OOS-Moment beginnt"""
+        if not bar_matched:
+            return False
+        if yellow_ratio > self.high_threshold:
+            self.high_yellow_found = True
+        if yellow_ratio < self.low_threshold and self.high_yellow_found:
+            self.high_yellow_found = False
+            return True
+        return False
+
+class HudGate:
+    """
+    Erkennt Frames ohne HUD (Karte, Menü, Ladebildschirm, Alt-Tab) am Rahmen der Stamina-Leiste:
+    Die äußerste Pixelreihe oben und unten sowie die Randspalten des stabilen Rechtecks gehören zum
+    dunklen Rahmen und hängen nicht vom Füllstand ab. Ihre Signatur (Graustufen, auf cells Zellen
+    gemittelt) wird aus den ersten reference_frames Frames mit erkannter Leiste gelernt oder als
+    reference (Signatur, Schwelle) vorgegeben, z.B. aus VideoAnalyzer.learn_hud_reference. Danach gilt
+    ein Frame als ohne HUD, wenn die mittlere Abweichung davon über der Schwelle liegt. Bis die
+    Referenz steht, gilt jeder Frame als mit HUD. reset() verwirft eine unpassende Referenz.
+    """
+    def __init__(self, rectangle, reference_frames=8, min_distance=12.0, cells=16, reference=None):
+        self.rectangle = rectangle
+        self.reference_frames = reference_frames
+        self.min_distance = min_distance
+        self.cells = cells
+        self.samples = []
+        self.reference = None
+        self.threshold = None
+        if reference is not None:
+            signature, threshold = reference
+            self.reference, self.threshold = np.asarray(signature, dtype=np.float32), float(threshold)
+
+    def signature(self, frame):
+        x, y, w, h = self.rectangle
+        border = np.stack([frame[y, x:x + w], frame[y + h - 1, x:x + w]])
+        gray = cv2.cvtColor(border, cv2.COLOR_BGR2GRAY)
+        rows = cv2.resize(gray, (self.cells, 2), interpolation=cv2.INTER_AREA).ravel()
+        sides = cv2.cvtColor(frame[y:y + h, x:x + w:w - 1], cv2.COLOR_BGR2GRAY).mean(axis=0)
+        return np.concatenate([rows, sides]).astype(np.float32)
+
+    @property
+    def ready(self):
+        return self.reference is not None
+
+    @property
+    def learned(self):
+        """(Signatur, Schwelle) zum Weitergeben an andere HudGates, None ohne Referenz"""
+        return (self.reference, self.threshold) if self.ready else None
+
+    def learn(self, signature):
+        """Sammelt die Signatur eines Frames mit erkannter Leiste, bis die Referenz steht"""
+        if self.ready:
+            return
+        self.samples.append(signature)
+        if len(self.samples) >= self.reference_frames:
+            samples = np.stack(self.samples)
+            self.reference = np.median(samples, axis=0)
+            spread = np.abs(samples - self.reference).mean(axis=1).max()
+            self.threshold = max(self.min_distance, 2 * float(spread))
+            self.samples = []
+
+    def reset(self):
+        """Verwirft die Referenz, die nächsten Frames mit erkannter Leiste lernen sie neu"""
+        self.samples = []
+        self.reference = None
+        self.threshold = None
+
+    def distance(self, signature):
+        return float(np.abs(signature - self.reference).mean())
+
+    def present(self, signature):
+        return not self.ready or self.distance(signature) <= self.threshold
+
+def minmax_decimate(values, buckets):
+    """
+    Indizes von Minimum und Maximum jedes der buckets gleich großen Abschnitte, aufsteigend sortiert.
+    Ein Plot nur dieser Punkte zeigt dieselben Ausschläge wie die volle Reihe (z.B. kurze OOS-Einbrüche),
+    die einfache Ausdünnung mit [::step] kann sie überspringen.
+    """
+    values = np.asarray(values, dtype=np.float32)
+    if buckets <= 0 or len(values) <= 2 * buckets:
+        return np.arange(len(values))
+    size = -(-len(values) // buckets)
+    padded = np.full(size * -(-len(values) // size), np.nan, dtype=np.float32)
+    padded[:len(values)] = values
+    padded = padded.reshape(-1, size)
+    offsets = np.arange(len(padded)) * size
+    indices = np.concatenate([offsets + np.nanargmin(padded, axis=1), offsets + np.nanargmax(padded, axis=1)])
+    return np.unique(indices)
+
+class StaminaSeries:
+    """
+    Messreihe von analyze_video als vorab angelegte Spalten (float32 Gelbanteil, mittleres HSV der
+    gelben Pixel, bool Leiste erkannt) statt Tupel-Listen pro Frame. Die Zeit ergibt sich aus fps.
+    """
+    def __init__(self, fps, capacity=0):
+        self.fps = fps
+        self.count = 0
+        self._ratios = np.zeros(max(1, capacity), dtype=np.float32)
+        self._hsv = np.zeros((max(1, capacity), 3), dtype=np.float32)
+        self._bar_matches = np.zeros(max(1, capacity), dtype=bool)
+
+    def append(self, ratio, hsv, bar_matched):
+        if self.count == len(self._ratios):
+            # frame_count aus dem Container kann zu klein sein
+            self._ratios = np.resize(self._ratios, 2 * self.count)
+            self._hsv = np.resize(self._hsv, (2 * self.count, 3))
+            self._bar_matches = np.resize(self._bar_matches, 2 * self.count)
+        self._ratios[self.count] = ratio
+        self._hsv[self.count] = hsv
+        self._bar_matches[self.count] = bar_matched
+        self.count += 1
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def ratios(self):
+        return self._ratios[:self.count]
+
+    @property
+    def hsv(self):
+        return self._hsv[:self.count]
+
+    @property
+    def bar_matches(self):
+        return self._bar_matches[:self.count]
+
+    @property
+    def times(self):
+        """Sekunden, Frame n (ab 1 gezählt) liegt bei n / fps"""
+        return np.arange(1, self.count + 1, dtype=np.float32) / self.fps
+
+    def decimated(self, values, buckets=1000):
+        """Zeiten und Werte einer Spalte, per Min/Max auf höchstens 2 * buckets Punkte reduziert"""
+        indices = minmax_decimate(values, buckets)
+        return self.times[indices], np.asarray(values)[indices]
+
+    def to_arrays(self):
+        return {"ratios": self.ratios.copy(), "hsv": self.hsv.copy(), "bar_matches": self.bar_matches.copy()}
+
+    @classmethod
+    def from_arrays(cls, arrays, fps):
+        series = cls(fps)
+        series.count = len(arrays["ratios"])
+        series._ratios = np.asarray(arrays["ratios"], dtype=np.float32)
+        series._hsv = np.asarray(arrays["hsv"], dtype=np.float32).reshape(-1, 3)
+        series._bar_matches = np.asarray(arrays["bar_matches"], dtype=bool)
+        return series
+
+# Einstellungen des Analyzers, von denen die Messreihe abhängt (für Worker-Prozesse, siehe analyze_series_chunk)
+SCAN_SETTINGS = (
+    "roi_x1_percent", "roi_y1_percent", "roi_x2_percent", "roi_y2_percent", "min_rect_width", "min_rect_height",
+    "lower_yellow", "upper_yellow", "high_yellow_threshold", "low_yellow_threshold", "max_rectangle_deviation",
+    "bar_check_interval", "hud_gate", "hud_skip_frames", "frame_batch_size",
+)
+
+# Mindestlänge eines Abschnitts im Worker-Pool, kürzere Videos laufen in weniger Abschnitten
+POOL_MIN_CHUNK_FRAMES = 3000
+
+class SeriesChunkTask(NamedTuple):
+    """Abschnitt [start_frame, end_frame) für analyze_series_chunk, end_frame None liest bis zum Videoende"""
+    video_path: str
+    start_frame: int
+    end_frame: Optional[int]
+    rectangle: tuple
+    settings: dict
+    output_dir: str
+    cancel_event: Any = None
+    progress_queue: Any = None
+    hud_reference: Any = None  # HudGate.learned aus dem Elternprozess, None ohne HUD-Erkennung
+
+class SeriesScanner:
+    """
+    Messschleife von analyze_video: Gelbanteil im stabilen Rechteck pro Frame, Konturprüfung der Leiste
+    nur dort, wo die OOS-Erkennung sie liest (sonst alle bar_check_interval Frames), HUD-Erkennung und
+    Messreihe. scan_block verarbeitet bis zu frame_batch_size Frames, on_oos wird bei jedem OOS-Moment
+    mit (frame, frame_number, matched_rect, roi_box, yellow_ratio) aufgerufen.
+    
+    Ist der Zustand der OOS-Erkennung am Anfang unbekannt (Abschnitt im Worker-Pool), laufen beide
+    möglichen Zustände mit, bis sie zusammenfallen. Die Leiste wird geprüft, sobald einer von ihnen sie
+    liest, damit timestamps_from_series auf der zusammengesetzten Reihe dieselben Momente findet wie ein
+    durchgehender Lauf. OOS-Momente meldet nur ein Scanner mit bekanntem Anfangszustand.
+    
+    gate ist ein HudGate oder None (ohne HUD-Erkennung). Frames ohne HUD werden bis zum Ende ihres Rasters
+    aus hud_skip_frames Frames übersprungen, gezählt ab Videoanfang. Beginnt ein Abschnitt auf diesem Raster
+    und bekommt er dieselbe Referenz, überspringt er dieselben Frames wie der durchgehende Lauf.
+    """
+    def __init__(self, analyzer, cap, rectangle, series, stats, frame_number=0, end_frame=None, armed_states=(False,),
+                 gate=None):
+        self.analyzer = analyzer
+        self.cap = cap
+        self.rectangle = rectangle
+        self.series = series
+        self.stats = stats
+        self.frame_number = frame_number  # zuletzt gelesener Frame, ab 1 gezählt
+        self.end_frame = end_frame
+        self.detectors = []
+        for armed in armed_states:
+            detector = OOSDetector(analyzer.high_yellow_threshold, analyzer.low_yellow_threshold)
+            detector.high_yellow_found = armed
+            self.detectors.append(detector)
+        self.reports_oos = len(self.detectors) == 1
+        self.on_oos = None
+        self.matched_rect = None
+        self.last_bar_check = frame_number - analyzer.bar_check_interval
+        self.gate = gate
+    
+    def _read(self):
+        """Nächster Frame oder None am Ende des Videos bzw. des Abschnitts"""
+        if self.end_frame is not None and self.frame_number >= self.end_frame:
+            return None
+        start = time.perf_counter()
+        ret, frame = self.cap.read()
+        self.stats.add("decode", time.perf_counter() - start)
+        if not ret:
+            return None
+        self.frame_number += 1
+        return frame
+    
+    def scan_block(self):
+        """Dekodiert und vermisst bis zu frame_batch_size Frames, False am Ende"""
+        first_frame, block_start = self.frame_number + 1, time.perf_counter()
+        try:
+            with self.stats.profiling():
+                return self._scan_frames()
+        finally:
+            self.stats.add_block(first_frame=first_frame, frames=self.frame_number - first_frame + 1,
+                                 seconds=time.perf_counter() - block_start)
+    
+    def _skip_without_hud(self):
+        """Trägt den aktuellen und die folgenden Frames bis zum Ende seines Rasters ohne Leiste ein, False am Ende"""
+        stats, series = self.stats, self.series
+        # Nach der Rückkehr des HUD zuerst wieder nach der Leiste suchen statt ein altes Ergebnis zu übernehmen
+        self.matched_rect = None
+        self.last_bar_check = self.frame_number - self.analyzer.bar_check_interval
+        series.append(0.0, (0, 0, 0), False)
+        stats.count("hud_absent_frames")
+        while self.frame_number % self.analyzer.hud_skip_frames:
+            if self.end_frame is not None and self.frame_number >= self.end_frame:
+                return False
+            start = time.perf_counter()
+            grabbed = self.cap.grab()
+            stats.add("skip", time.perf_counter() - start)
+            if not grabbed:
+                return False
+            self.frame_number += 1
+            series.append(0.0, (0, 0, 0), False)
+            stats.count("hud_absent_frames")
+        return True
+    
+    def _bar_behind_gate(self, frame):
+        """
+        Prüft in Frames, die das HudGate überspringen würde, trotzdem die Leiste (höchstens einmal pro
+        Raster, danach folgt der Sprung). Ist sie zu sehen, passt die Referenz nicht (z.B. aus Frames mit
+        verdecktem Rahmen gelernt): Sie wird verworfen und neu gelernt, der Frame wird normal vermessen.
+        """
+        x1, y1, x2, y2 = self.analyzer._calculate_roi(frame)
+        contours = self.analyzer._find_contours(frame[y1:y2, x1:x2], self.stats)
+        self.stats.count("bar_checks")
+        if self.analyzer._match_bar(contours, x1, y1, self.rectangle) is None:
+            return False
+        self.gate.reset()
+        self.stats.count("hud_gate_resets")
+        return True
+    
+    def _scan_frames(self):
+        analyzer, stats, gate = self.analyzer, self.stats, self.gate
+        x_fixed, y_fixed, w_fixed, h_fixed = self.rectangle
+        clock = time.perf_counter
+        for _ in range(analyzer.frame_batch_size):
+            frame = self._read()
+            if frame is None:
+                return False
+            
+            if gate is not None:
+                start = clock()
+                signature = gate.signature(frame)
+                hud_visible = gate.present(signature)
+                stats.add("hud", clock() - start)
+                if not hud_visible and not self._bar_behind_gate(frame):
+                    if not self._skip_without_hud():
+                        return False
+                    continue
+            
+            # Always measure current stamina in the fixed rectangle
+            stable_rect = frame[y_fixed:y_fixed + h_fixed, x_fixed:x_fixed + w_fixed]
+            yellow_ratio, yellow_hsv = analyzer._yellow_stats(stable_rect, w_fixed, h_fixed, stats)
+            
+            # The contour search over the ROI only runs when the detector reads the result,
+            # otherwise every bar_check_interval frames, in between the last result is carried over
+            x1, y1, x2, y2 = analyzer._calculate_roi(frame)
+            if (any(detector.needs_bar(yellow_ratio) for detector in self.detectors)
+                    or self.frame_number - self.last_bar_check >= analyzer.bar_check_interval):
+                contours = analyzer._find_contours(frame[y1:y2, x1:x2], stats)
+                self.matched_rect = analyzer._match_bar(contours, x1, y1, self.rectangle)
+                self.last_bar_check = self.frame_number
+                stats.count("bar_checks")
+                if gate is not None and self.matched_rect is not None:
+                    gate.learn(signature)
+            
+            # Store yellow ratio, average HSV of the yellow pixels (0 without yellow) and bar detection
+            start = clock()
+            bar_matched = self.matched_rect is not None
+            self.series.append(yellow_ratio, yellow_hsv, bar_matched)
+            fired = [detector.update(yellow_ratio, bar_matched) for detector in self.detectors]
+            if len(self.detectors) > 1 and len({d.high_yellow_found for d in self.detectors}) == 1:
+                # Beide Anfangszustände haben denselben Stand erreicht und laufen ab hier gleich
+                del self.detectors[1:]
+            stats.add("state", clock() - start)
+            
+            if fired[0] and self.reports_oos and self.on_oos is not None:
+                self.on_oos(frame, self.frame_number, self.matched_rect, (x1, y1, x2, y2), yellow_ratio)
+        return True
+
+def plan_series_sections(frame_count, section_count, keyframes=None, align=1):
+    """
+    Abschnitte (start_frame, end_frame) für den Worker-Pool, der letzte mit end_frame None (bis zum Videoende).
+    Mit Keyframes beginnen sie wie bei videoAnalyzer.plan_chunks auf Keyframes, dort springt OpenCV genau hin.
+    align rundet die Anfänge auf ein Vielfaches ab, mit HUD-Erkennung auf das Raster aus hud_skip_frames.
+    """
+    plans = plan_chunks(frame_count, section_count, keyframes)
+    starts = sorted({plan.start_frame - plan.start_frame % align for plan in plans}) or [0]
+    return list(zip(starts, starts[1:] + [None]))
+
+def open_capture_at(video_path, frame_number, stats=None):
+    """
+    Öffnet das Video so, dass der nächste read() Frame frame_number (ab 0) liefert. Der Sprung per
+    CAP_PROP_POS_FRAMES ist bei manchen H.264-Dateien (B-Frames, Edit-Lists) nicht framegenau. Meldet
+    OpenCV danach eine andere Position, wird wie im durchgehenden Lauf von vorn bis dorthin vorgespult,
+    sonst wäre die zusammengesetzte Messreihe samt aller Zeitstempel verschoben.
+    """
+    cap = cv2.VideoCapture(video_path)
+    if frame_number <= 0:
+        return cap
+    start = time.perf_counter()
+    cap.set(cv2.CAP_PROP_POS_FRAMES, frame_number)
+    if int(round(cap.get(cv2.CAP_PROP_POS_FRAMES))) != frame_number:
+        cap.release()
+        cap = cv2.VideoCapture(video_path)
+        for _ in range(frame_number):
+            if not cap.grab():
+                break
+        if stats is not None:
+            stats.count("seek_realigned")
+    if stats is not None:
+        stats.add("seek", time.perf_counter() - start)
+    return cap
+
+def analyze_series_chunk(task):
+    """
+    Läuft im Worker-Prozess: nimmt die Messreihe des Abschnitts task auf und gibt (arrays, stats) zurück,
+    arrays wie StaminaSeries.to_arrays und stats als AnalysisStats.to_dict. Meldet den Fortschritt als
+    (start_frame, Frames) pro Block und hört auf, sobald cancel_event gesetzt ist.
+    """
+    analyzer = VideoAnalyzer(task.video_path, output_dir=task.output_dir)
+    for name, value in task.settings.items():
+        setattr(analyzer, name, value)
+    analyzer.cap.release()
+    stats = AnalysisStats()
+    cap = open_capture_at(task.video_path, task.start_frame, stats)
+    capacity = (task.end_frame or analyzer.frame_count) - task.start_frame
+    series = StaminaSeries(analyzer.fps, capacity)
+    gate = HudGate(task.rectangle, reference=task.hud_reference) if task.hud_reference is not None else None
+    scanner = SeriesScanner(analyzer, cap, task.rectangle, series, stats, frame_number=task.start_frame,
+                            end_frame=task.end_frame, armed_states=(False, True) if task.start_frame else (False,),
+                            gate=gate)
+    try:
+        while True:
+            more = scanner.scan_block()
+            if task.progress_queue is not None:
+                task.progress_queue.put((task.start_frame, len(series)))
+            if not more or (task.cancel_event is not None and task.cancel_event.is_set()):
+                break
+    finally:
+        cap.release()
+    return series.to_arrays(), stats.to_dict()
 
 class VideoAnalyzer:
-    def __init__(self, video_path, output_dir="./output/", debug=False):
+    def __init__(self, video_path, output_dir="./output/", debug=False, worker_pool=None):
         self.video_path = video_path
+        # Geteilter analysisPool.AnalysisWorkerPool, ohne Pool läuft analyze_video durchgehend in einem Thread
+        self.worker_pool = worker_pool
         self.output_dir = output_dir
         self.debug = debug
         os.makedirs(self.output_dir, exist_ok=True)
@@ -20,225 +433,536 @@ class VideoAnalyzer:
         self.roi_x1_percent, self.roi_y1_percent = 0.405, 0.82  # links,  oben
         self.roi_x2_percent, self.roi_y2_percent = 0.595, 0.96  # rechts, unten
         
-        self.min_rect_width = 150  
-        self.min_rect_height = 8   
+        # Mindestgrößen sind auf 1080p abgestimmt und skalieren mit der Videohöhe (z.B. 720p-Downloads)
+        self.resolution_scale = self.frame_height / 1080 if self.frame_height > 0 else 1.0
+        self.min_rect_width = int(round(150 * self.resolution_scale))
+        self.min_rect_height = int(round(8 * self.resolution_scale))
         
         self.lower_yellow = np.array([15, 90, 100])  
         self.upper_yellow = np.array([50, 255, 255])  
         
+        # Schwellwerte der OOS-Erkennung und erlaubte Abweichung der erkannten Leiste vom stabilen Rechteck
+        self.high_yellow_threshold = 0.08
+        self.low_yellow_threshold = 0.02
+        self.max_rectangle_deviation = int(round(60 * self.resolution_scale))
+        
+        # Konturprüfung der Leiste in analyze_video: immer in Frames, in denen sie die OOS-Erkennung beeinflusst,
+        # sonst nur alle bar_check_interval Frames für die gespeicherte Messreihe (1 = jeder Frame)
+        self.bar_check_interval = 15
+        
+        # HUD-Erkennung in analyze_video (HudGate, nur auf Wunsch): Frames ohne HUD werden samt der folgenden
+        # Frames bis zum Ende ihres Rasters aus hud_skip_frames Frames nur per grab() übersprungen und ohne Leiste
+        # in die Messreihe eingetragen. Die Referenz entsteht vorab aus hud_reference_samples verteilten Frames
+        self.hud_gate = False
+        self.hud_skip_frames = 15
+        self.hud_reference_samples = 48
+        
+        # Frames pro Thread-Aufruf in Training und Analyse: Dekodierung und Auswertung laufen blockweise
+        # außerhalb des Event-Loops, damit der Bot (z.B. der Discord-Heartbeat) reaktionsfähig bleibt
+        self.frame_batch_size = 64
+        
+        # Konvergenz-Training: > 0 wertet so viele über das Trainingsfenster verteilte Frames aus und
+        # hört auf, sobald das führende Rechteck stabil ist, statt die ersten Frames der Reihe nach zu lesen
+        self.training_samples = 0
+        self.training_time_budget = None  # Sekunden
+        
+        # Messwerte pro Phase und Frame (AnalysisStats), neu angelegt bei jedem Training bzw. jeder Analyse.
+        # profile=True zeichnet zusätzlich ein cProfile-Profil der Blöcke auf (pro Auftrag umschaltbar)
+        self.profile = False
+        self.training_stats = AnalysisStats()
+        self.analysis_stats = AnalysisStats()
+        # Durchsatz pro Worker-Prozess im letzten analyze_video mit Worker-Pool (AnalysisJob.worker_stats)
+        self.worker_stats = {}
+        
         self.rectangle_counter = Counter()
         self.saved_timestamps = []
         
+    def cache_parameters(self, training_frame_count):
+        """
+        Parameter, von denen Training, Messreihe und OOS-Erkennung abhängen.
+        Der Ergebnis-Cache (analysisCache) bildet daraus die Schlüssel seiner Ebenen.
+        """
+        rectangle = {
+            "analyzer": "videoAnalyzerOld",
+            "frame_size": [self.frame_width, self.frame_height],
+            "frame_count": self.frame_count,
+            "training_frame_count": training_frame_count,
+            "training_samples": self.training_samples,
+            "roi": [self.roi_x1_percent, self.roi_y1_percent, self.roi_x2_percent, self.roi_y2_percent],
+            "min_rect": [self.min_rect_width, self.min_rect_height],
+            "lower_yellow": self.lower_yellow.tolist(),
+            "upper_yellow": self.upper_yellow.tolist(),
+        }
+        series = {key: rectangle[key] for key in ("analyzer", "frame_size", "frame_count", "roi", "min_rect", "lower_yellow", "upper_yellow")}
+        series["max_rectangle_deviation"] = self.max_rectangle_deviation
+        series["bar_check_interval"] = self.bar_check_interval
+        series["hud_gate"] = [self.hud_gate, self.hud_skip_frames]
+        # Die Leiste wird nur dort geprüft, wo die OOS-Erkennung sie liest, dazwischen steht in bar_matches das letzte
+        # Ergebnis. Mit anderen Schwellwerten wären es andere Frames, daher gehören sie auch zur Messreihe
+        series["oos_thresholds"] = [self.high_yellow_threshold, self.low_yellow_threshold]
+        events = {
+            "high_yellow_threshold": self.high_yellow_threshold,
+            "low_yellow_threshold": self.low_yellow_threshold,
+        }
+        return {"rectangle": rectangle, "series": series, "events": events}
+
+    def series_arrays(self, series):
+        """Packt die Messreihe von analyze_video als Arrays für den Ergebnis-Cache"""
+        return series.to_arrays()
+
+    def series_from_arrays(self, arrays):
+        """Gegenstück zu series_arrays: liefert die StaminaSeries wie analyze_video"""
+        return StaminaSeries.from_arrays(arrays, self.fps)
+
+    def export_stats(self, path, **extra):
+        """
+        Schreibt die Messwerte von Training und Analyse als JSON nach path (extra z.B. Video-ID).
+        Mit profile liegen die cProfile-Profile daneben als <path>.training.prof und <path>.analysis.prof.
+        Lief die Analyse im Worker-Pool, steht der Durchsatz pro Worker unter "workers".
+        """
+        data = {**extra, "profile": self.profile, "workers": self.worker_stats}
+        for name, stats in (("training", self.training_stats), ("analysis", self.analysis_stats)):
+            data[name] = stats.to_dict()
+            if stats.dump_profile(f"{path}.{name}.prof"):
+                data[name]["profile_top"] = stats.profile_text(25)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+        return data
+
+    def timestamps_from_series(self, ratios, bar_matches):
+        """
+        Wendet die OOS-Erkennung auf eine gespeicherte Messreihe an, ohne das Video zu dekodieren.
+        Nur mit den Schwellwerten gültig, mit denen die Reihe aufgenommen wurde (siehe cache_parameters).
+        """
+        detector = OOSDetector(self.high_yellow_threshold, self.low_yellow_threshold)
+        return [
+            format_timestamp(index + 1, self.fps)
+            for index, (ratio, matched) in enumerate(zip(np.asarray(ratios).tolist(), np.asarray(bar_matches).tolist()))
+            if detector.update(ratio, matched)
+        ]
+
     async def find_stable_rectangle(self, training_frame_count: int):
+        if self.training_samples > 0:
+            return await self._find_stable_rectangle_sampled(training_frame_count)
+
         frame_number = 0
-        while self.cap.isOpened():
-            ret, frame = self.cap.read()
-            if not ret:
+        stats = self.training_stats = AnalysisStats(self.profile)
+
+        def train_block():
+            """Dekodiert und zählt bis zu frame_batch_size Frames in einem Thread, False am Ende"""
+            nonlocal frame_number
+            first_frame, block_start = frame_number + 1, time.perf_counter()
+            try:
+                with stats.profiling():
+                    for _ in range(self.frame_batch_size):
+                        start = time.perf_counter()
+                        ret, frame = self.cap.read()
+                        stats.add("decode", time.perf_counter() - start)
+                        if not ret:
+                            return False
+
+                        frame_number += 1
+                        if frame_number > training_frame_count:
+                            return False
+
+                        self._count_rectangles(frame, stats)
+                    return True
+            finally:
+                stats.add_block(first_frame=first_frame, frames=frame_number - first_frame + 1,
+                                seconds=time.perf_counter() - block_start)
+
+        with stats.phase("training"):
+            while self.cap.isOpened() and await asyncio.to_thread(train_block):
+                pass
+
+        self.cap.release()
+        return self._get_best_rectangle()
+
+    async def _find_stable_rectangle_sampled(self, training_frame_count):
+        """
+        Trainiert auf verteilten Stichproben (auf Keyframes, falls ffprobe sie liefert) und bricht ab,
+        sobald das häufigste Rechteck und sein Anteil stabil sind oder das Zeitbudget aufgebraucht ist.
+        """
+        keyframes = await asyncio.to_thread(probe_keyframes, self.video_path, self.fps)
+        end_frame = min(training_frame_count, self.frame_count)
+        positions = sample_positions(0, end_frame, self.training_samples, keyframes)
+        tracker = ConvergenceTracker(time_budget=self.training_time_budget)
+        total_count = 0
+        stats = self.training_stats = AnalysisStats(self.profile)
+
+        def count_sample(position):
+            """Sprung, Dekodierung und Zählung einer Stichprobe in einem Thread, None wenn der Frame fehlt"""
+            with stats.profiling():
+                start = time.perf_counter()
+                self.cap.set(cv2.CAP_PROP_POS_FRAMES, position)
+                ret, frame = self.cap.read()
+                stats.add("decode", time.perf_counter() - start)
+                return self._count_rectangles(frame, stats) if ret else None
+
+        training_start = time.perf_counter()
+        for position in positions:
+            counted = await asyncio.to_thread(count_sample, position)
+            if counted is None:
+                stats.count("missing_samples")
+                continue
+
+            total_count += counted
+            leaders = self.rectangle_counter.most_common(2)
+            if leaders and (len(leaders) == 1 or leaders[0][1] > leaders[1][1]):
+                best_rectangle, count = leaders[0]
+                tracker.update(best_rectangle, count / total_count, count)
+            else:
+                tracker.update(None, 0.0, 0)
+            if tracker.done:
                 break
+        stats.add("training", time.perf_counter() - training_start)
+        stats.count("samples", tracker.samples)
+
+        self.cap.release()
+        print(f"Training nach {tracker.samples} von {len(positions)} Stichproben in {tracker.elapsed:.1f}s "
+              f"({'konvergiert' if tracker.converged else 'Zeitbudget' if tracker.expired else 'alle Stichproben'})")
+        return self._get_best_rectangle()
+
+    async def verify_rectangle(self, rectangle, lower_yellow=None, upper_yellow=None, sample_count=24,
+                               min_matches=4, min_match_ratio=0.6):
+        """
+        Prüft ein bekanntes Rechteck samt HSV-Bereich (z.B. aus einem früheren VOD desselben Spielers)
+        auf wenigen über das Video verteilten Frames. Bestätigt ist es, wenn die Leiste mindestens
+        min_matches-mal an dieser Stelle erkannt wurde und dort in mindestens min_match_ratio der Frames
+        liegt, in denen überhaupt eine Leiste zu sehen war. Dann bleibt der HSV-Bereich gesetzt.
+        """
+        x, y, w, h = rectangle
+        if w <= 0 or h <= 0 or x + w > self.frame_width or y + h > self.frame_height:
+            return False
+        previous_range = self.lower_yellow, self.upper_yellow
+        if lower_yellow is not None and upper_yellow is not None:
+            self.lower_yellow, self.upper_yellow = np.array(lower_yellow), np.array(upper_yellow)
 
-            frame_number += 1
-            if frame_number > training_frame_count:
+        keyframes = await asyncio.to_thread(probe_keyframes, self.video_path, self.fps)
+        positions = sample_positions(0, self.frame_count, sample_count, keyframes)
+
+        cap = cv2.VideoCapture(self.video_path)
+
+        def check_sample(position):
+            """(Leiste irgendwo sichtbar, Leiste am Rechteck) für eine Stichprobe, in einem Thread"""
+            cap.set(cv2.CAP_PROP_POS_FRAMES, position)
+            ret, frame = cap.read()
+            if not ret:
+                return False, False
+            x1, y1, x2, y2 = self._calculate_roi(frame)
+            contours = self._find_contours(frame[y1:y2, x1:x2])
+            visible = any(self._validate_rectangle(contour, x1, y1)[0] is not None for contour in contours)
+            return visible, self._match_bar(contours, x1, y1, rectangle) is not None
+
+        seen = matched = 0
+        for position in positions:
+            visible, at_rectangle = await asyncio.to_thread(check_sample, position)
+            seen += visible
+            matched += at_rectangle
+            # Früh aufhören, sobald genug übereinstimmende Frames gesehen wurden
+            if matched >= 2 * min_matches and matched >= min_match_ratio * seen:
                 break
+        cap.release()
+
+        verified = matched >= min_matches and matched >= min_match_ratio * seen
+        if not verified:
+            self.lower_yellow, self.upper_yellow = previous_range
+        return verified
 
+    async def learn_hud_reference(self, rectangle):
+        """
+        Lernt die Referenz des HudGate einmal vor der Analyse aus über das Video verteilten Frames, in denen
+        die Leiste am Rechteck erkannt wird. Frames aus Karte oder Ladebildschirm am Anfang eines Abschnitts
+        fließen so nicht ein, und alle Abschnitte im Worker-Pool prüfen gegen dieselbe Referenz wie der
+        durchgehende Lauf. Gibt HudGate.learned zurück, None wenn zu wenige Frames die Leiste zeigen.
+        """
+        keyframes = await asyncio.to_thread(probe_keyframes, self.video_path, self.fps)
+        positions = sample_positions(0, self.frame_count, self.hud_reference_samples, keyframes)
+        gate = HudGate(rectangle)
+        cap = cv2.VideoCapture(self.video_path)
+
+        def learn_sample(position):
+            """Liest eine Stichprobe in einem Thread und lernt ihre Signatur, wenn die Leiste zu sehen ist"""
+            cap.set(cv2.CAP_PROP_POS_FRAMES, position)
+            ret, frame = cap.read()
+            if not ret:
+                return
             x1, y1, x2, y2 = self._calculate_roi(frame)
-            roi = frame[y1:y2, x1:x2]
-            contours = await asyncio.to_thread(self._find_contours, roi)
-            
-            for contour in contours:
-                x, y, w, h = self._validate_rectangle(contour, x1, y1)
-                if x is not None:
-                    detected_rect = frame[y:y+h, x:x+w]
-                    yellow_ratio = self._calculate_yellow_ratio(detected_rect, w, h)
-                    if yellow_ratio >= 0.25:
-                        self.rectangle_counter[(x, y, w, h)] += 1
+            contours = self._find_contours(frame[y1:y2, x1:x2])
+            if self._match_bar(contours, x1, y1, rectangle) is not None:
+                gate.learn(gate.signature(frame))
 
-        self.cap.release()
-        return self._get_best_rectangle()
+        try:
+            for position in positions:
+                await asyncio.to_thread(learn_sample, position)
+                if gate.ready:
+                    break
+        finally:
+            cap.release()
+        return gate.learned
+
+    def _match_bar(self, contours, x1, y1, rectangle):
+        """The first contour close to the stable rectangle counts as the visible stamina bar"""
+        x_fixed, y_fixed, w_fixed, h_fixed = rectangle
+        for contour in contours:
+            x, y, w, h = self._validate_rectangle(contour, x1, y1)
+            if x is not None:
+                deviation = abs(x - x_fixed) + abs(y - y_fixed) + abs(w - w_fixed) + abs(h - h_fixed)
+                if deviation <= self.max_rectangle_deviation:
+                    return (x, y, w, h)
+        return None
+
+    def _count_rectangles(self, frame, stats=None):
+        """Zählt die gelben Rechtecke eines Frames im rectangle_counter, gibt ihre Anzahl zurück"""
+        x1, y1, x2, y2 = self._calculate_roi(frame)
+        roi = frame[y1:y2, x1:x2]
+        contours = self._find_contours(roi, stats)
+        
+        counted = 0
+        for contour in contours:
+            x, y, w, h = self._validate_rectangle(contour, x1, y1)
+            if x is not None:
+                detected_rect = frame[y:y+h, x:x+w]
+                yellow_ratio = self._calculate_yellow_ratio(detected_rect, w, h)
+                if yellow_ratio >= 0.25:
+                    self.rectangle_counter[(x, y, w, h)] += 1
+                    counted += 1
+        return counted
 
     async def analyze_video(self, stable_rectangle, on_progress = None):
         if not stable_rectangle:
             print("Kein stabiles Rechteck gefunden.")
             return
         
-        x_fixed, y_fixed, w_fixed, h_fixed = stable_rectangle
+        # Mit Worker-Pool wird die Messreihe in Abschnitten parallel aufgenommen. Debug-Bilder brauchen den
+        # Zustand der OOS-Erkennung im Frame und das Profil den eigenen Prozess, beide laufen durchgehend
+        self.worker_stats = {}
+        stats = self.analysis_stats = AnalysisStats(self.profile)
+        hud_reference = None
+        if self.hud_gate:
+            with stats.phase("hud_reference"):
+                hud_reference = await self.learn_hud_reference(stable_rectangle)
+            if hud_reference is None:
+                print("Keine HUD-Referenz gefunden, Analyse ohne HUD-Erkennung")
+        if self.worker_pool is not None and not self.debug and not self.profile:
+            return await self._analyze_video_pooled(stable_rectangle, on_progress, hud_reference)
+        
         cap = cv2.VideoCapture(self.video_path)
-        frame_number = 0
         low_yellow_frame_count = 0
-        high_yellow_found = False
         
-        # Track stamina levels throughout the video
-        stamina_data = []
-        hue_data = []
+        # Track stamina levels (yellow ratio) and the color of the yellow pixels throughout the video
+        series = StaminaSeries(self.fps, self.frame_count)
+        gate = HudGate(stable_rectangle, reference=hud_reference) if hud_reference is not None else None
+        scanner = SeriesScanner(self, cap, stable_rectangle, series, stats, gate=gate)
         
-        while cap.isOpened():
-            ret, frame = cap.read()
-            if not ret:
-                break
-            
-            if on_progress and frame_number % 1000 == 0:
-                await on_progress(frame_number, self.frame_count)
+        def on_oos(frame, frame_number, matched_rect, roi_box, yellow_ratio):
+            nonlocal low_yellow_frame_count
+            low_yellow_frame_count += 1
+            self.saved_timestamps.append(format_timestamp(frame_number, self.fps))
+            if self.debug:
+                self._save_oos_debug_image(frame, frame_number, stable_rectangle, matched_rect, roi_box, yellow_ratio)
+        scanner.on_oos = on_oos
+        
+        # Decoding and analysis run block by block off the event loop, progress is reported between blocks
+        next_progress = 0
+        with stats.phase("analysis"):
+            while cap.isOpened():
+                if on_progress and scanner.frame_number >= next_progress:
+                    await on_progress(scanner.frame_number, self.frame_count)
+                    next_progress = (scanner.frame_number // 1000 + 1) * 1000
+                if not await asyncio.to_thread(scanner.scan_block):
+                    break
 
-            frame_number += 1
-            timestamp = frame_number / self.fps
-            
-            x1, y1, x2, y2 = self._calculate_roi(frame)
-            roi = frame[y1:y2, x1:x2]
-            contours = await asyncio.to_thread(self._find_contours, roi)
-            
-            # Always measure current stamina in the fixed rectangle
-            stable_rect = frame[y_fixed:y_fixed + h_fixed, x_fixed:x_fixed + w_fixed]
-            yellow_ratio = self._calculate_yellow_ratio(stable_rect, w_fixed, h_fixed)
-            
-            # Store stamina level data (yellow ratio) and timestamp
-            stamina_data.append((timestamp, yellow_ratio))
-            
-            # Store hue distribution data
-            hsv = cv2.cvtColor(stable_rect, cv2.COLOR_BGR2HSV)
-            # Get only yellow pixels to analyze their hue
-            mask = cv2.inRange(hsv, self.lower_yellow, self.upper_yellow)
-            if np.count_nonzero(mask) > 0:
-                # Calculate average hue, saturation, value of yellow pixels
-                yellow_pixels = hsv[mask > 0]
-                if len(yellow_pixels) > 0:
-                    avg_hue = np.mean(yellow_pixels[:, 0])
-                    avg_saturation = np.mean(yellow_pixels[:, 1])
-                    avg_value = np.mean(yellow_pixels[:, 2])
-                    hue_data.append((timestamp, avg_hue, avg_saturation, avg_value))
-                else:
-                    hue_data.append((timestamp, 0, 0, 0))
-            else:
-                hue_data.append((timestamp, 0, 0, 0))
-            
-            for contour in contours:
-                x, y, w, h = self._validate_rectangle(contour, x1, y1)
-                if x is not None:
-                    deviation = abs(x - x_fixed) + abs(y - y_fixed) + abs(w - w_fixed) + abs(h - h_fixed)
-                    if deviation <= 60:
-                        if yellow_ratio > 0.08:
-                            high_yellow_found = True
-                        if yellow_ratio < 0.02 and high_yellow_found:
-                            low_yellow_frame_count += 1
-                            high_yellow_found = False
-
-                            timestamp = frame_number / self.fps
-                            minutes = int(timestamp // 60)
-                            seconds = int(timestamp % 60)
-                            formatted_timestamp = f"{minutes:02}:{seconds:02}"
-                            self.saved_timestamps.append(formatted_timestamp)
-
-                            if self.debug:
-                                cv2.rectangle(frame, (x_fixed, y_fixed), (x_fixed + w_fixed, y_fixed + h_fixed), (255, 0, 0), 2)
-                                cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 255, 0), 2)
-                                cv2.rectangle(frame, (x1, y1), (x2, y2), (138, 43, 226), 2)
-                                
-                                # Add text with frame number and timestamp
-                                timestamp_seconds = frame_number / self.fps
-                                minutes = int(timestamp_seconds // 60)
-                                seconds = int(timestamp_seconds % 60)
-                                ms = int((timestamp_seconds % 1) * 1000)
-                                timestamp_text = f"Frame: {frame_number} | Time: {minutes:02}:{seconds:02}.{ms:03}"
-                                cv2.putText(frame, timestamp_text, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
-                                
-                                # Create visualization of stamina bar and its yellow detection
-                                # Create a fixed size bottom panel that's big enough for our visualizations
-                                bottom_panel_height = 150  # Fixed height for panel
-                                
-                                # Create a canvas with extra space at the bottom
-                                frame_with_panel = np.zeros((frame.shape[0] + bottom_panel_height, frame.shape[1], 3), dtype=np.uint8)
-                                frame_with_panel[:frame.shape[0], :] = frame  # Copy original frame
-                                # Fill the bottom panel with a dark gray background
-                                frame_with_panel[frame.shape[0]:, :] = [30, 30, 30]  # Dark gray background
-                                
-                                # Draw labels
-                                cv2.putText(frame_with_panel, "Original Stamina Bar:", 
-                                          (10, frame.shape[0] + 20), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 1)
-                                cv2.putText(frame_with_panel, "Yellow Detection Mask:", 
-                                          (frame.shape[1]//2 + 10, frame.shape[0] + 20), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 1)
-                                
-                                try:
-                                    # Ensure coordinates are within frame boundaries
-                                    y_fixed_safe = max(0, min(y_fixed, frame.shape[0]-1))
-                                    x_fixed_safe = max(0, min(x_fixed, frame.shape[1]-1))
-                                    height_safe = min(h_fixed, frame.shape[0] - y_fixed_safe)
-                                    width_safe = min(w_fixed, frame.shape[1] - x_fixed_safe)
-                                    
-                                    # Get the stamina bar ROI with safety checks
-                                    if height_safe > 0 and width_safe > 0:
-                                        stable_rect = frame[y_fixed_safe:y_fixed_safe + height_safe, 
-                                                           x_fixed_safe:x_fixed_safe + width_safe].copy()
-                                        
-                                        # Scale up stamina bar for better visibility (but keep it reasonable)
-                                        scale_factor = 3.0
-                                        scaled_width = int(width_safe * scale_factor)
-                                        scaled_height = int(height_safe * scale_factor)
-                                        
-                                        # Make sure the scaled dimensions aren't too large
-                                        max_width = frame.shape[1] // 2 - 20
-                                        if scaled_width > max_width:
-                                            scale_factor = max_width / width_safe
-                                            scaled_width = int(width_safe * scale_factor)
-                                            scaled_height = int(height_safe * scale_factor)
-                                        
-                                        # Resize with safety check
-                                        if stable_rect.size > 0 and scaled_width > 0 and scaled_height > 0:
-                                            scaled_roi = cv2.resize(stable_rect, (scaled_width, scaled_height))
-                                            
-                                            # Add a white border
-                                            cv2.rectangle(scaled_roi, (0, 0), (scaled_width-1, scaled_height-1), (255, 255, 255), 1)
-                                            
-                                            # Calculate positions for ROIs in the bottom panel
-                                            roi_y_pos = frame.shape[0] + 30
-                                            roi_x_pos = 10
-                                            
-                                            # Copy the scaled ROI to the bottom panel - left side
-                                            if roi_y_pos + scaled_height <= frame_with_panel.shape[0] and roi_x_pos + scaled_width <= frame_with_panel.shape[1]:
-                                                frame_with_panel[roi_y_pos:roi_y_pos + scaled_height, 
-                                                               roi_x_pos:roi_x_pos + scaled_width] = scaled_roi
-                                            
-                                            # Create mask visualization
-                                            hsv = cv2.cvtColor(stable_rect, cv2.COLOR_BGR2HSV)
-                                            mask = cv2.inRange(hsv, self.lower_yellow, self.upper_yellow)
-                                            
-                                            # Create colored mask (yellow on black)
-                                            mask_colored = np.zeros_like(stable_rect)
-                                            mask_colored[mask > 0] = [0, 255, 255]  # BGR for yellow
-                                            
-                                            # Scale up mask
-                                            scaled_mask = cv2.resize(mask_colored, (scaled_width, scaled_height))
-                                            
-                                            # Add a white border to the mask
-                                            cv2.rectangle(scaled_mask, (0, 0), (scaled_width-1, scaled_height-1), (255, 255, 255), 1)
-                                            
-                                            # Copy the mask to the bottom panel - right side
-                                            roi_x_pos = frame.shape[1]//2 + 10
-                                            if roi_y_pos + scaled_height <= frame_with_panel.shape[0] and roi_x_pos + scaled_width <= frame_with_panel.shape[1]:
-                                                frame_with_panel[roi_y_pos:roi_y_pos + scaled_height, 
-                                                               roi_x_pos:roi_x_pos + scaled_width] = scaled_mask
-                                    else:
-                                        # If we can't get a valid ROI, show an error message
-                                        error_msg = "Error: Invalid stamina bar region"
-                                        cv2.putText(frame_with_panel, error_msg, 
-                                                  (10, frame.shape[0] + 70), 
-                                                  cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
-                                except Exception as e:
-                                    # Something went wrong with the visualization - let's show an error
-                                    error_msg = f"Error: {str(e)}"
-                                    cv2.putText(frame_with_panel, error_msg, 
-                                              (10, frame.shape[0] + 70), 
-                                              cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
-                                
-                                # Draw yellow ratio text
-                                yellow_ratio_text = f"Yellow Ratio: {yellow_ratio:.2%}"
-                                cv2.putText(frame_with_panel, yellow_ratio_text, 
-                                          (10, frame.shape[0] + bottom_panel_height - 20), 
-                                          cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 255), 2)
-                                
-                                # Save the enhanced debug image
-                                cv2.imwrite(f"{self.output_dir}/{frame_number}.jpg", frame_with_panel)
-            
         cap.release()
+        stats.count("frames", scanner.frame_number)
+        stats.count("oos_events", low_yellow_frame_count)
         print(f"Anzahl der Frames mit weniger als 5% Gelb: {low_yellow_frame_count}")
-        return self.saved_timestamps, stamina_data, hue_data
+        return self.saved_timestamps, series
+
+    def scan_settings(self):
+        """Einstellungen, die ein Worker für die Messreihe braucht (siehe analyze_series_chunk)"""
+        return {name: getattr(self, name) for name in SCAN_SETTINGS}
+
+    async def _analyze_video_pooled(self, stable_rectangle, on_progress=None, hud_reference=None):
+        """
+        analyze_video im Worker-Pool: Jeder Abschnitt des Videos wird in einem eigenen Prozess dekodiert
+        und vermessen (analyze_series_chunk). Die OOS-Momente entstehen danach aus der zusammengesetzten
+        Messreihe mit timestamps_from_series und stimmen mit dem durchgehenden Lauf überein. Mit
+        hud_reference beginnen die Abschnitte auf dem Raster der HUD-Sprünge und prüfen gegen diese Referenz.
+        """
+        pool = self.worker_pool
+        chunk_count = max(1, min(pool.max_workers, self.frame_count // POOL_MIN_CHUNK_FRAMES))
+        keyframes = await asyncio.to_thread(probe_keyframes, self.video_path, self.fps) if chunk_count > 1 else None
+        align = self.hud_skip_frames if hud_reference is not None else 1
+        # Der letzte Abschnitt liest bis zum Videoende, frame_count aus dem Container kann zu klein sein
+        tasks = [
+            SeriesChunkTask(self.video_path, start, end, tuple(stable_rectangle), self.scan_settings(), self.output_dir,
+                            hud_reference=hud_reference)
+            for start, end in plan_series_sections(self.frame_count, chunk_count, keyframes, align)
+        ]
+        stats = self.analysis_stats
+        
+        with stats.phase("analysis"):
+            async with pool.job() as job:
+                # Ein Abschnitt, dessen Worker abstürzt, läuft einmal auf einem neuen Executor, sonst scheitert der Auftrag
+                runs = [
+                    job.run(
+                        analyze_series_chunk,
+                        task._replace(cancel_event=job.cancel_event, progress_queue=job.progress_queue),
+                        frames=(task.end_frame or self.frame_count) - task.start_frame,
+                    )
+                    for task in tasks
+                ]
+                progress_task = asyncio.create_task(self._forward_chunk_progress(job.progress_queue, on_progress))
+                try:
+                    results = await asyncio.gather(*runs)
+                finally:
+                    job.progress_queue.put(None)
+                    await progress_task
+                if job.cancelled:
+                    raise asyncio.CancelledError()
+                self.worker_stats = job.worker_stats()
+        
+        series = StaminaSeries.from_arrays({
+            key: np.concatenate([arrays[key] for arrays, _ in results]) for key in ("ratios", "hsv", "bar_matches")
+        }, self.fps)
+        for _, chunk_stats in results:
+            stats.merge(chunk_stats)
+        timestamps = self.timestamps_from_series(series.ratios, series.bar_matches)
+        self.saved_timestamps.extend(timestamps)
+        stats.count("frames", len(series))
+        stats.count("oos_events", len(timestamps))
+        if on_progress:
+            await on_progress(len(series), self.frame_count)
+        return self.saved_timestamps, series
+
+    async def _forward_chunk_progress(self, progress_queue, on_progress=None):
+        """Liest die Fortschrittsmeldungen (start_frame, Frames) der Worker bis zum None und meldet die Summe"""
+        loop = asyncio.get_running_loop()
+        processed = {}
+        while True:
+            item = await loop.run_in_executor(None, progress_queue.get)
+            if item is None:
+                break
+            start_frame, frames = item
+            processed[start_frame] = frames
+            if on_progress:
+                await on_progress(sum(processed.values()), self.frame_count)
+
+    def _save_oos_debug_image(self, frame, frame_number, stable_rectangle, matched_rect, roi_box, yellow_ratio):
+        """Saves the frame of an OOS moment with both rectangles, the ROI and an enlarged bar/mask panel"""
+        x_fixed, y_fixed, w_fixed, h_fixed = stable_rectangle
+        x, y, w, h = matched_rect
+        x1, y1, x2, y2 = roi_box
+        
+        cv2.rectangle(frame, (x_fixed, y_fixed), (x_fixed + w_fixed, y_fixed + h_fixed), (255, 0, 0), 2)
+        cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 255, 0), 2)
+        cv2.rectangle(frame, (x1, y1), (x2, y2), (138, 43, 226), 2)
+        
+        # Add text with frame number and timestamp
+        timestamp_seconds = frame_number / self.fps
+        minutes = int(timestamp_seconds // 60)
+        seconds = int(timestamp_seconds % 60)
+        ms = int((timestamp_seconds % 1) * 1000)
+        timestamp_text = f"Frame: {frame_number} | Time: {minutes:02}:{seconds:02}.{ms:03}"
+        cv2.putText(frame, timestamp_text, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
+        
+        # Create visualization of stamina bar and its yellow detection
+        # Create a fixed size bottom panel that's big enough for our visualizations
+        bottom_panel_height = 150  # Fixed height for panel
+        
+        # Create a canvas with extra space at the bottom
+        frame_with_panel = np.zeros((frame.shape[0] + bottom_panel_height, frame.shape[1], 3), dtype=np.uint8)
+        frame_with_panel[:frame.shape[0], :] = frame  # Copy original frame
+        # Fill the bottom panel with a dark gray background
+        frame_with_panel[frame.shape[0]:, :] = [30, 30, 30]  # Dark gray background
+        
+        # Draw labels
+        cv2.putText(frame_with_panel, "Original Stamina Bar:", 
+                  (10, frame.shape[0] + 20), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 1)
+        cv2.putText(frame_with_panel, "Yellow Detection Mask:", 
+                  (frame.shape[1]//2 + 10, frame.shape[0] + 20), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 1)
+        
+        try:
+            # Ensure coordinates are within frame boundaries
+            y_fixed_safe = max(0, min(y_fixed, frame.shape[0]-1))
+            x_fixed_safe = max(0, min(x_fixed, frame.shape[1]-1))
+            height_safe = min(h_fixed, frame.shape[0] - y_fixed_safe)
+            width_safe = min(w_fixed, frame.shape[1] - x_fixed_safe)
+        
+            # Get the stamina bar ROI with safety checks
+            if height_safe > 0 and width_safe > 0:
+                stable_rect = frame[y_fixed_safe:y_fixed_safe + height_safe, 
+                                   x_fixed_safe:x_fixed_safe + width_safe].copy()
+        
+                # Scale up stamina bar for better visibility (but keep it reasonable)
+                scale_factor = 3.0
+                scaled_width = int(width_safe * scale_factor)
+                scaled_height = int(height_safe * scale_factor)
+        
+                # Make sure the scaled dimensions aren't too large
+                max_width = frame.shape[1] // 2 - 20
+                if scaled_width > max_width:
+                    scale_factor = max_width / width_safe
+                    scaled_width = int(width_safe * scale_factor)
+                    scaled_height = int(height_safe * scale_factor)
+        
+                # Resize with safety check
+                if stable_rect.size > 0 and scaled_width > 0 and scaled_height > 0:
+                    scaled_roi = cv2.resize(stable_rect, (scaled_width, scaled_height))
+        
+                    # Add a white border
+                    cv2.rectangle(scaled_roi, (0, 0), (scaled_width-1, scaled_height-1), (255, 255, 255), 1)
+        
+                    # Calculate positions for ROIs in the bottom panel
+                    roi_y_pos = frame.shape[0] + 30
+                    roi_x_pos = 10
+        
+                    # Copy the scaled ROI to the bottom panel - left side
+                    if roi_y_pos + scaled_height <= frame_with_panel.shape[0] and roi_x_pos + scaled_width <= frame_with_panel.shape[1]:
+                        frame_with_panel[roi_y_pos:roi_y_pos + scaled_height, 
+                                       roi_x_pos:roi_x_pos + scaled_width] = scaled_roi
+        
+                    # Create mask visualization
+                    hsv = cv2.cvtColor(stable_rect, cv2.COLOR_BGR2HSV)
+                    mask = cv2.inRange(hsv, self.lower_yellow, self.upper_yellow)
+        
+                    # Create colored mask (yellow on black)
+                    mask_colored = np.zeros_like(stable_rect)
+                    mask_colored[mask > 0] = [0, 255, 255]  # BGR for yellow
+        
+                    # Scale up mask
+                    scaled_mask = cv2.resize(mask_colored, (scaled_width, scaled_height))
+        
+                    # Add a white border to the mask
+                    cv2.rectangle(scaled_mask, (0, 0), (scaled_width-1, scaled_height-1), (255, 255, 255), 1)
+        
+                    # Copy the mask to the bottom panel - right side
+                    roi_x_pos = frame.shape[1]//2 + 10
+                    if roi_y_pos + scaled_height <= frame_with_panel.shape[0] and roi_x_pos + scaled_width <= frame_with_panel.shape[1]:
+                        frame_with_panel[roi_y_pos:roi_y_pos + scaled_height, 
+                                       roi_x_pos:roi_x_pos + scaled_width] = scaled_mask
+            else:
+                # If we can't get a valid ROI, show an error message
+                error_msg = "Error: Invalid stamina bar region"
+                cv2.putText(frame_with_panel, error_msg, 
+                          (10, frame.shape[0] + 70), 
+                          cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
+        except Exception as e:
+            # Something went wrong with the visualization - let's show an error
+            error_msg = f"Error: {str(e)}"
+            cv2.putText(frame_with_panel, error_msg, 
+                      (10, frame.shape[0] + 70), 
+                      cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
+        
+        # Draw yellow ratio text
+        yellow_ratio_text = f"Yellow Ratio: {yellow_ratio:.2%}"
+        cv2.putText(frame_with_panel, yellow_ratio_text, 
+                  (10, frame.shape[0] + bottom_panel_height - 20), 
+                  cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 255), 2)
+        
+        # Save the enhanced debug image
+        cv2.imwrite(f"{self.output_dir}/{frame_number}.jpg", frame_with_panel)
 
     def _calculate_roi(self, frame):
         h, w = frame.shape[:2]
@@ -246,10 +970,16 @@ class VideoAnalyzer:
         x2, y2 = int(self.roi_x2_percent * w), int(self.roi_y2_percent * h)
         return x1, y1, x2, y2
 
-    def _find_contours(self, roi):
+    def _find_contours(self, roi, stats=None):
+        """Kanten (Graustufen + Canny) und äußere Konturen des ROI, mit stats gemessen als Phasen edges und contours"""
+        start = time.perf_counter()
         gray = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY)
         edges = cv2.Canny(gray, 50, 150)
+        found = time.perf_counter()
         contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        if stats is not None:
+            stats.add("edges", found - start)
+            stats.add("contours", time.perf_counter() - found)
         return contours
 
     def _validate_rectangle(self, contour, x1, y1):
@@ -266,6 +996,22 @@ class VideoAnalyzer:
         yellow_pixels = np.count_nonzero(mask)
         return yellow_pixels / (w * h)
 
+    def _yellow_stats(self, detected_rect, w, h, stats=None):
+        """
+        Gelb-Anteil und mittleres HSV der gelben Pixel aus einer einzigen HSV-Umrechnung und Maske
+        pro Frame. Ohne gelbe Pixel ist das mittlere HSV (0, 0, 0).
+        """
+        start = time.perf_counter()
+        hsv = cv2.cvtColor(detected_rect, cv2.COLOR_BGR2HSV)
+        converted = time.perf_counter()
+        mask = cv2.inRange(hsv, self.lower_yellow, self.upper_yellow)
+        yellow_pixels = cv2.countNonZero(mask)
+        result = (yellow_pixels / (w * h), cv2.mean(hsv, mask=mask)[:3]) if yellow_pixels else (0.0, (0, 0, 0))
+        if stats is not None:
+            stats.add("color", converted - start)
+            stats.add("mask", time.perf_counter() - converted)
+        return result
+
     def _get_best_rectangle(self):
         if self.rectangle_counter:
             best_rectangle, _ = self.rectangle_counter.most_common(1)[0]
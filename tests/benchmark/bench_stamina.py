@@ -0,0 +1,270 @@
+"""
+Benchmark der Stamina-Analyse auf synthetischen Clips (siehe synthetic_clip.py), offline und mit Ground Truth.
+
+Misst pro Clip und Analyzer die Zeit der Phasen (Farbproben, Training, Analyse), Frames pro Sekunde,
+den maximalen Speicherverbrauch (Peak RSS, inklusive Worker-Prozesse) sowie Precision und Recall
+der erkannten OOS-Momente. Jeder Lauf startet in einem eigenen Prozess, damit Peak RSS vergleichbar ist.
+
+    python tests/benchmark/bench_stamina.py
+    python tests/benchmark/bench_stamina.py --clips 1080p --analyzers old --json bench.json
+"""
+import argparse
+import asyncio
+import functools
+import json
+import multiprocessing
+import os
+import queue
+import resource
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.abspath(os.path.join(HERE, "..", ".."))
+for path in (HERE, os.path.join(ROOT, "src")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+import synthetic_clip  # noqa: E402
+
+CLIPS = {
+    "720p": synthetic_clip.ClipSpec(1280, 720, 30, 40.0),
+    "1080p": synthetic_clip.ClipSpec(1920, 1080, 30, 40.0, bar_width=0.12, seed=1),
+    "720p60-offset": synthetic_clip.ClipSpec(1280, 720, 60, 30.0, bar_center=(0.47, 0.9), bar_width=0.18, seed=2),
+    "720p-map": synthetic_clip.ClipSpec(1280, 720, 30, 40.0, hud_hidden=((12.0, 19.0), (33.0, 38.0)), seed=3),
+}
+
+# Mindestwerte gegen die Ground Truth, darunter gilt ein Lauf als fehlgeschlagen (Zeiten allein sagen dann nichts)
+MIN_PRECISION = 0.9
+MIN_RECALL = 0.9
+
+# Obergrenze pro Lauf in Sekunden, danach wird der Kindprozess beendet und der Fall als fehlgeschlagen gemeldet
+CASE_TIMEOUT = 1800.0
+
+# Die Analyzer liefern unterschiedliche Ereignisse: der alte nur OOS-Momente, der neue jeden Zustandswechsel.
+# "single" ist der neue Analyzer im Single-Pass-Modus (analyze_single_pass), nur auf Anfrage
+ANALYZERS = ("old", "new")
+OPTIONAL_ANALYZERS = ("single",)
+
+
+def _timed(phases, name, method):
+    @functools.wraps(method)
+    async def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await method(*args, **kwargs)
+        finally:
+            phases[name] = phases.get(name, 0.0) + time.perf_counter() - start
+    return wrapper
+
+
+def _apply_options(analyzer, options):
+    for name, value in options.items():
+        if hasattr(analyzer, name):
+            setattr(analyzer, name, value)
+
+
+async def _run_old(video_path, output_dir, training_frame_count, phases, options):
+    from videoAnalyzerOld import VideoAnalyzer
+    analyzer = VideoAnalyzer(video_path, output_dir=output_dir)
+    _apply_options(analyzer, options)
+    analyzer.find_stable_rectangle = _timed(phases, "training", analyzer.find_stable_rectangle)
+    analyzer.analyze_video = _timed(phases, "analysis", analyzer.analyze_video)
+    rectangle = await analyzer.find_stable_rectangle(training_frame_count)
+    if rectangle is None:
+        return None, []
+    timestamps, _ = await analyzer.analyze_video(rectangle)
+    return rectangle, timestamps
+
+
+async def _run_new(video_path, output_dir, training_frame_count, phases, options):
+    from videoAnalyzer import VideoAnalyzer
+    analyzer = VideoAnalyzer(video_path, output_dir=output_dir)
+    analyzer.output_dir_debug = output_dir
+    _apply_options(analyzer, options)
+    analyzer._collect_color_samples = _timed(phases, "sampling", analyzer._collect_color_samples)
+    analyzer.find_stable_rectangle = _timed(phases, "training", analyzer.find_stable_rectangle)
+    analyzer.analyze_video = _timed(phases, "analysis", analyzer.analyze_video)
+    rectangle = await analyzer.find_stable_rectangle(training_frame_count, 0)
+    if rectangle is None:
+        return None, []
+    return rectangle, await analyzer.analyze_video(rectangle)
+
+
+async def _run_single(video_path, output_dir, training_frame_count, phases, options):
+    from videoAnalyzer import VideoAnalyzer
+    analyzer = VideoAnalyzer(video_path, output_dir=output_dir)
+    analyzer.output_dir_debug = output_dir
+    _apply_options(analyzer, options)
+    analyzer.analyze_single_pass = _timed(phases, "analysis", analyzer.analyze_single_pass)
+    return await analyzer.analyze_single_pass(training_frame_count)
+
+
+RUNNERS = {"old": _run_old, "new": _run_new, "single": _run_single}
+
+
+def _run_case(analyzer, video_path, training_frame_count, options, result_queue):
+    """Läuft im Kindprozess und meldet Zeiten, Ergebnis und Peak RSS zurück"""
+    phases = {}
+    runner = RUNNERS[analyzer]
+    with tempfile.TemporaryDirectory() as output_dir:
+        start = time.perf_counter()
+        try:
+            rectangle, timestamps = asyncio.run(runner(video_path, output_dir, training_frame_count, phases, options))
+        except Exception as e:
+            result_queue.put({"error": f"{type(e).__name__}: {e}"})
+            raise
+        total = time.perf_counter() - start
+    # ru_maxrss ist unter Linux in KiB, für Kinder das Maximum eines einzelnen Worker-Prozesses
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak_rss_workers = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    result_queue.put({
+        "rectangle": list(rectangle) if rectangle else None,
+        "timestamps": timestamps,
+        "phases": phases,
+        "total_seconds": total,
+        "peak_rss_mib": peak_rss / 1024,
+        "peak_rss_worker_mib": peak_rss_workers / 1024,
+    })
+
+
+def _wait_for_result(process, result_queue, timeout):
+    """Ergebnis des Kindprozesses oder ein Fehler-Dict, falls er abstürzt, scheitert oder zu lange braucht"""
+    deadline = time.monotonic() + timeout
+    result = None
+    while result is None:
+        try:
+            result = result_queue.get(timeout=1.0)
+        except queue.Empty:
+            if not process.is_alive():
+                # Letzte Chance für ein Ergebnis, das kurz vor dem Ende noch in die Queue ging
+                try:
+                    result = result_queue.get(timeout=1.0)
+                except queue.Empty:
+                    result = {"error": f"Prozess ohne Ergebnis beendet (Exitcode {process.exitcode})"}
+            elif time.monotonic() > deadline:
+                process.terminate()
+                result = {"error": f"Zeitüberschreitung nach {timeout:.0f}s"}
+    process.join(10.0)
+    if process.is_alive():
+        process.kill()
+        process.join()
+    if "error" not in result and process.exitcode != 0:
+        result = {"error": f"Exitcode {process.exitcode}"}
+    return result
+
+
+def run_case(analyzer, video_path, truth, training_frame_count=None, options=None, timeout=CASE_TIMEOUT):
+    """
+    Führt einen Analyzer in einem eigenen Prozess auf einem Clip aus und bewertet das Ergebnis.
+    options setzt Attribute des Analyzers (z.B. mask_cleanup, fill_estimator, hud_gate), sofern er sie kennt.
+    Scheitert der Lauf, enthält das Ergebnis nur analyzer, frames und error. Trifft das erkannte Rechteck die
+    Leiste nicht oder liegen Precision/Recall unter MIN_PRECISION/MIN_RECALL, bleiben die Messwerte erhalten,
+    error nennt aber die Abweichung.
+    """
+    training_frame_count = training_frame_count or int(truth.frame_count * 0.8)
+    context = multiprocessing.get_context("spawn")
+    result_queue = context.Queue()
+    process = context.Process(target=_run_case,
+                              args=(analyzer, video_path, training_frame_count, options or {}, result_queue))
+    process.start()
+    result = _wait_for_result(process, result_queue, timeout)
+    if "error" in result:
+        return {"analyzer": analyzer, "frames": truth.frame_count, "error": result["error"]}
+
+    detected = [synthetic_clip.parse_timestamp(timestamp) for timestamp in result["timestamps"]]
+    expected = truth.oos_times if analyzer == "old" else sorted(truth.oos_times + truth.recovery_times)
+    precision, recall, _ = synthetic_clip.match_events(detected, expected)
+    analysis_seconds = result["phases"].get("analysis", 0.0)
+    result.update({
+        "analyzer": analyzer,
+        "frames": truth.frame_count,
+        "expected_events": len(expected),
+        "detected_events": len(detected),
+        "precision": precision,
+        "recall": recall,
+        "analysis_fps": truth.frame_count / analysis_seconds if analysis_seconds else None,
+        "total_fps": truth.frame_count / result["total_seconds"],
+        "rectangle_truth": list(truth.bar),
+    })
+    failures = []
+    if not synthetic_clip.rectangle_matches(result["rectangle"], truth.bar):
+        failures.append(f"Rechteck {result['rectangle']} trifft die Leiste {list(truth.bar)} nicht")
+    if precision < MIN_PRECISION or recall < MIN_RECALL:
+        failures.append(f"Ereignisse P {precision:.2f} R {recall:.2f} ({len(detected)} erkannt, {len(expected)} erwartet)")
+    if failures:
+        result["error"] = "; ".join(failures)
+    return result
+
+
+def format_result(clip, result):
+    if "error" in result:
+        # Auch bei abweichender Erkennung keine Zeiten ausgeben, die nach einem gültigen Lauf aussehen
+        return f"{clip:<14} {result['analyzer']:<6} FEHLGESCHLAGEN: {result['error']}"
+    phases = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in result["phases"].items())
+    analysis_fps = f"{result['analysis_fps']:.0f}" if result["analysis_fps"] else "-"
+    return (
+        f"{clip:<14} {result['analyzer']:<6} {result['total_seconds']:7.2f}s  {analysis_fps:>6} fps (Analyse)  "
+        f"{result['total_fps']:6.0f} fps (gesamt)  RSS {result['peak_rss_mib']:6.0f} MiB / Worker "
+        f"{result['peak_rss_worker_mib']:5.0f} MiB  P {result['precision']:.2f} R {result['recall']:.2f}  "
+        f"[{phases}]  Rechteck {result['rectangle']} (Soll {result['rectangle_truth']})"
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clips", default=",".join(CLIPS), help=f"Kommagetrennt aus {', '.join(CLIPS)}")
+    parser.add_argument("--analyzers", default=",".join(ANALYZERS), help="old, new, single (Single-Pass) oder mehrere")
+    parser.add_argument("--seconds", type=float, help="Länge der Clips überschreiben")
+    parser.add_argument("--clip-dir", help="Clips hier ablegen und wiederverwenden statt in einem Tempverzeichnis")
+    parser.add_argument("--json", dest="json_path", help="Ergebnisse zusätzlich als JSON speichern")
+    parser.add_argument("--mask-cleanup", choices=("morphology", "rows"), help="Maskenbereinigung des neuen Analyzers")
+    parser.add_argument("--fill-estimator", choices=("pixels", "columns"), help="Füllstand-Schätzer des neuen Analyzers")
+    parser.add_argument("--hud-gate", choices=("on", "off"), help="HUD-Erkennung des alten Analyzers")
+    parser.add_argument("--timeout", type=float, default=CASE_TIMEOUT, help="Sekunden pro Lauf, danach Abbruch")
+    args = parser.parse_args(argv)
+
+    clip_dir = args.clip_dir or tempfile.mkdtemp(prefix="stamina-bench-")
+    os.makedirs(clip_dir, exist_ok=True)
+    results = []
+    for clip in args.clips.split(","):
+        spec = CLIPS[clip]
+        if args.seconds:
+            spec = spec._replace(seconds=args.seconds)
+        video_path = os.path.join(clip_dir, f"{clip}_{spec.label}.mp4")
+        truth_path = video_path + ".json"
+        truth = None
+        if os.path.exists(video_path) and os.path.exists(truth_path):
+            with open(truth_path) as f:
+                truth = synthetic_clip.GroundTruth(**json.load(f))
+            # Geänderte Geometrie im Preset: Clip neu schreiben statt einen veralteten wiederzuverwenden
+            if tuple(truth.bar) != synthetic_clip.bar_rectangle(spec):
+                truth = None
+        if truth is None:
+            truth = synthetic_clip.write_clip(video_path, spec)
+            with open(truth_path, "w") as f:
+                json.dump(truth._asdict(), f)
+
+        for analyzer in args.analyzers.split(","):
+            options = {
+                name: value for name, value in (
+                    ("mask_cleanup", args.mask_cleanup),
+                    ("fill_estimator", args.fill_estimator),
+                    ("hud_gate", None if args.hud_gate is None else args.hud_gate == "on"),
+                )
+                if value is not None
+            }
+            result = run_case(analyzer, video_path, truth, options=options, timeout=args.timeout)
+            result["clip"] = clip
+            results.append(result)
+            print(format_result(clip, result), flush=True)
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(results, f, indent=2)
+    return results
+
+
+if __name__ == "__main__":
+    sys.exit(1 if any("error" in result for result in main()) else 0)
@@ -0,0 +1,174 @@
+"""
+Synthetische New-World-Clips für Benchmarks: eine gelbe Stamina-Leiste mit dunklem Rahmen auf
+bewegtem, verrauschtem Hintergrund. Füllstand folgt einem Skript aus Leeren/Auffüllen, daher sind
+die OOS-Momente (Ground Truth) bekannt. Optional verschwindet das HUD in einzelnen Abschnitten hinter
+einer Karte mit gelben Markierungen. Geschrieben wird mit cv2.VideoWriter (mp4v, verlustbehaftet).
+"""
+from typing import NamedTuple
+import cv2
+import numpy as np
+
+# BGR-Farbe der gefüllten Leiste, liegt im HSV-Bereich beider Analyzer
+BAR_COLOR = (20, 200, 230)
+FRAME_COLOR = (30, 30, 30)
+
+# Ein Zyklus von 10 Sekunden: voll, leerlaufen, leer, auffüllen (Dauer in Sekunden, Füllstand am Ende)
+DEFAULT_SCRIPT = ((3.0, 1.0), (2.5, 0.0), (1.0, 0.0), (2.5, 1.0), (1.0, 1.0))
+
+
+class ClipSpec(NamedTuple):
+    width: int = 1280
+    height: int = 720
+    fps: int = 30
+    seconds: float = 40.0
+    # Mitte der Leiste relativ zur Bildgröße und Breite relativ zur Bildbreite
+    bar_center: tuple = (0.5, 0.88)
+    bar_width: float = 0.17
+    # Höhe bei 1080p, wird mit der Auflösung skaliert
+    bar_height_1080p: int = 10
+    script: tuple = DEFAULT_SCRIPT
+    noise: int = 25
+    seed: int = 0
+    # Abschnitte (Start, Ende in Sekunden) ohne HUD, z.B. Karte oder Ladebildschirm
+    hud_hidden: tuple = ()
+
+    @property
+    def frame_count(self):
+        return int(round(self.seconds * self.fps))
+
+    @property
+    def label(self):
+        return f"{self.width}x{self.height}@{self.fps}_{self.seconds:g}s"
+
+
+class GroundTruth(NamedTuple):
+    bar: tuple  # (x, y, w, h) der gefüllten Fläche
+    oos_times: list  # Sekunden, in denen die Leiste leer wird
+    recovery_times: list  # Sekunden, in denen sie wieder über die Hälfte gefüllt ist
+    frame_count: int
+
+
+def fill_curve(spec):
+    """Füllstand (0..1) pro Frame, linear zwischen den Punkten des Skripts, das sich wiederholt"""
+    times = [0.0]
+    levels = [spec.script[-1][1]]
+    while times[-1] < spec.seconds:
+        for duration, level in spec.script:
+            times.append(times[-1] + duration)
+            levels.append(level)
+    frame_times = np.arange(spec.frame_count) / spec.fps
+    return np.interp(frame_times, times, levels)
+
+
+def hud_visible(spec, time):
+    return not any(start <= time < end for start, end in spec.hud_hidden)
+
+
+def ground_truth(spec, fills):
+    """OOS- und Erholungszeitpunkte, nur solange das HUD sichtbar ist"""
+    oos_times, recovery_times = [], []
+    empty = False
+    for frame, fill in enumerate(fills):
+        if not hud_visible(spec, frame / spec.fps):
+            continue
+        if not empty and fill <= 0.0:
+            empty = True
+            oos_times.append(frame / spec.fps)
+        elif empty and fill >= 0.5:
+            empty = False
+            recovery_times.append(frame / spec.fps)
+    return oos_times, recovery_times
+
+
+def bar_rectangle(spec):
+    bar_w = int(spec.width * spec.bar_width)
+    bar_h = max(4, int(round(spec.height * spec.bar_height_1080p / 1080)))
+    bar_x = int(spec.width * spec.bar_center[0] - bar_w / 2)
+    bar_y = int(spec.height * spec.bar_center[1] - bar_h / 2)
+    return bar_x, bar_y, bar_w, bar_h
+
+
+def write_clip(path, spec=ClipSpec()):
+    """Schreibt den Clip nach path und gibt die GroundTruth zurück"""
+    rng = np.random.default_rng(spec.seed)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), spec.fps, (spec.width, spec.height))
+    if not writer.isOpened():
+        raise RuntimeError(f"VideoWriter kann {path} nicht schreiben")
+
+    bar_x, bar_y, bar_w, bar_h = bar_rectangle(spec)
+    fills = fill_curve(spec)
+    background = np.empty((spec.height, spec.width, 3), dtype=np.uint8)
+    noise_shape = (max(1, spec.height // 8), max(1, spec.width // 8), 3)
+
+    map_image = _map_image(spec, rng)
+    for frame, fill in enumerate(fills):
+        t = frame / spec.fps
+        if not hud_visible(spec, t):
+            writer.write(map_image)
+            continue
+        background[:] = (40 + 20 * np.sin(t), 60, 80)
+        if spec.noise:
+            noise = rng.integers(0, spec.noise, noise_shape, dtype=np.uint8)
+            image = cv2.add(background, cv2.resize(noise, (spec.width, spec.height), interpolation=cv2.INTER_NEAREST))
+        else:
+            image = background.copy()
+        cv2.rectangle(image, (bar_x - 2, bar_y - 2), (bar_x + bar_w + 2, bar_y + bar_h + 2), FRAME_COLOR, -1)
+        filled = int(bar_w * fill)
+        if filled > 0:
+            cv2.rectangle(image, (bar_x, bar_y), (bar_x + filled - 1, bar_y + bar_h - 1), BAR_COLOR, -1)
+        writer.write(image)
+    writer.release()
+
+    oos_times, recovery_times = ground_truth(spec, fills)
+    return GroundTruth((bar_x, bar_y, bar_w, bar_h), oos_times, recovery_times, spec.frame_count)
+
+
+def _map_image(spec, rng):
+    """Standbild einer Karte: heller Grund mit gelben Markierungen, auch in der Nähe der Leiste"""
+    image = np.full((spec.height, spec.width, 3), (90, 140, 150), dtype=np.uint8)
+    noise = rng.integers(0, 40, (max(1, spec.height // 16), max(1, spec.width // 16), 3), dtype=np.uint8)
+    image = cv2.add(image, cv2.resize(noise, (spec.width, spec.height), interpolation=cv2.INTER_NEAREST))
+    bar_x, bar_y, bar_w, bar_h = bar_rectangle(spec)
+    for _ in range(12):
+        x = int(rng.integers(bar_x - bar_w // 2, bar_x + bar_w))
+        y = int(rng.integers(bar_y - 6 * bar_h, bar_y + 3 * bar_h))
+        cv2.rectangle(image, (x, y), (x + bar_w // 4, y + bar_h), BAR_COLOR, -1)
+    return image
+
+
+def parse_timestamp(timestamp):
+    """"MM:SS" der Analyzer in Sekunden"""
+    minutes, seconds = timestamp.split(":")
+    return int(minutes) * 60 + int(seconds)
+
+
+def match_events(detected, expected, tolerance=2.0):
+    """
+    Ordnet erkannte Zeitpunkte (Sekunden) den erwarteten zu, jeder höchstens einmal.
+    Gibt (precision, recall, true_positives) zurück.
+    """
+    remaining = sorted(expected)
+    true_positives = 0
+    for time in sorted(detected):
+        match = next((i for i, t in enumerate(remaining) if abs(t - time) <= tolerance), None)
+        if match is not None:
+            remaining.pop(match)
+            true_positives += 1
+    precision = true_positives / len(detected) if detected else (1.0 if not expected else 0.0)
+    recall = true_positives / len(expected) if expected else 1.0
+    return precision, recall, true_positives
+
+
+def rectangle_matches(detected, truth, min_overlap=0.8):
+    """
+    Prüft, ob ein erkanntes Rechteck (x, y, w, h) die Leiste trifft: Es muss mindestens min_overlap der
+    Leistenbreite überdecken, und seine Mitte darf vertikal höchstens eine Leistenhöhe daneben liegen.
+    Die Analyzer schließen oft den Rahmen um die Leiste mit ein, daher kein strenger IoU-Vergleich.
+    """
+    if not detected:
+        return False
+    x, y, w, h = detected
+    bar_x, bar_y, bar_w, bar_h = truth
+    overlap = min(x + w, bar_x + bar_w) - max(x, bar_x)
+    center_offset = abs((y + h / 2) - (bar_y + bar_h / 2))
+    return overlap >= min_overlap * bar_w and center_offset <= bar_h and w <= 1.5 * bar_w
@@ -0,0 +1,46 @@
+import os
+import time
+import numpy as np
+from src import analysisCache
+
+
+def test_extract_video_id_from_common_links():
+    for url in (
+        "https://www.youtube.com/watch?v=dQw4w9WgXcQ",
+        "https://youtube.com/watch?feature=share&v=dQw4w9WgXcQ&t=42",
+        "https://youtu.be/dQw4w9WgXcQ?si=abc",
+        "https://www.youtube.com/shorts/dQw4w9WgXcQ",
+        "https://www.youtube.com/live/dQw4w9WgXcQ",
+    ):
+        assert analysisCache.extract_video_id(url) == "dQw4w9WgXcQ"
+    assert analysisCache.extract_video_id("https://example.com/video.mp4") is None
+
+
+def test_layers_are_keyed_by_their_parameters(tmp_path):
+    cache = analysisCache.AnalysisCache(str(tmp_path))
+    params = {"lower_yellow": np.array([15, 90, 100]), "rectangle": [1, 2, 3, 4]}
+    cache.store("abc", "series", params, {"ratios": np.arange(5, dtype=np.float32)})
+    cache.store("abc", "events", {"low": 0.02}, {"timestamps": ["00:05"]})
+
+    assert np.array_equal(cache.load("abc", "series", params)["ratios"], np.arange(5))
+    assert cache.load("abc", "series", {**params, "rectangle": [1, 2, 3, 5]}) is None
+    assert cache.load("abc", "events", {"low": 0.02}) == {"timestamps": ["00:05"]}
+    assert cache.load("abc", "events", {"low": 0.03}) is None
+
+
+def test_eviction_removes_least_recently_used_entries(tmp_path):
+    cache = analysisCache.AnalysisCache(str(tmp_path), max_bytes=10**9)
+    payload = {"ratios": np.random.default_rng(0).random(4000)}
+    for index, video_id in enumerate(("first", "second", "third")):
+        cache.store(video_id, "series", {}, payload)
+        timestamp = time.time() - 100 + index
+        os.utime(cache._path(video_id, "series", {}), (timestamp, timestamp))
+    cache.load("first", "series", {})  # Zugriff macht "first" zum neuesten Eintrag
+
+    entry_size = os.path.getsize(cache._path("first", "series", {}))
+    cache.max_bytes = 2 * entry_size
+    cache.evict()
+
+    assert cache.load("second", "series", {}) is None
+    assert cache.load("first", "series", {}) is not None
+    assert cache.load("third", "series", {}) is not None
@@ -0,0 +1,101 @@
+import asyncio
+import os
+import time
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+from src import analysisPool
+
+
+def crash_once(marker):
+    """Beendet beim ersten Aufruf den Worker-Prozess hart (wie ein OOM-Kill), danach Ergebnis"""
+    if not os.path.exists(marker):
+        open(marker, "w").close()
+        os._exit(1)
+    return "ok"
+
+
+def crash_always(_):
+    os._exit(1)
+
+
+def test_chunk_is_retried_after_a_worker_crash(tmp_path):
+    pool = analysisPool.AnalysisWorkerPool(max_workers=1, preload=False)
+
+    async def run(fn):
+        async with pool.job() as job:
+            return await job.run(fn, str(tmp_path / "crashed"))
+
+    try:
+        assert asyncio.run(run(crash_once)) == "ok"
+        with pytest.raises(BrokenProcessPool):
+            asyncio.run(run(crash_always))
+    finally:
+        pool.shutdown()
+
+
+def count_frames(frames):
+    return frames
+
+
+def test_worker_stats_count_frames_per_job(tmp_path):
+    pool = analysisPool.AnalysisWorkerPool(max_workers=1, preload=False)
+
+    async def run(frame_counts):
+        async with pool.job() as job:
+            results = await asyncio.gather(*(job.run(count_frames, frames, frames=frames) for frames in frame_counts))
+            return results, job.worker_stats()
+
+    try:
+        results, first = asyncio.run(run([100, 200]))
+        _, second = asyncio.run(run([50]))
+        assert results == [100, 200]
+        (worker,) = first.values()
+        assert worker["tasks"] == 2 and worker["frames"] == 300 and worker["fps"] > 0
+        assert sum(worker["frames"] for worker in second.values()) == 50
+        assert sum(worker["frames"] for worker in pool.worker_stats().values()) == 350
+    finally:
+        pool.shutdown()
+
+
+def slow_value(value):
+    time.sleep(0.5)
+    return value
+
+
+def test_crash_restarts_the_executor_once_for_all_lost_chunks(tmp_path, monkeypatch):
+    pool = analysisPool.AnalysisWorkerPool(max_workers=2, preload=False)
+    starts = []
+    start_executor = pool._start_executor
+    monkeypatch.setattr(pool, "_start_executor", lambda: starts.append(1) or start_executor())
+
+    async def run():
+        async with pool.job() as job:
+            # Der Absturz reißt den parallel laufenden Chunk mit, beide laufen auf dem neuen Executor erneut
+            return await asyncio.gather(job.run(crash_once, str(tmp_path / "crashed")), job.run(slow_value, 7))
+
+    try:
+        assert asyncio.run(run()) == ["ok", 7]
+        assert len(starts) == 2  # erster Start und genau ein Neustart
+    finally:
+        pool.shutdown()
+
+
+def test_failing_chunk_cancels_the_rest_of_the_job(tmp_path):
+    pool = analysisPool.AnalysisWorkerPool(max_workers=1, preload=False)
+    jobs = []
+
+    async def run():
+        async with pool.job() as job:
+            jobs.append(job)
+            await asyncio.gather(job.run(int, "keine Zahl"), *(job.run(slow_value, i) for i in range(5)))
+
+    try:
+        with pytest.raises(ValueError):
+            asyncio.run(run())
+        # Kein zweiter Versuch für normale Fehler, noch wartende Chunks starten gar nicht erst
+        # (einige Chunks hat der Executor schon an die Worker übergeben)
+        (job,) = jobs
+        assert len(job.futures) == 6 and sum(future.cancelled() for future in job.futures) >= 2
+    finally:
+        pool.shutdown()
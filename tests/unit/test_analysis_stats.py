@@ -0,0 +1,47 @@
+import json
+import os
+
+from src import analysisStats
+
+
+def test_phase_histogram_survives_worker_round_trip():
+    worker = analysisStats.AnalysisStats()
+    for seconds in (0.000_5, 0.001, 0.004, 0.004, 0.2):
+        worker.add("decode", seconds)
+    worker.count("frames", 5)
+    worker.add_block(start_frame=0, frames=5, seconds=0.21)
+
+    merged = analysisStats.AnalysisStats()
+    merged.add("decode", 0.003)
+    merged.merge(json.loads(json.dumps(worker.to_dict())))  # wie aus einem Worker-Prozess
+
+    decode = merged.phases["decode"]
+    assert decode.count == 6 and abs(decode.total - 0.2125) < 1e-9
+    assert decode.min == 0.000_5 and decode.max == 0.2
+    assert sum(decode.histogram) == 6
+    assert 0.004 <= decode.percentile(0.5) <= 0.008192
+    assert merged.counters["frames"] == 5 and merged.blocks[0]["frames"] == 5
+    assert merged.summary().startswith("decode: 0.21s (100%)")
+
+
+def test_profiling_only_when_enabled(tmp_path):
+    assert analysisStats.AnalysisStats().profile_text() == ""
+    stats = analysisStats.AnalysisStats(profile=True)
+    with stats.profiling():
+        sorted(range(1000), key=lambda value: -value)
+    assert "sorted" in stats.profile_text()
+    assert stats.dump_profile(str(tmp_path / "analysis.prof"))
+
+
+def test_prune_exports_keeps_newest_with_profiles(tmp_path):
+    for index in range(4):
+        export = tmp_path / f"job-{index}.json"
+        export.write_text("{}")
+        (tmp_path / f"job-{index}.json.analysis.prof").write_text("")
+        os.utime(export, (index, index))
+    (tmp_path / "other.json").write_text("{}")
+
+    assert analysisStats.prune_exports(str(tmp_path), 2) == 2
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        "job-2.json", "job-2.json.analysis.prof", "job-3.json", "job-3.json.analysis.prof", "other.json",
+    ]
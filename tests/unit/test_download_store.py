@@ -0,0 +1,98 @@
+import asyncio
+import os
+import pytest
+from src import downloadStore, staminaJobStore
+
+
+def test_concurrent_requests_share_one_download(tmp_path):
+    store = downloadStore.DownloadStore(str(tmp_path))
+    calls = []
+
+    async def download(path):
+        calls.append(path)
+        await asyncio.sleep(0.05)
+        with open(path, "wb") as f:
+            f.write(b"video")
+
+    async def run():
+        return await asyncio.gather(*(store.fetch("abc", download) for _ in range(3)))
+
+    paths = asyncio.run(run())
+    assert len(calls) == 1
+    assert paths == [store.path("abc")] * 3
+    assert sorted(os.listdir(tmp_path)) == ["abc.mp4"]  # kein temporärer Ordner bleibt zurück
+
+
+def test_failed_download_leaves_no_file(tmp_path):
+    store = downloadStore.DownloadStore(str(tmp_path))
+
+    async def download(path):
+        with open(path, "wb") as f:
+            f.write(b"halb")
+        raise ValueError("PRIVATE_VIDEO")
+
+    with pytest.raises(ValueError):
+        asyncio.run(store.fetch("abc", download))
+    assert os.listdir(tmp_path) == []
+    assert not store._in_use
+
+
+def test_eviction_skips_videos_in_use(tmp_path):
+    store = downloadStore.DownloadStore(str(tmp_path), max_bytes=10)
+
+    def downloader(size):
+        async def download(path):
+            with open(path, "wb") as f:
+                f.write(b"x" * size)
+        return download
+
+    async def run():
+        await store.fetch("old", downloader(8))  # bleibt in Benutzung
+        async with store.use("other", downloader(8)):
+            pass
+        await store.fetch("new", downloader(8))
+
+    asyncio.run(run())
+    assert sorted(os.listdir(tmp_path)) == ["new.mp4", "old.mp4"]
+
+
+def test_ladder_resets_the_job_and_releases_rejected_heights(tmp_path):
+    store = downloadStore.DownloadStore(str(tmp_path / "downloads"))
+    jobs = staminaJobStore.StaminaJobStore(str(tmp_path / "jobs.db"))
+    job_id, _ = jobs.enqueue(1, 10, "url", "abc")
+    jobs.start_attempt(job_id)
+    states_at_download = []
+
+    async def download(path, height):
+        states_at_download.append((height, jobs.get(job_id)["state"]))
+        with open(path, "wb") as f:
+            f.write(b"video")
+
+    async def on_height(height):
+        jobs.set_state(job_id, "downloading")
+
+    async def run():
+        # Wie run_stamina_job: in 720p findet das Training nichts, in 1080p schon
+        async for height, store_key, path in store.ladder("abc", [720, 1080], download, on_height):
+            jobs.set_state(job_id, "training")
+            if height == 1080:
+                return store_key, path
+
+    store_key, path = asyncio.run(run())
+    assert states_at_download == [(720, "downloading"), (1080, "downloading")]
+    assert (store_key, path) == ("abc-1080p", store.path("abc-1080p"))
+    assert dict(store._in_use) == {"abc-1080p": 1}  # 720p ist freigegeben, 1080p bleibt in Benutzung
+
+
+def test_exhausted_ladder_leaves_nothing_in_use(tmp_path):
+    store = downloadStore.DownloadStore(str(tmp_path))
+
+    async def download(path, height):
+        with open(path, "wb") as f:
+            f.write(b"video")
+
+    async def run():
+        return [height async for height, _, _ in store.ladder("abc", [720, 1080], download)]
+
+    assert asyncio.run(run()) == [720, 1080]
+    assert not store._in_use
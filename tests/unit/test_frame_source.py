@@ -0,0 +1,111 @@
+import cv2
+import numpy as np
+import pytest
+import subprocess
+import threading
+import time
+import frameSource
+
+
+@pytest.fixture
+def small_video(tmp_path):
+    path = str(tmp_path / "clip.avi")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 30, (64, 48))
+    for i in range(12):
+        frame = np.full((48, 64, 3), i * 20, dtype=np.uint8)
+        writer.write(frame)
+    writer.release()
+    return path
+
+
+def read_all(source):
+    frames = []
+    out = np.empty(source.frame_shape, dtype=np.uint8)
+    while source.read_into(out):
+        frames.append(out.copy())
+    source.release()
+    return frames
+
+
+def test_opencv_source_crops_and_seeks(small_video):
+    source = frameSource.open_frame_source(small_video, crop=(60, 40, 10, 10), start_frame=4, backend="opencv")
+    assert source.frame_shape == (8, 4, 3)  # auf die Framegröße begrenzt
+    frames = read_all(source)
+    assert len(frames) == 8
+
+
+@pytest.mark.skipif(not frameSource.ffmpeg_available(), reason="ffmpeg nicht installiert")
+def test_ffmpeg_source_matches_opencv(small_video):
+    crop = (8, 8, 32, 16)
+    expected = read_all(frameSource.open_frame_source(small_video, crop=crop, backend="opencv"))
+    frames = read_all(frameSource.open_frame_source(small_video, crop=crop, backend="ffmpeg"))
+    assert len(frames) == len(expected)
+    for frame, reference in zip(frames, expected):
+        assert np.abs(frame.astype(int) - reference.astype(int)).max() <= 8
+
+
+@pytest.mark.skipif(not frameSource.ffmpeg_available(), reason="ffmpeg nicht installiert")
+def test_ffmpeg_source_reports_errors(tmp_path):
+    broken = tmp_path / "broken.avi"
+    broken.write_bytes(b"kein Video")
+    info = {"frame_count": 10, "width": 64, "height": 48, "fps": 30.0}
+    source = frameSource.FFmpegFrameSource(str(broken), crop=(0, 0, 32, 16), info=info)
+    with pytest.raises(RuntimeError, match="ffmpeg beendet"):
+        source.read()
+    source.release()
+
+
+@pytest.fixture
+def fragmented_video(small_video, tmp_path):
+    """Wie small_video, aber als fragmentiertes MP4, das sich ohne Zurückspulen lesen lässt (wie YouTube-DASH)"""
+    path = str(tmp_path / "clip.mp4")
+    subprocess.run(["ffmpeg", "-v", "error", "-i", small_video, "-c:v", "mpeg4", "-q:v", "2", "-g", "4",
+                    "-movflags", "frag_keyframe+empty_moov", path], check=True)
+    return path
+
+
+def grow_file(source_path, part_path, done, chunk_size=512, pause=0.05):
+    """Schreibt die Datei stückweise mit Pausen länger als das Abfrageintervall, wie ein laufender Download"""
+    with open(source_path, "rb") as src, open(part_path, "wb") as dst:
+        while chunk := src.read(chunk_size):
+            dst.write(chunk)
+            dst.flush()
+            time.sleep(pause)
+    done.set()
+
+
+@pytest.mark.skipif(not frameSource.ffmpeg_available(), reason="ffmpeg nicht installiert")
+def test_growing_file_source_waits_for_the_download_to_finish(fragmented_video, tmp_path):
+    crop = (8, 8, 32, 16)
+    info = frameSource.probe_video(fragmented_video)
+    expected = read_all(frameSource.FFmpegFrameSource(fragmented_video, crop=crop, info=info))
+    part_path = str(tmp_path / "download.mp4.part")
+    done = threading.Event()
+    writer = threading.Thread(target=grow_file, args=(fragmented_video, part_path, done))
+
+    # Die Quelle startet vor dem Download und darf an einem vorläufigen Dateiende nicht aufhören
+    source = frameSource.GrowingFileFrameSource(part_path, done.is_set, info, crop=crop, poll_interval=0.01)
+    writer.start()
+    frames = read_all(source)
+    writer.join()
+
+    assert len(frames) == len(expected) == 12
+    assert all(np.array_equal(frame, reference) for frame, reference in zip(frames, expected))
+
+
+@pytest.mark.skipif(not frameSource.ffmpeg_available(), reason="ffmpeg nicht installiert")
+def test_growing_file_source_reads_a_download_that_was_already_renamed(fragmented_video, tmp_path):
+    info = frameSource.probe_video(fragmented_video)
+    source = frameSource.GrowingFileFrameSource(str(tmp_path / "missing.part"), lambda: True, info,
+                                                crop=(0, 0, 16, 16), final_path=fragmented_video)
+    assert len(read_all(source)) == 12
+
+
+@pytest.mark.skipif(not frameSource.ffmpeg_available(), reason="ffmpeg nicht installiert")
+def test_growing_file_source_stops_when_released_mid_download(fragmented_video, tmp_path):
+    info = frameSource.probe_video(fragmented_video)
+    part_path = tmp_path / "download.mp4.part"
+    part_path.write_bytes(open(fragmented_video, "rb").read()[:100])
+    source = frameSource.GrowingFileFrameSource(str(part_path), lambda: False, info, crop=(0, 0, 16, 16))
+    source.release()
+    assert source.feeder is None and not source.isOpened()
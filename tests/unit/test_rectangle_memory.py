@@ -0,0 +1,43 @@
+import asyncio
+from types import SimpleNamespace
+import numpy as np
+from src import rectangleMemory
+
+
+def analyzer(width, height, lower=(20, 70, 80), upper=(60, 255, 255)):
+    return SimpleNamespace(frame_width=width, frame_height=height,
+                           lower_yellow=np.array(lower, dtype=np.uint8), upper_yellow=np.array(upper, dtype=np.uint8))
+
+
+def test_rectangles_are_remembered_per_player_and_resolution(tmp_path):
+    memory = rectangleMemory.RectangleMemory(str(tmp_path / "rectangles.json"))
+    hd = analyzer(1920, 1080, lower=(22, 90, 100))
+
+    async def run():
+        await memory.remember(1, hd, (845, 945, 230, 10), confirmed=False)
+        return [
+            await memory.recall(1, hd),
+            await memory.recall(1, analyzer(1280, 720)),
+            await memory.recall(2, hd),
+        ]
+
+    remembered, other_resolution, other_player = asyncio.run(run())
+    assert remembered["rectangle"] == [845, 945, 230, 10]
+    assert remembered["lower_yellow"] == [22, 90, 100] and remembered["upper_yellow"] == [60, 255, 255]
+    assert other_resolution is None and other_player is None
+
+    # Eine neue Instanz (Neustart des Bots) liest dieselbe Datei
+    assert asyncio.run(rectangleMemory.RectangleMemory(str(tmp_path / "rectangles.json")).recall(1, hd)) == remembered
+
+
+def test_hits_count_confirmations_and_reset_after_training(tmp_path):
+    memory = rectangleMemory.RectangleMemory(str(tmp_path / "rectangles.json"))
+    hd = analyzer(1920, 1080)
+
+    async def hits_after(*confirmations):
+        for confirmed in confirmations:
+            await memory.remember(1, hd, (845, 945, 230, 10), confirmed)
+        return (await memory.recall(1, hd))["hits"]
+
+    assert asyncio.run(hits_after(False, True, True)) == 2
+    assert asyncio.run(hits_after(False)) == 0  # neu trainiert, weil das gemerkte Rechteck nicht mehr passte
@@ -0,0 +1,28 @@
+from src import rectangleTraining
+
+
+def test_sample_positions_spread_coarse_to_fine():
+    positions = rectangleTraining.sample_positions(100, 900, 8)
+    assert sorted(positions) == [150, 250, 350, 450, 550, 650, 750, 850]
+    # Schon die ersten Stichproben decken Anfang, Mitte und Ende ab
+    assert positions[:2] == [150, 550]
+    assert max(positions[:4]) - min(positions[:4]) >= 600
+
+    snapped = rectangleTraining.sample_positions(0, 1000, 20, keyframes=[0, 240, 480, 720, 960])
+    assert sorted(snapped) == [0, 240, 480, 720, 960]
+
+
+def test_convergence_needs_a_stable_leader():
+    tracker = rectangleTraining.ConvergenceTracker(min_samples=5, window=3, min_count=2)
+    for count, best in enumerate(["a", "b", "a", "a"], start=1):
+        tracker.update(best, 0.5, count)
+    assert not tracker.converged
+    tracker.update("a", 0.52, 5)
+    tracker.update("a", 0.51, 6, score=None)
+    assert tracker.converged
+
+    unstable = rectangleTraining.ConvergenceTracker(min_samples=1, window=3, min_count=1)
+    for share in (0.3, 0.5, 0.7):
+        unstable.update("a", share, 10)
+    assert not unstable.converged
+    assert rectangleTraining.ConvergenceTracker(time_budget=0).expired
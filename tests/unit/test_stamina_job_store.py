@@ -0,0 +1,37 @@
+from src import staminaJobStore
+
+
+def test_enqueue_is_idempotent_per_user_and_video(tmp_path):
+    store = staminaJobStore.StaminaJobStore(str(tmp_path / "jobs.db"))
+    job_id, created = store.enqueue(1, 10, "https://youtu.be/abcdefghijk", "abcdefghijk")
+    assert created
+    assert store.enqueue(1, 10, "https://youtu.be/abcdefghijk", "abcdefghijk") == (job_id, False)
+    assert store.enqueue(2, 10, "https://youtu.be/abcdefghijk", "abcdefghijk")[1]
+
+    assert store.start_attempt(job_id)
+    assert store.finish(job_id, {"timestamps": ["00:21"]})
+    assert not store.fail(job_id, "zu spät")  # abgeschlossene Aufträge bleiben unverändert
+    job = store.get(job_id)
+    assert (job["state"], job["attempts"], job["result"]) == ("done", 1, {"timestamps": ["00:21"]})
+    assert store.enqueue(1, 10, "https://youtu.be/abcdefghijk", "abcdefghijk")[1]
+
+
+def test_recover_requeues_interrupted_jobs(tmp_path):
+    db_path = str(tmp_path / "jobs.db")
+    store = staminaJobStore.StaminaJobStore(db_path)
+    interrupted, _ = store.enqueue(1, 10, "url-a", "a")
+    crashing, _ = store.enqueue(1, 10, "url-b", "b")
+    waiting, _ = store.enqueue(2, 10, "url-c", "c")
+    store.start_attempt(interrupted)
+    store.set_state(interrupted, "analyzing")
+    for _ in range(3):
+        store.start_attempt(crashing)
+        _, given_up = store.recover(max_attempts=3)
+    assert [job["id"] for job in given_up] == [crashing]
+    assert store.get(crashing)["state"] == "failed"
+
+    # Neuer Start: der unterbrochene Auftrag läuft vor dem noch wartenden weiter
+    resumable, given_up = staminaJobStore.StaminaJobStore(db_path).recover(max_attempts=3)
+    assert [job["id"] for job in resumable] == [interrupted, waiting]
+    assert given_up == []
+    assert store.get(interrupted)["attempts"] == 1
@@ -0,0 +1,80 @@
+import asyncio
+import os
+import pytest
+from src import staminaScheduler
+
+
+def test_fair_order_interleaves_users(tmp_path):
+    async def run():
+        scheduler = staminaScheduler.StaminaScheduler(1, 1, max_jobs=1, output_root=str(tmp_path))
+        first = scheduler.submit("a")
+        queued = [scheduler.submit(user) for user in ["a", "a", "b", "c"]]
+        order = [job.user_id for job in scheduler.jobs() if job.state == "queued"]
+        assert first.state == "running"
+        assert order == ["b", "c", "a", "a"]
+        assert [job.position for job in queued] == [3, 4, 1, 2]
+        scheduler.cancel_user("a")
+        assert scheduler.queue_length == 2
+
+    asyncio.run(run())
+
+
+def test_jobs_run_concurrently_with_own_output_dirs(tmp_path):
+    async def run():
+        scheduler = staminaScheduler.StaminaScheduler(1, 1, max_jobs=2, output_root=str(tmp_path))
+        positions = []
+
+        async def on_position(position):
+            positions.append(position)
+
+        jobs = [scheduler.submit(user, on_position) for user in ["a", "b", "c"]]
+        active = []
+
+        async def work(job):
+            async with job:
+                assert os.path.isdir(job.output_dir)
+                active.append(job.id)
+                await asyncio.sleep(0.02)
+                assert len(active) <= 2
+                active.remove(job.id)
+
+        await asyncio.gather(*(work(job) for job in jobs))
+        await asyncio.sleep(0)
+        assert positions == [1]  # nur der dritte Auftrag musste warten
+        assert all(job.state == "done" for job in jobs)
+        assert os.listdir(tmp_path) == []
+
+    asyncio.run(run())
+
+
+def test_cancel_running_and_queued_jobs(tmp_path):
+    async def run():
+        scheduler = staminaScheduler.StaminaScheduler(1, 1, max_jobs=1, output_root=str(tmp_path))
+        running, waiting = scheduler.submit("a"), scheduler.submit("b")
+
+        async def work(job):
+            async with job:
+                await asyncio.sleep(10)
+
+        tasks = [asyncio.ensure_future(work(job)) for job in (running, waiting)]
+        await asyncio.sleep(0.01)
+        assert scheduler.cancel(waiting)
+        assert scheduler.cancel(running)
+        for task in tasks:
+            with pytest.raises(asyncio.CancelledError):
+                await task
+        assert (running.state, waiting.state) == ("cancelled", "cancelled")
+        assert scheduler.running_count == 0 and scheduler.queue_length == 0
+
+    asyncio.run(run())
+
+
+def test_available_memory_counts_page_cache(tmp_path):
+    meminfo = tmp_path / "meminfo"
+    meminfo.write_text("MemTotal:       16384000 kB\nMemFree:          512000 kB\nMemAvailable:   8192000 kB\n")
+    assert staminaScheduler._available_memory(str(meminfo)) == 8192000 * 1024
+
+    # Ohne /proc/meminfo zählt ein fester Anteil des gesamten Speichers
+    total = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    memory = staminaScheduler._available_memory(str(tmp_path / "missing"))
+    assert memory == int(total * staminaScheduler.FALLBACK_MEMORY_FRACTION)
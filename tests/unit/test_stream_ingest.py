@@ -0,0 +1,65 @@
+import asyncio
+import subprocess
+import threading
+import time
+import cv2
+import numpy as np
+import pytest
+import frameSource
+import streamIngest
+from src import videoAnalyzer
+
+pytestmark = pytest.mark.skipif(not frameSource.ffmpeg_available(), reason="ffmpeg nicht installiert")
+
+
+def write_download(path, tmp_path, frame_count=150, width=640, height=360):
+    """Clip mit wechselnd voller und leerer Leiste als fragmentiertes MP4 (wie YouTube-DASH)"""
+    raw_path = str(tmp_path / "raw.avi")
+    writer = cv2.VideoWriter(raw_path, cv2.VideoWriter_fourcc(*"MJPG"), 30, (width, height))
+    for i in range(frame_count):
+        frame = np.full((height, width, 3), 40, dtype=np.uint8)
+        fill = 1.0 if (i // 30) % 2 == 0 else 0.05
+        frame[320:326, 256:256 + int(128 * fill)] = (20, 200, 230)
+        writer.write(frame)
+    writer.release()
+    subprocess.run(["ffmpeg", "-v", "error", "-i", raw_path, "-c:v", "mpeg4", "-q:v", "2", "-g", "30",
+                    "-movflags", "frag_keyframe+empty_moov", str(path)], check=True)
+
+
+def test_analysis_follows_a_running_download(tmp_path):
+    finished_path = tmp_path / "finished.mp4"
+    write_download(finished_path, tmp_path)
+    info = frameSource.probe_video(str(finished_path))
+    expected = asyncio.run(videoAnalyzer.VideoAnalyzer(str(finished_path), output_dir=str(tmp_path))
+                           .analyze_single_pass(40))
+
+    video_path = str(tmp_path / "video.mp4")
+    done = threading.Event()
+
+    def download():
+        # Stückweise in die .part-Datei schreiben und am Ende umbenennen, wie yt-dlp
+        with open(finished_path, "rb") as src, open(video_path + ".part", "wb") as dst:
+            while chunk := src.read(1024):
+                dst.write(chunk)
+                dst.flush()
+                time.sleep(0.02)
+        subprocess.run(["mv", video_path + ".part", video_path], check=True)
+        done.set()
+
+    progress = []
+
+    async def on_progress(frames, total):
+        progress.append((frames, done.is_set()))
+
+    async def run():
+        download_task = asyncio.create_task(asyncio.to_thread(download))
+        result = await streamIngest.analyze_download(video_path, done.is_set, info, 40, output_dir=str(tmp_path),
+                                                     progress_callback=on_progress)
+        await download_task
+        return result
+
+    _, stable_rectangle, timestamps = asyncio.run(run())
+
+    assert (stable_rectangle, timestamps) == expected and len(timestamps) >= 4
+    # Das Training war fertig, bevor der Download endete
+    assert progress[0] == (40, False)
@@ -0,0 +1,245 @@
+import asyncio
+import threading
+import pytest
+import numpy as np
+import cv2
+from src import videoAnalyzer
+
+LOWER_YELLOW = np.array([15, 70, 80])
+UPPER_YELLOW = np.array([60, 255, 255])
+SECONDARY_LOWER_YELLOW = np.array([10, 30, 40])
+SECONDARY_UPPER_YELLOW = np.array([40, 255, 255])
+
+
+def reference_mask(frame):
+    """Einzelframe-Pipeline wie vor der Batch-Verarbeitung"""
+    hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
+    primary_mask = cv2.inRange(hsv, LOWER_YELLOW, UPPER_YELLOW)
+    secondary_mask = cv2.inRange(hsv, SECONDARY_LOWER_YELLOW, SECONDARY_UPPER_YELLOW)
+    combined_mask = cv2.bitwise_or(primary_mask, secondary_mask)
+    kernel = np.ones((3, 3), np.uint8)
+    combined_mask = cv2.morphologyEx(combined_mask, cv2.MORPH_OPEN, kernel)
+    return cv2.morphologyEx(combined_mask, cv2.MORPH_CLOSE, kernel)
+
+
+def test_batch_masks_match_single_frame_pipeline():
+    rng = np.random.default_rng(0)
+    batch = rng.integers(0, 256, (16, 8, 120, 3), dtype=np.uint8)
+    batch[::2, 2:6, :80] = (20, 200, 230)  # gefüllte Stamina-Leiste in jedem zweiten Frame
+
+    yellow_pixels, ratios, masks = videoAnalyzer.compute_yellow_ratios(
+        batch, LOWER_YELLOW, UPPER_YELLOW, SECONDARY_LOWER_YELLOW, SECONDARY_UPPER_YELLOW
+    )
+
+    expected = np.stack([reference_mask(frame) for frame in batch])
+    assert np.array_equal(masks, expected)
+    assert yellow_pixels.tolist() == [np.count_nonzero(mask) for mask in expected]
+    assert np.allclose(ratios, yellow_pixels / (8 * 120))
+
+
+def test_row_cleanup_filters_short_runs_per_row():
+    masks = np.zeros((2, 4, 20), dtype=np.uint8)
+    masks[0, 1, 2:4] = 255  # Lauf von 2 Pixeln: Rauschen
+    masks[0, 2, 5:15] = 255
+    masks[0, 2, 9:11] = 0  # Lücke von 2 Pixeln in der Leiste
+    masks[1, :, :12] = 255
+
+    cleaned = videoAnalyzer._open_close_rows(masks.copy())
+    assert not cleaned[0, 1].any()
+    assert cleaned[0, 2].tolist() == [0] * 5 + [255] * 10 + [0] * 5
+    assert np.array_equal(cleaned[1], masks[1])  # Zeilen bleiben getrennt, auch über Frame-Grenzen
+
+    fill = np.concatenate([np.ones(400), np.zeros(60), np.ones(100)])
+    batch = np.zeros((len(fill), 8, 120, 3), dtype=np.uint8)
+    batch[fill > 0, 2:6, :80] = (20, 200, 230)
+    series = {
+        cleanup: videoAnalyzer.compute_yellow_ratios(
+            batch, LOWER_YELLOW, UPPER_YELLOW, SECONDARY_LOWER_YELLOW, SECONDARY_UPPER_YELLOW, cleanup=cleanup
+        )[0]
+        for cleanup in videoAnalyzer.MASK_CLEANUP_MODES
+    }
+    assert np.array_equal(series["rows"], series["morphology"])
+
+
+def test_fill_levels_follow_the_bar_edge():
+    masks = np.zeros((4, 6, 100), dtype=np.uint8)
+    masks[0] = 255
+    masks[1, :, 2:40] = 255  # dunkler Rahmen links
+    masks[1, :2, 40] = 255  # zu einem Drittel gefüllte Kantenspalte
+    masks[1, :, 90:92] = 255  # gelber Fleck weit rechts der Kante
+    masks[2, :, 10:30] = 255  # Lücke am Anfang: keine zusammenhängende Leiste
+    masks[3, :, :60] = 255
+    masks[3, :, 30:33] = 0  # kurze Lücke in der Leiste
+
+    levels = videoAnalyzer.compute_fill_levels(masks)
+    assert levels[0] == 1.0
+    assert abs(levels[1] - (40 + 1 / 3) / 100) < 1e-9
+    assert levels[2] == 0.0
+    assert abs(levels[3] - 0.6) < 1e-9
+
+    fill = np.concatenate([np.ones(400), np.linspace(1, 0, 60), np.zeros(40), np.linspace(0, 1, 60), np.ones(100)])
+    batch = np.zeros((len(fill), 8, 120, 3), dtype=np.uint8)
+    for i, value in enumerate(fill):
+        batch[i, 1:7, :int(value * 120)] = (20, 200, 230)
+    yellow_pixels, ratios, _ = videoAnalyzer.compute_yellow_ratios(
+        batch, LOWER_YELLOW, UPPER_YELLOW, SECONDARY_LOWER_YELLOW, SECONDARY_UPPER_YELLOW, estimator="columns"
+    )
+    assert np.abs(ratios - np.floor(fill * 120) / 120).max() < 0.02
+    events = videoAnalyzer.detect_stamina_events(yellow_pixels, 0, len(fill), 8 * 120, estimator="columns")
+    assert [is_empty for _, is_empty in events] == [True, False]
+    assert 440 <= events[0][0] <= 470
+
+
+def test_state_machine_detects_empty_and_recovery():
+    total_pixels = 1000
+    series = [900] * 400 + [0] * 60 + [900] * 100
+    events = videoAnalyzer.detect_stamina_events(series, 0, len(series), total_pixels)
+
+    assert [is_empty for _, is_empty in events] == [True, False]
+    assert 400 <= events[0][0] < 415
+    assert 460 <= events[1][0] < 470
+
+
+def test_chunk_plan_aligns_to_keyframes_and_covers_video():
+    keyframes = list(range(0, 1000, 90))
+    plans = videoAnalyzer.plan_chunks(1000, 4, keyframes, warmup_frames=200)
+
+    assert plans[0].start_frame == 0 and plans[-1].end_frame == 1000
+    for previous, plan in zip(plans, plans[1:]):
+        assert previous.end_frame == plan.start_frame
+        assert plan.start_frame in keyframes and plan.decode_start in keyframes
+        assert plan.start_frame - plan.decode_start >= 200
+
+
+def test_chunked_events_match_a_single_pass():
+    rng = np.random.default_rng(4)
+    total_pixels = 1000
+    # Voll bis 900 Pixel am Anfang, später nur noch bis 500: eine Kalibrierung pro Chunk hätte andere Schwellen
+    series = []
+    while len(series) < 6000:
+        level = 900 if len(series) < 1500 else 500
+        series += [level] * int(rng.integers(80, 200)) + [int(rng.integers(0, 40))] * int(rng.integers(10, 60))
+    series = np.array(series[:6000]) + rng.integers(0, 20, 6000)
+
+    expected = videoAnalyzer.detect_stamina_events(series, 0, len(series), total_pixels)
+    calibration_frames = min(300, len(series) // 4)
+    calibration = videoAnalyzer.calibrate_series(series, calibration_frames, total_pixels)
+    chunk_events = []
+    for plan in videoAnalyzer.plan_chunks(len(series), 6, warmup_frames=30, calibration_frames=calibration_frames):
+        state = videoAnalyzer.StaminaStateMachine.for_chunk(plan.decode_start, plan.end_frame, total_pixels,
+                                                            calibration_frames=calibration_frames,
+                                                            calibration=calibration)
+        events = videoAnalyzer.detect_stamina_events(series[plan.decode_start:plan.end_frame], plan.decode_start,
+                                                     plan.end_frame, total_pixels, state)
+        chunk_events.append([event for event in events if event[0] >= plan.start_frame])
+
+    assert videoAnalyzer.merge_chunk_events(chunk_events) == expected and len(expected) > 40
+
+
+def test_merge_chunk_events_is_order_independent():
+    chunks = [[(10, True), (50, False)], [(50, False), (120, False), (200, True)], [(300, False)]]
+    expected = [(10, True), (50, False), (200, True), (300, False)]
+
+    assert videoAnalyzer.merge_chunk_events(chunks) == expected
+    assert videoAnalyzer.merge_chunk_events(chunks[::-1]) == expected
+
+
+def test_hsv_range_filters_outliers_on_arrays():
+    analyzer = object.__new__(videoAnalyzer.VideoAnalyzer)
+    analyzer.debug = False
+    analyzer.color_sample_budget = 1000
+    rng = np.random.default_rng(1)
+    bar = np.column_stack([rng.integers(28, 33, 5000), rng.integers(180, 220, 5000), rng.integers(200, 250, 5000)])
+    noise = np.tile([120, 20, 30], (50, 1))  # wenige fremde Pixel (z.B. HUD-Text) als Ausreißer
+    samples = analyzer._merge_color_samples([bar.astype(np.uint8), noise.astype(np.uint8)])
+    assert samples.dtype == np.uint8 and len(samples) <= 1000
+
+    lower, upper = analyzer._calculate_hsv_range(samples)
+    assert lower[0] >= 20 and upper[0] <= 60  # Ausreißer bei H=120 verschieben den Bereich nicht
+    assert np.array_equal(lower, analyzer._calculate_hsv_range(samples.tolist())[0])
+    assert analyzer._calculate_hsv_range(np.empty((0, 3), dtype=np.uint8))[0].tolist() == [20, 70, 80]
+
+
+def write_bar_clip(path, frame_count=90, width=640, height=360):
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"mp4v"), 30, (width, height))
+    for i in range(frame_count):
+        frame = np.full((height, width, 3), 40, dtype=np.uint8)
+        fill = 1.0 if (i // 30) % 2 == 0 else 0.05
+        frame[320:326, 256:256 + int(128 * fill)] = (20, 200, 230)
+        writer.write(frame)
+    writer.release()
+
+
+def test_single_pass_refuses_a_truncated_training_window(tmp_path):
+    video_path = tmp_path / "clip.mp4"
+    write_bar_clip(video_path)
+    analyzer = videoAnalyzer.VideoAnalyzer(str(video_path), output_dir=str(tmp_path))
+    analyzer.output_dir_debug = str(tmp_path)
+    analyzer.single_pass_cache_bytes = 10 * 1024
+
+    with pytest.raises(ValueError, match="single_pass_cache_bytes"):
+        asyncio.run(analyzer.analyze_single_pass(60))
+
+
+def test_single_pass_decodes_the_video_once(tmp_path, monkeypatch):
+    video_path = tmp_path / "clip.mp4"
+    write_bar_clip(video_path)
+    analyzer = videoAnalyzer.VideoAnalyzer(str(video_path), output_dir=str(tmp_path))
+    analyzer.output_dir_debug = str(tmp_path)
+    analyzer.frame_batch_size = 16
+    opened = []
+    open_frame_source = videoAnalyzer.open_frame_source
+    monkeypatch.setattr(videoAnalyzer, "open_frame_source",
+                        lambda *args, **kwargs: opened.append(kwargs) or open_frame_source(*args, **kwargs))
+    progress = []
+
+    async def on_progress(done, total):
+        progress.append(done)
+
+    asyncio.run(analyzer.analyze_single_pass(20, progress_callback=on_progress))
+
+    assert len(opened) == 1
+    # Nach den 20 gecachten Frames läuft die Analyse über dieselbe Quelle bis zum Ende weiter
+    assert 20 < progress[-2] <= progress[-1] == analyzer.frame_count == 90
+
+
+class ThreadRecordingSource:
+    """Frame-Quelle, die sich merkt, in welchem Thread gelesen wurde"""
+    crop = None
+
+    def __init__(self, frame_count):
+        self.remaining = frame_count
+        self.read_threads = []
+
+    def isOpened(self):
+        return True
+
+    def read(self):
+        self.read_threads.append(threading.current_thread())
+        if self.remaining == 0:
+            return False, None
+        self.remaining -= 1
+        return True, np.full((180, 320, 3), 40, dtype=np.uint8)
+
+
+def test_detection_reads_frame_blocks_off_the_event_loop(tmp_path, monkeypatch):
+    analyzer = videoAnalyzer.VideoAnalyzer(str(tmp_path / "clip.mp4"), output_dir=str(tmp_path),
+                                           video_info={"frame_count": 40, "width": 320, "height": 180, "fps": 30})
+    analyzer.thread_batch_size = 16
+    hops = []
+    to_thread = asyncio.to_thread
+
+    async def counting_to_thread(function, *args, **kwargs):
+        hops.append(function)
+        return await to_thread(function, *args, **kwargs)
+
+    async def detect(source):
+        return [item async for item in analyzer._detect_in_blocks(source, (0, 0, 320, 180), 0, 40)]
+
+    monkeypatch.setattr(asyncio, "to_thread", counting_to_thread)
+    source = ThreadRecordingSource(40)
+    frames = asyncio.run(detect(source))
+
+    assert [frame_number for frame_number, _, _ in frames] == list(range(1, 41))
+    assert len(source.read_threads) == 40 and threading.main_thread() not in source.read_threads
+    assert len(hops) == 3  # 16 + 16 + 8 Frames pro Thread-Aufruf
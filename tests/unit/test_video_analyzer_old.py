@@ -0,0 +1,341 @@
+import asyncio
+import sys
+import threading
+import types
+
+import cv2
+import numpy as np
+from src import videoAnalyzerOld
+from src.analysisStats import AnalysisStats
+
+
+def test_stamina_series_grows_and_round_trips():
+    series = videoAnalyzerOld.StaminaSeries(fps=30, capacity=2)
+    for frame in range(5):
+        series.append(frame / 10, (30, 200, 220), frame % 2 == 0)
+
+    assert len(series) == 5
+    assert series.ratios.dtype == np.float32
+    assert np.allclose(series.times, np.arange(1, 6) / 30)
+    restored = videoAnalyzerOld.StaminaSeries.from_arrays(series.to_arrays(), fps=30)
+    assert np.array_equal(restored.bar_matches, [True, False, True, False, True])
+    assert np.array_equal(restored.hsv, series.hsv)
+
+
+def test_minmax_decimate_keeps_short_dips():
+    ratios = np.full(100_000, 0.6, dtype=np.float32)
+    ratios[54_321] = 0.0  # ein einzelner OOS-Frame
+
+    indices = videoAnalyzerOld.minmax_decimate(ratios, 500)
+    assert len(indices) <= 1000
+    assert 54_321 in indices
+    assert np.all(np.diff(indices) > 0)
+    assert len(videoAnalyzerOld.minmax_decimate(ratios[:50], 500)) == 50
+
+
+def test_bar_check_only_where_the_detector_reads_it():
+    rng = np.random.default_rng(3)
+    ratios = rng.choice([0.0, 0.01, 0.05, 0.5], size=2000).tolist()
+    bar_visible = (rng.random(2000) > 0.3).tolist()
+
+    full = videoAnalyzerOld.OOSDetector(0.08, 0.02)
+    expected = [full.update(ratio, matched) for ratio, matched in zip(ratios, bar_visible)]
+
+    # Ohne Prüfung wird ein veraltetes (falsches) Ergebnis übergeben, das darf nichts ändern
+    lazy = videoAnalyzerOld.OOSDetector(0.08, 0.02)
+    events = [
+        lazy.update(ratio, matched if lazy.needs_bar(ratio) else not matched)
+        for ratio, matched in zip(ratios, bar_visible)
+    ]
+    assert events == expected and any(events)
+
+
+def test_hud_gate_learns_the_bar_frame_independent_of_fill():
+    rng = np.random.default_rng(5)
+    rectangle = (20, 40, 100, 10)
+
+    def frame(fill, hud=True):
+        image = rng.integers(0, 255, (80, 160, 3), dtype=np.uint8)  # Spielwelt bzw. Karte
+        if hud:
+            image[40:50, 20:120] = 30  # dunkler Rahmen samt leerer Leiste
+            image[41:49, 21:21 + int(98 * fill)] = (20, 200, 230)
+        return image
+
+    gate = videoAnalyzerOld.HudGate(rectangle, reference_frames=4)
+    assert gate.present(gate.signature(frame(0.0, hud=False)))  # ohne Referenz wird nichts übersprungen
+    for fill in (1.0, 0.8, 0.5, 0.9):
+        gate.learn(gate.signature(frame(fill)))
+    assert gate.ready
+
+    assert all(gate.present(gate.signature(frame(fill))) for fill in (0.0, 0.3, 1.0))
+    assert not any(gate.present(gate.signature(frame(1.0, hud=False))) for _ in range(5))
+
+
+class FakeCapture:
+    """Liefert vorgegebene Frames wie cv2.VideoCapture"""
+    def __init__(self, frames):
+        self.frames = iter(frames)
+
+    def read(self):
+        frame = next(self.frames, None)
+        return frame is not None, frame
+
+    def grab(self):
+        return self.read()[0]
+
+
+def test_chunked_series_replays_to_the_sequential_events():
+    rng = np.random.default_rng(11)
+    frame_count = 3000
+    ratios = rng.choice([0.0, 0.01, 0.05, 0.5], size=frame_count, p=[0.05, 0.05, 0.1, 0.8])
+    bar_visible = rng.random(frame_count) > 0.2
+    # Abschnitt 2 beginnt scharfgeschaltet mit verdeckter Leiste, der OOS-Moment folgt ohne neuen hohen Wert
+    ratios[990:1000], bar_visible[990:1000] = 0.5, True
+    ratios[1000:1006], bar_visible[1000] = 0.05, False
+    ratios[1006], bar_visible[1001:1007] = 0.0, True
+    # Kanal 0 trägt den Gelbanteil, Kanal 1 ob die Leiste zu sehen ist
+    frames = [np.array([[[ratio, visible]]]) for ratio, visible in zip(ratios, bar_visible)]
+    analyzer = types.SimpleNamespace(
+        high_yellow_threshold=0.08, low_yellow_threshold=0.02, bar_check_interval=15,
+        hud_gate=False, hud_skip_frames=15, frame_batch_size=64,
+        _yellow_stats=lambda rect, w, h, stats: (float(rect[0, 0, 0]), (0, 0, 0)),
+        _calculate_roi=lambda frame: (0, 0, 1, 1),
+        _find_contours=lambda roi, stats: roi,
+        _match_bar=lambda roi, x1, y1, rectangle: rectangle if roi[0, 0, 1] else None,
+    )
+
+    def scan(start, end, armed_states, on_oos=None):
+        series = videoAnalyzerOld.StaminaSeries(30)
+        scanner = videoAnalyzerOld.SeriesScanner(analyzer, FakeCapture(frames[start:end]), (0, 0, 1, 1), series,
+                                                 AnalysisStats(), frame_number=start, end_frame=end,
+                                                 armed_states=armed_states)
+        scanner.on_oos = on_oos
+        while scanner.scan_block():
+            pass
+        return series
+
+    expected = []
+    scan(0, frame_count, (False,), lambda frame, frame_number, *_: expected.append(frame_number))
+    chunks = [scan(start, end, (False, True) if start else (False,))
+              for start, end in ((0, 1000), (1000, 1800), (1800, frame_count))]
+
+    detector = videoAnalyzerOld.OOSDetector(0.08, 0.02)
+    ratios = np.concatenate([chunk.ratios for chunk in chunks])
+    bar_matches = np.concatenate([chunk.bar_matches for chunk in chunks])
+    replayed = [index + 1 for index, (ratio, matched) in enumerate(zip(ratios.tolist(), bar_matches.tolist()))
+                if detector.update(ratio, matched)]
+    assert len(ratios) == frame_count
+    assert replayed == expected and len(expected) > 10
+
+
+def test_hud_gate_relearns_a_reference_from_a_covered_bar():
+    rng = np.random.default_rng(7)
+    rectangle = (20, 40, 100, 10)
+
+    def frame(border):
+        image = rng.integers(0, 255, (80, 160, 3), dtype=np.uint8)
+        image[40:50, 20:120] = border
+        image[41:49, 21:110] = (20, 200, 230)
+        image[0, 0] = 255  # Markierung: Leiste wird erkannt
+        return image
+
+    # Die Referenz entsteht, während ein Overlay den Rahmen verdeckt, danach ist das HUD normal zu sehen
+    frames = [frame(200) for _ in range(150)] + [frame(30) for _ in range(600)]
+    analyzer = types.SimpleNamespace(
+        high_yellow_threshold=0.08, low_yellow_threshold=0.02, bar_check_interval=15,
+        hud_gate=True, hud_skip_frames=15, frame_batch_size=64,
+        _yellow_stats=lambda rect, w, h, stats: (0.5, (0, 0, 0)),
+        _calculate_roi=lambda frame: (0, 0, 160, 80),
+        _find_contours=lambda roi, stats: roi,
+        _match_bar=lambda roi, x1, y1, rectangle: rectangle if roi[0, 0, 0] == 255 else None,
+    )
+    series, stats = videoAnalyzerOld.StaminaSeries(30), AnalysisStats()
+    scanner = videoAnalyzerOld.SeriesScanner(analyzer, FakeCapture(frames), rectangle, series, stats,
+                                             gate=videoAnalyzerOld.HudGate(rectangle))
+    while scanner.scan_block():
+        pass
+
+    assert len(series) == len(frames)
+    assert stats.counters["hud_gate_resets"] >= 1
+    assert series.bar_matches[-500:].all()
+
+
+def test_series_cache_key_depends_on_the_thresholds(tmp_path):
+    analyzer = videoAnalyzerOld.VideoAnalyzer(str(tmp_path / "missing.mp4"), output_dir=str(tmp_path))
+    series_key = analyzer.cache_parameters(100)["series"]
+    analyzer.low_yellow_threshold = 0.03  # andere Frames mit Konturprüfung, bar_matches wäre veraltet
+    assert analyzer.cache_parameters(100)["series"] != series_key
+
+
+def test_sections_start_on_keyframes():
+    sections = videoAnalyzerOld.plan_series_sections(9000, 3, keyframes=list(range(0, 9000, 280)))
+    assert sections == [(0, 3080), (3080, 5880), (5880, None)]
+    assert videoAnalyzerOld.plan_series_sections(9000, 3) == [(0, 3000), (3000, 6000), (6000, None)]
+
+
+class SeekingCapture:
+    """cv2.VideoCapture-Ersatz, dessen Sprung offset Frames hinter dem Ziel landet (wie bei manchen H.264-Dateien)"""
+    offset = 0
+
+    def __init__(self, path):
+        self.position = 0
+
+    def set(self, prop, frame_number):
+        self.position = frame_number + self.offset
+
+    def get(self, prop):
+        return float(self.position)
+
+    def grab(self):
+        self.position += 1
+        return True
+
+    def read(self):
+        self.position += 1
+        return True, self.position - 1
+
+    def release(self):
+        pass
+
+
+def test_open_capture_at_realigns_an_inexact_seek(monkeypatch):
+    monkeypatch.setattr(videoAnalyzerOld.cv2, "VideoCapture", SeekingCapture)
+    stats = AnalysisStats()
+    assert videoAnalyzerOld.open_capture_at("clip.mp4", 1200, stats).read() == (True, 1200)
+    assert stats.counters["seek_realigned"] == 0
+
+    monkeypatch.setattr(SeekingCapture, "offset", 3)
+    assert videoAnalyzerOld.open_capture_at("clip.mp4", 1200, stats).read() == (True, 1200)
+    assert stats.counters["seek_realigned"] == 1
+
+
+def test_pooled_sections_with_hud_gate_match_the_single_pass():
+    rng = np.random.default_rng(13)
+    rectangle, frame_count = (20, 40, 100, 10), 1000
+    ratios = np.where(np.arange(frame_count) % 100 < 60, 0.5, 0.0)
+    # Das HUD kehrt kurz vor den unausgerichteten Abschnittsgrenzen 333 und 666 zurück, mitten im Raster
+    hud = np.ones(frame_count, dtype=bool)
+    hud[324:331] = hud[654:664] = hud[100:180] = False
+
+    def frame(index):
+        image = rng.integers(0, 255, (80, 160, 3), dtype=np.uint8)
+        if hud[index]:
+            image[40:50, 20:120] = 30
+            image[41:49, 21:21 + int(98 * ratios[index])] = (20, 200, 230)
+            image[41, 21, 0] = int(ratios[index] * 100)  # Gelbanteil für _yellow_stats
+            image[0, 0] = 255  # Leiste zu sehen
+        return image
+
+    frames = [frame(index) for index in range(frame_count)]
+    analyzer = types.SimpleNamespace(
+        high_yellow_threshold=0.08, low_yellow_threshold=0.02, bar_check_interval=15,
+        hud_gate=True, hud_skip_frames=15, frame_batch_size=64,
+        _yellow_stats=lambda rect, w, h, stats: (rect[1, 1, 0] / 100, (0, 0, 0)),
+        _calculate_roi=lambda frame: (0, 0, 160, 80),
+        _find_contours=lambda roi, stats: roi,
+        _match_bar=lambda roi, x1, y1, rectangle: rectangle if roi[0, 0, 0] == 255 else None,
+    )
+    learner = videoAnalyzerOld.HudGate(rectangle)
+    for index in range(0, frame_count, 60):
+        if hud[index]:
+            learner.learn(learner.signature(frames[index]))
+    reference = learner.learned
+
+    def scan(start, end, armed_states, on_oos=None):
+        series, stats = videoAnalyzerOld.StaminaSeries(30), AnalysisStats()
+        scanner = videoAnalyzerOld.SeriesScanner(analyzer, FakeCapture(frames[start:end]), rectangle, series, stats,
+                                                 frame_number=start, end_frame=end, armed_states=armed_states,
+                                                 gate=videoAnalyzerOld.HudGate(rectangle, reference=reference))
+        scanner.on_oos = on_oos
+        while scanner.scan_block():
+            pass
+        return series, stats
+
+    expected = []
+    single, single_stats = scan(0, frame_count, (False,), lambda frame, frame_number, *_: expected.append(frame_number))
+    sections = videoAnalyzerOld.plan_series_sections(frame_count, 3, align=analyzer.hud_skip_frames)
+    assert [start for start, _ in sections] == [0, 330, 660]
+    chunks = [scan(start, end or frame_count, (False, True) if start else (False,)) for start, end in sections]
+
+    pooled = np.concatenate([series.ratios for series, _ in chunks])
+    assert np.array_equal(pooled, single.ratios)
+    assert sum(stats.counters["hud_absent_frames"] for _, stats in chunks) == single_stats.counters["hud_absent_frames"]
+    detector = videoAnalyzerOld.OOSDetector(0.08, 0.02)
+    bar_matches = np.concatenate([series.bar_matches for series, _ in chunks])
+    replayed = [index + 1 for index, (ratio, matched) in enumerate(zip(pooled.tolist(), bar_matches.tolist()))
+                if detector.update(ratio, matched)]
+    assert replayed == expected and len(expected) >= 8
+
+
+def test_sampled_training_stops_when_the_time_budget_runs_out(tmp_path, monkeypatch):
+    video_path = str(tmp_path / "clip.mp4")
+    writer = cv2.VideoWriter(video_path, cv2.VideoWriter_fourcc(*"mp4v"), 30, (320, 180))
+    for _ in range(120):
+        writer.write(np.full((180, 320, 3), 40, dtype=np.uint8))
+    writer.release()
+
+    # Jede Stichprobe kostet eine Sekunde auf der Uhr des ConvergenceTracker, das Rechteck wechselt ständig
+    clock = [0.0]
+    training_module = sys.modules[videoAnalyzerOld.ConvergenceTracker.__module__]
+    monkeypatch.setattr(training_module, "time", types.SimpleNamespace(perf_counter=lambda: clock[0]))
+    monkeypatch.setattr(videoAnalyzerOld, "probe_keyframes", lambda path, fps: None)
+
+    analyzer = videoAnalyzerOld.VideoAnalyzer(video_path, output_dir=str(tmp_path))
+    analyzer.training_samples = 60
+    analyzer.training_time_budget = 3.5
+
+    def count_rectangles(frame, stats=None):
+        clock[0] += 1
+        analyzer.rectangle_counter[(int(clock[0]), 0, 10, 2)] += 1
+        return 1
+
+    analyzer._count_rectangles = count_rectangles
+    asyncio.run(analyzer.find_stable_rectangle(120))
+    assert analyzer.training_stats.counters["samples"] == 4
+
+    clock[0] = 0.0
+    analyzer = videoAnalyzerOld.VideoAnalyzer(video_path, output_dir=str(tmp_path))
+    analyzer.training_samples = 60
+    analyzer._count_rectangles = count_rectangles
+    asyncio.run(analyzer.find_stable_rectangle(120))
+    assert analyzer.training_stats.counters["samples"] == 60  # ohne Budget werden alle Stichproben gelesen
+
+
+class RecordingCapture:
+    """Reicht an cv2.VideoCapture weiter und merkt sich, in welchem Thread gelesen wurde"""
+    def __init__(self, capture):
+        self.capture = capture
+        self.read_threads = []
+
+    def read(self):
+        self.read_threads.append(threading.current_thread())
+        return self.capture.read()
+
+    def __getattr__(self, name):
+        return getattr(self.capture, name)
+
+
+def test_training_decodes_frame_blocks_off_the_event_loop(tmp_path, monkeypatch):
+    video_path = str(tmp_path / "clip.mp4")
+    writer = cv2.VideoWriter(video_path, cv2.VideoWriter_fourcc(*"mp4v"), 30, (320, 180))
+    for _ in range(120):
+        writer.write(np.full((180, 320, 3), 40, dtype=np.uint8))
+    writer.release()
+
+    hops = []
+    to_thread = asyncio.to_thread
+
+    async def counting_to_thread(function, *args, **kwargs):
+        hops.append(function)
+        return await to_thread(function, *args, **kwargs)
+
+    monkeypatch.setattr(asyncio, "to_thread", counting_to_thread)
+    analyzer = videoAnalyzerOld.VideoAnalyzer(video_path, output_dir=str(tmp_path))
+    analyzer.frame_batch_size = 16
+    analyzer.cap = capture = RecordingCapture(analyzer.cap)
+    asyncio.run(analyzer.find_stable_rectangle(100))
+
+    # 100 Frames und der erste Frame danach in Blöcken zu 16, kein cap.read() im Event-Loop
+    assert len(capture.read_threads) == 101
+    assert threading.main_thread() not in capture.read_threads
+    assert len(hops) == 7